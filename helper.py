@@ -223,7 +223,17 @@ def is_course_format(s: str) -> bool:
     else:
         return False
 
-def merge_paths_multiple(paths: list[set[str]]):
+def merge_paths_multiple(paths: list[set[str]]) -> set[str]:
     """
     Given the paths to multiple courses, merge them all into a single set of courses to take
+
+    Courses needed by more than one path are only taken once. To find the paths themselves with their shared prereqs
+    planned together, see runner.get_course_trees in the modules folder.
+
+    >>> sorted(merge_paths_multiple([{'CSC110Y1', 'CSC111H1'}, {'CSC110Y1', 'MAT137Y1'}]))
+    ['CSC110Y1', 'CSC111H1', 'MAT137Y1']
     """
+    merged = set()
+    for path in paths:
+        merged = merged.union(path)
+    return merged
@@ -0,0 +1,635 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Benchmarks for the catalog and planner. Note that this file is never run during the running of the main file of the
+program. Run it directly (from the modules folder) to print the results of every benchmark.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Optional
+
+import functools
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from catalog import CATALOG_PATH, CourseCatalog, get_catalog
+from catalog_snapshot import compile_snapshot, snapshot_path_for
+from course_codes import CourseCodeTable, iter_ids
+from course_network import DatabaseCourse, DatabaseCourseNetwork, get_combo_duration
+from plan_cache import PlanCache
+from plan_store import PlanLookup, PlanStore
+from planner import BranchAndBoundPlanner, DynamicPlanner, PlanningSession
+import runner
+from prereq_closure import PrereqClosure
+from course_requirements import COMPACT_COMBO_LIMIT, RequirementCache, RequirementTree, is_course_format, \
+    minimize_combos, parse_course_requirements
+from requirement_bdd import RequirementBDD
+
+# Code run in a fresh interpreter to measure the cold start of the catalog. Prints the load time (in seconds) and the
+# peak resident set size of the process (in kilobytes on Linux, bytes on macOS)
+_COLD_START_CODE = '''
+import resource, sys, time
+start = time.perf_counter()
+from catalog import CourseCatalog
+CourseCatalog(sys.argv[1], use_snapshot=sys.argv[2] == '1')
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def benchmark_cold_start(path: str = CATALOG_PATH, repeats: int = 5) -> dict[str, tuple[float, int]]:
+    """
+    Return the best cold start time (in seconds) and peak RSS of loading the catalog at path, both by parsing the json
+    file ('json') and by memory-mapping its compiled snapshot ('snapshot')
+
+    Every run is done in a new interpreter so that nothing is shared between runs. The snapshot is (re)compiled first.
+    """
+    compile_snapshot(path, snapshot_path_for(path))
+    modules_dir = os.path.dirname(os.path.abspath(__file__))
+
+    results = {}
+    for name, flag in (('json', '0'), ('snapshot', '1')):
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.run([sys.executable, '-c', _COLD_START_CODE, path, flag], cwd=modules_dir,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            runs.append((float(output[0]), int(output[1])))
+        results[name] = (min(r[0] for r in runs), min(r[1] for r in runs))
+    return results
+
+
+def load_requirement_strings(path: str = CATALOG_PATH) -> list[str]:
+    """
+    Return the prerequisite string of every course in the catalog at path
+    """
+    with open(path, encoding='utf-8') as f:
+        return [course['prerequisites'] for course in json.load(f)]
+
+
+def parse_requirements_grouped(requirements: str) -> RequirementTree:
+    """
+    Parse a course requirement string into a _Node (_Node will be the root of the tree) by repeatedly grouping the
+    string at its top bracket level
+
+    This is the original parser. It regroups and re-slices the rest of the string at every level, so it is kept here
+    only as a reference to check course_requirements.parse_course_requirements against.
+
+    Preconditions:
+    - requirements is a valid course requirements string
+
+    >>> parse_requirements_grouped('').is_same_tree(parse_course_requirements(''))
+    True
+    >>> parse_requirements_grouped('(CSC108H1^CSC148H1)|CSC111H1').is_same_tree(
+    ...     parse_course_requirements('(CSC108H1^CSC148H1)|CSC111H1'))
+    True
+    """
+    # Make sure there is not a bracket at start and end of requirements string
+    while is_enclosed_brackets(requirements):
+        requirements = requirements[1:-1]
+
+    if is_course_format(requirements) or requirements == '':
+        # Base case - Requirements is just a single course or is an empty string
+        return RequirementTree(requirements)
+    else:
+        curr_node = RequirementTree(requirements)
+
+        course_groups = group_courses(requirements)
+
+        if '^' in course_groups:
+            # If ^ in grouped list - Search for first ^ in grouped list
+            i = 0
+            first_group = ''
+            sep = '^'
+            while course_groups[i] != '^':
+                first_group += course_groups[i]
+                i += 1
+            second_group = ''.join(course_groups[i + 1:])
+        else:
+            # Otherwise, search for first | in grouped list
+            i = 0
+            first_group = ''
+            sep = '|'
+            while course_groups[i] != '|':
+                first_group += course_groups[i]
+                i += 1
+            second_group = ''.join(course_groups[i + 1:])
+
+        # Store separator + Courses before and after seperator
+        curr_node.set_node_attributes(
+            sep,
+            parse_requirements_grouped(first_group),
+            parse_requirements_grouped(second_group)
+        )
+        return curr_node
+
+
+def group_courses(requirements: str) -> list[str]:
+    """
+    Group courses into individual logical units at the top bracket level
+
+    >>> group_courses('CSC110Y1|(CSC108H1^CSC148H1)')
+    ['CSC110Y1', '|', '(CSC108H1^CSC148H1)']
+    >>> group_courses('PHY132H1|PHY152H1^(MAT135H1^MAT136H1)|MAT137Y1|MAT157Y1')
+    ['PHY132H1', '|', 'PHY152H1', '^', '(MAT135H1^MAT136H1)', '|', 'MAT137Y1', '|', 'MAT157Y1']
+    """
+    # Group courses by brackets with separators between brackets included in list
+    bracket_level = 0
+    curr_group = ''
+    groups = []
+    for i in requirements:
+        # Update the current bracket level
+        if i == '(':
+            bracket_level += 1
+        elif i == ')':
+            bracket_level -= 1
+
+        if bracket_level == 0 and i in ('|', '^'):
+            # Only add separators to course_groups list if you are in the top bracket level
+            groups.append(curr_group)
+            curr_group = ''
+            groups.append(i)
+        elif bracket_level > 0 and i in ('|', '^'):
+            # If you are not in the top bracket level, add the separator to the current group
+            curr_group += i
+        elif i not in ('|', '^'):
+            # Always add non-separator characters to current group
+            curr_group += i
+    if curr_group != '':
+        groups.append(curr_group)
+    return groups
+
+
+def is_enclosed_brackets(s: str) -> bool:
+    """
+    Return whether a string is fully enclosed by one pair of brackets
+
+    >>> is_enclosed_brackets('()')
+    True
+    >>> is_enclosed_brackets('(((ABCDE)))')
+    True
+    >>> is_enclosed_brackets('(ABC)^(DEF)')
+    False
+    >>> is_enclosed_brackets('()ABCDE')
+    False
+    """
+    if s == '' or s[0] != '(':
+        return False
+    else:
+        open_bracket = 1
+        for i in s[1:]:
+            if open_bracket == 0:
+                return False
+            if i == '(':
+                open_bracket += 1
+            elif i == ')':
+                open_bracket -= 1
+        return True
+
+
+def compare_parsers(path: str = CATALOG_PATH) -> list[str]:
+    """
+    Return every prerequisite string in the catalog at path that parse_course_requirements and the original
+    parse_requirements_grouped disagree on (different trees, or only one of them rejecting the string)
+    """
+    mismatches = []
+    for requirements in load_requirement_strings(path):
+        try:
+            new_tree = parse_course_requirements(requirements)
+        except (ValueError, IndexError):
+            new_tree = None
+        try:
+            old_tree = parse_requirements_grouped(requirements)
+        except (ValueError, IndexError):
+            old_tree = None
+
+        if new_tree is None or old_tree is None:
+            if new_tree is not old_tree:
+                mismatches.append(requirements)
+        elif not new_tree.is_same_tree(old_tree):
+            mismatches.append(requirements)
+    return mismatches
+
+
+def benchmark_parsers(path: str = CATALOG_PATH, count: int = 20, repeats: int = 20) -> dict[str, float]:
+    """
+    Return the best time (in seconds) each parser takes to parse the count longest prerequisite strings in the
+    catalog at path
+    """
+    longest = sorted(load_requirement_strings(path), key=len, reverse=True)[:count]
+    parsers = {'tokenizer': parse_course_requirements, 'grouped': parse_requirements_grouped}
+    return {name: min(timeit.repeat(lambda p=parser: [p(r) for r in longest], number=1, repeat=repeats))
+            for name, parser in parsers.items()}
+
+
+def benchmark_requirement_cache(path: str = CATALOG_PATH) -> dict[str, float]:
+    """
+    Return the time (in seconds) to parse and expand every prerequisite string in the catalog at path into combos, with
+    a fresh shared RequirementCache ('cached') and without one ('uncached'), and the hit rate of the cache
+    """
+    requirements = load_requirement_strings(path)
+
+    def expand(cache: RequirementCache | None) -> None:
+        """Parse and expand every requirement string"""
+        table = CourseCodeTable()
+        for r in requirements:
+            parse_course_requirements(r, cache).get_possible_true_masks(table)
+
+    cache = RequirementCache()
+    results = {'uncached': min(timeit.repeat(lambda: expand(None), number=1, repeat=3)),
+               'cached': timeit.timeit(lambda: expand(cache), number=1)}
+    results['hit rate'] = cache.hits / max(cache.hits + cache.misses, 1)
+    return results
+
+
+def benchmark_minimize_combos(groups: int = 4, group_size: int = 10) -> dict[str, float]:
+    """
+    Return the time (in milliseconds) to minimize every combination of an AND of groups ORs of group_size courses each
+    ('product'), which are all kept, and to minimize them with one more, smaller combination that is contained in
+    group_size ** (groups - 2) of them ('contained')
+    """
+    course_groups = [[1 << (group_size * group + i) for i in range(group_size)] for group in range(groups)]
+    combos = [functools.reduce(lambda a, b: a | b, product) for product in itertools.product(*course_groups)]
+    contained = combos + [course_groups[0][0] | course_groups[1][0]]
+    return {'product': min(timeit.repeat(lambda: minimize_combos(combos), number=1, repeat=5)) * 1000,
+            'contained': min(timeit.repeat(lambda: minimize_combos(contained), number=1, repeat=5)) * 1000}
+
+
+def benchmark_eligibility(path: str = CATALOG_PATH, transcript_size: int = 40) -> dict[str, float]:
+    """
+    Return the average time (in microseconds) per course to check the prereqs of every course in the catalog at path
+    against a random transcript, by walking each RequirementTree ('tree') and with each course's compiled evaluator
+    ('compiled')
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    network = catalog.network
+    courses = list(network.courses.values())
+    taken = set(random.sample([course.code for course in courses], min(transcript_size, len(courses))))
+    taken_mask = network.table.intern_mask(taken)
+    trees = [parse_course_requirements(catalog.get_course_data(course.code)['prerequisites']) for course in courses]
+
+    # Compile every evaluator before timing
+    for course in courses:
+        course.is_satisfied(taken_mask)
+
+    tree_time = min(timeit.repeat(lambda: [tree.get_truth_value(taken) for tree in trees], number=1, repeat=5))
+    compiled_time = min(timeit.repeat(lambda: [course.is_satisfied(taken_mask) for course in courses], number=1,
+                                      repeat=5))
+    return {'tree': tree_time / len(courses) * 1e6, 'compiled': compiled_time / len(courses) * 1e6}
+
+
+def benchmark_frontier(path: str = CATALOG_PATH, transcript_size: int = 40) -> dict[str, float]:
+    """
+    Return the time (in milliseconds) to find every course that can be taken next with a random transcript, for the
+    whole catalog at path, with the requirement matrix ('matrix') and by walking every course's RequirementTree
+    ('tree')
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    courses = list(catalog.network.courses.values())
+    taken = set(random.sample([course.code for course in courses], min(transcript_size, len(courses))))
+    trees = {course.code: parse_course_requirements(catalog.get_course_data(course.code)['prerequisites'])
+             for course in courses}
+
+    # Build the matrix before timing
+    matrix_result = set(catalog.get_eligible_courses(taken))
+    tree_result = {code for code, tree in trees.items() if code not in taken and tree.get_truth_value(taken)}
+    assert matrix_result == tree_result
+
+    matrix_time = min(timeit.repeat(lambda: catalog.get_eligible_courses(taken), number=1, repeat=5))
+    tree_time = min(timeit.repeat(
+        lambda: [code for code, tree in trees.items() if code not in taken and tree.get_truth_value(taken)],
+        number=1, repeat=5))
+    return {'matrix': matrix_time * 1000, 'tree': tree_time * 1000}
+
+
+def benchmark_lazy_combos(path: str = CATALOG_PATH, count: int = 20, k: int = 5) -> dict[str, float]:
+    """
+    Return the time (in milliseconds) to build every prereq combination of the count requirement strings in the
+    catalog at path estimated to have the most combinations ('full'), and to lazily take only their k cheapest
+    combinations ('lazy')
+
+    Requirements estimated to be explosive are left out, since building all their combinations is what their compact
+    form avoids (see benchmark_compact_requirements).
+    """
+    table = CourseCodeTable()
+    trees = [(r, parse_course_requirements(r)) for r in load_requirement_strings(path)]
+    ranked = sorted(((tree.estimate_combo_count(), r) for r, tree in trees if not tree.is_explosive()), reverse=True)
+    worst = [r for _, r in ranked[:count]]
+    cost = functools.partial(get_combo_duration, table)
+
+    def expand_full() -> None:
+        """Expand every requirement from scratch"""
+        for r in worst:
+            parse_course_requirements(r, None).get_possible_true_masks(table)
+
+    def expand_lazy() -> None:
+        """Take the k cheapest combinations of every requirement"""
+        for r in worst:
+            list(itertools.islice(parse_course_requirements(r, None).iter_possible_true_masks(table, cost), k))
+
+    return {'full': min(timeit.repeat(expand_full, number=1, repeat=3)) * 1000,
+            'lazy': min(timeit.repeat(expand_lazy, number=1, repeat=3)) * 1000}
+
+
+def benchmark_compact_requirements(path: str = CATALOG_PATH, groups: int = 12,
+                                   group_size: int = 10) -> dict[str, float]:
+    """
+    Return the time (in milliseconds) to build the compact form of every prerequisite string in the catalog at path
+    ('catalog'), the number of BDD nodes it takes ('nodes'), and the number of requirements estimated to be explosive
+    ('explosive')
+
+    Also return the time to build the compact form of a pathological requirement (an AND of groups ORs of group_size
+    courses each, which has group_size ** groups combinations) and take its COMPACT_COMBO_LIMIT cheapest combinations
+    ('pathological').
+    """
+    requirements = load_requirement_strings(path)
+    table = CourseCodeTable()
+    cost = functools.partial(get_combo_duration, table)
+    bdd = RequirementBDD()
+
+    def build_catalog() -> None:
+        """Build the compact form of every requirement in the catalog"""
+        for r in requirements:
+            parse_course_requirements(r, None).to_compact(table, bdd)
+
+    catalog_time = timeit.timeit(build_catalog, number=1)
+    codes = [f'AAA{i:03}H1' for i in range(groups * group_size)]
+    pathological = '^'.join('(' + '|'.join(codes[i:i + group_size]) + ')' for i in range(0, len(codes), group_size))
+    pathological_time = timeit.timeit(
+        lambda: parse_course_requirements(pathological, None).get_cheapest_masks(table, cost, COMPACT_COMBO_LIMIT),
+        number=1)
+    return {'catalog': catalog_time * 1000, 'nodes': len(bdd.nodes),
+            'explosive': sum(parse_course_requirements(r).is_explosive() for r in requirements),
+            'pathological': pathological_time * 1000}
+
+
+def benchmark_planners(path: str = CATALOG_PATH, count: int = 150, transcript_size: int = 40) -> dict[str, float]:
+    """
+    Return the total time (in seconds) the dynamic ('dynamic') and branch and bound ('search') planners take to plan
+    count random courses of the catalog at path, each with a random transcript, and the total number of partial
+    plans the search expanded ('expanded') and pruned ('pruned')
+
+    The exhaustive planner is left out, since it does not finish for some courses.
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    codes = [course.code for course in catalog.network.courses.values()]
+    queries = [(random.choice(codes), set(random.sample(codes, min(transcript_size, len(codes)))))
+               for _ in range(count)]
+
+    results = {'dynamic': 0.0, 'search': 0.0, 'expanded': 0, 'pruned': 0}
+    for target, taken in queries:
+        network = catalog.network.with_courses_taken(taken)
+        course = network.get_course(target)
+        results['dynamic'] += timeit.timeit(lambda n=network, c=course: DynamicPlanner(n).get_best_plan(c), number=1)
+        planner = BranchAndBoundPlanner(network)
+        results['search'] += timeit.timeit(lambda p=planner, c=course: p.search(c), number=1)
+        results['expanded'] += planner.stats.expanded
+        results['pruned'] += planner.stats.pruned
+    return results
+
+
+def benchmark_prereq_closure(path: str = CATALOG_PATH, count: int = 1000) -> dict[str, float]:
+    """
+    Return the time to build the prerequisite closure of the catalog at path, in milliseconds ('build'), to answer count
+    random "may this course need that one" queries with it, in microseconds per query ('query'), and to update it after
+    the prereqs of a course change, in milliseconds per update ('update')
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    courses = list(catalog.network.courses.values())
+    for course in courses:
+        # Load every course's prereqs first, so the build time is only the time to build the closure
+        course.get_prereq_courses()
+
+    build_time = timeit.timeit(lambda: PrereqClosure(catalog.network), number=1)
+    closure = PrereqClosure(catalog.network)
+    pairs = [(random.choice(courses), random.choice(courses)) for _ in range(count)]
+    query_time = timeit.timeit(lambda: [closure.may_require(course, prereq) for course, prereq in pairs], number=1)
+
+    updated = random.sample(courses, min(count // 100 + 1, len(courses)))
+    update_time = timeit.timeit(lambda: [closure.update_course(course) for course in updated], number=1)
+    return {'build': build_time * 1000, 'query': query_time / count * 1e6,
+            'update': update_time / len(updated) * 1000}
+
+
+def benchmark_combined_plans(path: str = CATALOG_PATH, count: int = 20, targets: int = 10,
+                             transcript_size: int = 40) -> dict[str, float]:
+    """
+    Return the total time (in seconds) the dynamic planner takes to plan count random sets of targets courses (of the
+    same department) of the catalog at path, each with a random transcript, at once ('combined') and one course at a
+    time with a new planner for each ('separate')
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    codes = [course.code for course in catalog.network.courses.values()]
+
+    results = {'combined': 0.0, 'separate': 0.0}
+    for _ in range(count):
+        network = catalog.network.with_courses_taken(set(random.sample(codes, min(transcript_size, len(codes)))))
+        department = random.choice(codes)[:3]
+        same_department = [code for code in codes if code.startswith(department)]
+        courses = [network.get_course(code)
+                   for code in random.sample(same_department, min(targets, len(same_department)))]
+        # Plan once first, so neither time includes loading the prereqs of the courses
+        DynamicPlanner(network).get_best_plans(courses)
+        results['separate'] += timeit.timeit(
+            lambda n=network, c=courses: [DynamicPlanner(n).get_best_plan(course) for course in c], number=1)
+        results['combined'] += timeit.timeit(lambda n=network, c=courses: DynamicPlanner(n).get_best_plans(c),
+                                             number=1)
+    return results
+
+
+def benchmark_planning_session(path: str = CATALOG_PATH, count: int = 20, toggles: int = 10) -> dict[str, float]:
+    """
+    Return the total time (in seconds) to replan the count courses with the largest prerequisite cones in the catalog
+    at path after toggling (adding or removing) toggles random courses of their cones one at a time, with a
+    PlanningSession ('session') and with a new dynamic planner after every toggle ('fresh')
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    closure = catalog.get_prereq_closure()
+    courses = sorted(catalog.network.courses.values(), key=closure.get_cone_size, reverse=True)[:count]
+
+    results = {'session': 0.0, 'fresh': 0.0}
+    for course in courses:
+        cone = list(catalog.network.table.get_mask_codes(closure.get_ancestors(course)))
+        session = PlanningSession(catalog.network.with_courses_taken(set()), course, closure)
+        session.get_best_plan()
+        for code in random.sample(cone, min(toggles, len(cone))):
+            session.add_taken(code)
+            results['session'] += timeit.timeit(session.get_best_plan, number=1)
+            network = catalog.network.with_courses_taken(session.get_courses_taken())
+            results['fresh'] += timeit.timeit(lambda n=network, c=course: DynamicPlanner(n).get_best_plan(c), number=1)
+    return results
+
+
+def benchmark_plan_cache(students: int = 500, targets: int = 20, transcript_size: int = 40) -> dict[str, float]:
+    """
+    Return the hit rate of a PlanCache when students random students (each with a random transcript) each ask
+    runner.get_course_tree for one of targets random (popular) courses of the process-wide catalog ('hit_rate'), the
+    hit rate a cache keyed by the whole transcript would have had ('raw_hit_rate'), and the total time (in seconds) of
+    the requests with the cache ('cached') and without it ('uncached')
+    """
+    codes = [course.code for course in get_catalog().network.courses.values()]
+    popular = random.sample(codes, min(targets, len(codes)))
+    requests = [(random.choice(popular), set(random.sample(codes, min(transcript_size, len(codes)))))
+                for _ in range(students)]
+
+    def request_all(plans: Optional[PlanLookup]) -> None:
+        """Plan every request, looking plans up in the given plans"""
+        for code, taken in requests:
+            try:
+                runner.get_course_tree(code, taken, 'dynamic', plans=plans)
+            except ValueError:
+                continue
+
+    # Plan once first, so neither time includes loading the prereqs of the courses
+    request_all(None)
+    plan_cache = PlanCache()
+    cached_time = timeit.timeit(lambda: request_all(PlanLookup(plan_cache)), number=1)
+    uncached_time = timeit.timeit(lambda: request_all(None), number=1)
+    raw_hits = len(requests) - len({(code, frozenset(taken)) for code, taken in requests})
+    return {'hit_rate': plan_cache.stats.get_hit_rate(), 'raw_hit_rate': raw_hits / len(requests),
+            'cached': cached_time, 'uncached': uncached_time}
+
+
+def benchmark_plan_store(targets: int = 50) -> dict[str, float]:
+    """
+    Return the total time (in seconds) runner.get_course_tree takes to plan targets random courses of the process-wide
+    catalog with the search planner and an empty PlanStore ('cold'), and again after a restart, with a new in-memory
+    cache and a store opened again from the same file ('warm'), and the size of the stored plans in bytes ('bytes')
+    """
+    catalog = get_catalog()
+    codes = random.sample([course.code for course in catalog.network.courses.values()], targets)
+    # Load every course's prereqs first, so neither time includes it
+    catalog.get_prereq_closure()
+
+    def request_all(store: PlanStore) -> None:
+        """Plan every course with a new in-memory cache and the given store"""
+        plans = PlanLookup(PlanCache(), store)
+        for code in codes:
+            try:
+                runner.get_course_tree(code, set(), 'search', plans=plans)
+            except ValueError:
+                continue
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'courses.plans')
+        store = PlanStore(path)
+        cold_time = timeit.timeit(lambda: request_all(store), number=1)
+        store.close()
+        store = PlanStore(path)
+        warm_time = timeit.timeit(lambda: request_all(store), number=1)
+        size = store.get_size()
+        store.close()
+    return {'cold': cold_time, 'warm': warm_time, 'bytes': size}
+
+
+def benchmark_enumeration(path: str = CATALOG_PATH, count: int = 150, transcript_size: int = 40,
+                          max_networks: int = 20000) -> dict[str, float]:
+    """
+    Return the number of networks the exhaustive planner builds for count random courses of the catalog at path, each
+    with a random transcript, when duplicate networks are kept ('all') and dropped ('distinct'), the fraction of them
+    that were duplicates ('duplicate rate'), and the total time (in seconds) each takes ('all time', 'distinct time')
+
+    Courses that are their own (indirect) prereq, or that have more than max_networks networks, are skipped, since the
+    exhaustive planner does not finish for them.
+    """
+    catalog = CourseCatalog(path, use_snapshot=False)
+    codes = [course.code for course in catalog.network.courses.values()]
+
+    results = {'queries': 0, 'all': 0, 'distinct': 0, 'all time': 0.0, 'distinct time': 0.0}
+    for _ in range(count):
+        network = catalog.network.with_courses_taken(set(random.sample(codes, min(transcript_size, len(codes)))))
+        course = network.get_course(random.choice(codes))
+        estimate = _count_networks(network, course, {})
+        if estimate is None or estimate > max_networks:
+            continue
+
+        results['queries'] += 1
+        for key, distinct in (('all', False), ('distinct', True)):
+            start = timeit.default_timer()
+            results[key] += len(network.get_all_prereq_networks(course, distinct))
+            results[key + ' time'] += timeit.default_timer() - start
+    results['duplicate rate'] = 1 - results['distinct'] / results['all'] if results['all'] else 0.0
+    return results
+
+
+def _count_networks(network: DatabaseCourseNetwork, course: DatabaseCourse, counts: dict[int, Optional[int]]) \
+        -> Optional[int]:
+    """
+    Return the number of networks (duplicates included) get_all_prereq_networks builds for the given course, or None if
+    the course is its own (indirect) prereq
+
+    counts holds the counts of the courses already counted, and None for the courses being counted.
+    """
+    if course.course_id in counts:
+        return counts[course.course_id]
+    if course.prerequisites == [0]:
+        return 1
+
+    counts[course.course_id] = None
+    taken = network.courses_taken
+    total = sum(1 for req in course.prerequisites if req & taken == req)
+    if course.prereqs_truncated and total == 0 and course.is_satisfied(taken):
+        total = 1
+    for reqs in course.prerequisites:
+        product = 1
+        for req in iter_ids(reqs & ~taken):
+            prereq = network.get_course_by_id(req)
+            if prereq is None:
+                product = 0
+                continue
+            prereq_count = _count_networks(network, prereq, counts)
+            if prereq_count is None:
+                return None
+            product *= prereq_count
+        if reqs & ~taken != 0:
+            total += product
+
+    counts[course.course_id] = total
+    return total
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['functools', 'itertools', 'json', 'os', 'random', 'subprocess', 'sys', 'tempfile', 'timeit',
+                          'catalog', 'catalog_snapshot', 'course_codes', 'course_network', 'course_requirements',
+                          'plan_cache', 'plan_store', 'planner', 'prereq_closure', 'requirement_bdd', 'runner'],
+        'allowed-io': ['load_requirement_strings'],
+        'max-line-length': 120
+    })
+
+    for load_type, (seconds, rss) in benchmark_cold_start().items():
+        print(f'cold start ({load_type}): {seconds:.3f}s, peak RSS {rss}')
+
+    print(f'parser mismatches: {compare_parsers()}')
+    for parser_name, seconds in benchmark_parsers().items():
+        print(f'longest requirements ({parser_name} parser): {seconds * 1000:.3f}ms')
+
+    print(f'requirement cache: {benchmark_requirement_cache()}')
+    print(f'minimal DNF of 10,000 combinations (milliseconds): {benchmark_minimize_combos()}')
+    print(f'prereq check per course (microseconds): {benchmark_eligibility()}')
+    print(f'eligible frontier of the catalog (milliseconds): {benchmark_frontier()}')
+    print(f'largest prereq expansions (milliseconds): {benchmark_lazy_combos()}')
+    print(f'compact requirements: {benchmark_compact_requirements()}')
+    print(f'prereq closure: {benchmark_prereq_closure()}')
+    print(f'planners: {benchmark_planners()}')
+    print(f'combined plans: {benchmark_combined_plans()}')
+    print(f'planning session toggles: {benchmark_planning_session()}')
+    print(f'plan cache: {benchmark_plan_cache()}')
+    print(f'plan store restarts: {benchmark_plan_store()}')
+    print(f'exhaustive networks: {benchmark_enumeration()}')
@@ -0,0 +1,464 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Process-wide course catalog. The cleaned course data is loaded and turned into a DatabaseCourseNetwork once, and the
+same catalog is shared by the GUI and the planner. A background thread can watch the data file and swap in a freshly
+built catalog (loaded with the same options) when the file actually changes. If a fresh compiled snapshot of the data
+file exists (see catalog_snapshot), it is memory-mapped instead of parsing the json file.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Optional
+
+import functools
+import hashlib
+import json
+import os
+import threading
+
+import course_requirements
+from catalog_snapshot import CatalogSnapshot, load_snapshot, snapshot_path_for
+from course_codes import CourseCodeTable, ids_to_mask, iter_ids
+from course_network import DatabaseCourse, DatabaseCourseNetwork, get_combo_duration
+from frontier import RequirementMatrix
+from prereq_closure import PrereqClosure
+from requirement_bdd import CompactRequirement
+
+# Path to the cleaned course data (relative to the modules folder, where the program is run from)
+CATALOG_PATH = '../data-processing/courses_clean.json'
+
+# How often (in seconds) the background watcher checks the data file for changes
+WATCH_INTERVAL = 5.0
+
+
+class CatalogOptions:
+    """
+    The options a CourseCatalog is loaded with
+
+    Instance Attributes:
+        - use_snapshot: whether a fresh compiled snapshot of the data file is loaded instead of the json file
+        - combo_limit: the number of cheapest prereq combinations the planner considers for every course, or None if
+          it considers all of them
+    """
+    use_snapshot: bool
+    combo_limit: Optional[int]
+
+    def __init__(self, use_snapshot: bool = True, combo_limit: Optional[int] = None) -> None:
+        self.use_snapshot = use_snapshot
+        self.combo_limit = combo_limit
+
+
+class _CatalogIndexes:
+    """
+    The lookups of a CourseCatalog that are not part of its network
+
+    Instance Attributes:
+        - by_code: the course data of every course by its code, if the catalog was loaded from the json file
+        - requirement_matrix: the requirement matrix of the catalog, or None if it has not been built yet
+        - prereq_closure: the prerequisite closure of the catalog, or None if it has not been built yet
+    """
+    by_code: dict[str, dict]
+    requirement_matrix: Optional[RequirementMatrix]
+    prereq_closure: Optional[PrereqClosure]
+
+    def __init__(self, by_code: dict[str, dict]) -> None:
+        self.by_code = by_code
+        self.requirement_matrix = None
+        self.prereq_closure = None
+
+
+class CourseCatalog:
+    """
+    The course catalog loaded from a cleaned course data file
+
+    Instance Attributes:
+        - path: the path of the json file the catalog was loaded from
+        - options: the options the catalog was loaded with
+        - network: the DatabaseCourseNetwork built from the course data (with no courses taken)
+        - mtime: the modification time of the file when it was loaded, in nanoseconds
+        - content_hash: the sha256 hex digest of the file contents when it was loaded
+        - snapshot: the compiled snapshot the catalog was loaded from, or None if it was loaded from the json file
+
+    Representation Invariants:
+    - self.snapshot is None or self.snapshot.source_hash == self.content_hash
+    - self.snapshot is None or self.options.use_snapshot
+    """
+    path: str
+    options: CatalogOptions
+    network: DatabaseCourseNetwork
+    mtime: int
+    content_hash: str
+    snapshot: Optional[CatalogSnapshot]
+    _indexes: _CatalogIndexes
+
+    def __init__(self, path: str, use_snapshot: bool = True, combo_limit: Optional[int] = None) -> None:
+        self.path = path
+        self.options = CatalogOptions(use_snapshot, combo_limit)
+        self.mtime = os.stat(path).st_mtime_ns
+        self.snapshot = load_snapshot(snapshot_path_for(path), path) if use_snapshot else None
+
+        if self.snapshot is not None:
+            self.content_hash = self.snapshot.source_hash
+            self._indexes = _CatalogIndexes({})
+            self.network = self.snapshot.build_network()
+            if combo_limit is not None:
+                for course in self.network.courses.values():
+                    course.add_prereq_loader(functools.partial(
+                        _cheapest_snapshot_prereqs, course, self.snapshot, self.network.table, combo_limit))
+        else:
+            # No (fresh) snapshot - fall back to parsing the json file
+            with open(path, 'rb') as f:
+                contents = f.read()
+
+            self.content_hash = hashlib.sha256(contents).hexdigest()
+            data = json.loads(contents)
+            self._indexes = _CatalogIndexes({entry['course code']: entry for entry in data})
+            self.network = build_course_network(data, combo_limit)
+
+    def rebuild(self) -> CourseCatalog:
+        """
+        Return a new catalog loaded from the catalog's path with the same options (e.g. after the file changed)
+
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as folder:
+        ...     path = os.path.join(folder, 'courses_clean.json')
+        ...     with open(path, 'w', encoding='utf-8') as f:
+        ...         json.dump([{'course code': 'CSC110Y1', 'prerequisites': ''}], f)
+        ...     catalog = CourseCatalog(path, use_snapshot=False, combo_limit=3).rebuild()
+        >>> catalog.options.use_snapshot, catalog.options.combo_limit, catalog.has_course('CSC110Y1')
+        (False, 3, True)
+        """
+        return CourseCatalog(self.path, self.options.use_snapshot, self.options.combo_limit)
+
+    def has_course(self, code: str) -> bool:
+        """
+        Return whether the given course code is in the catalog
+        """
+        return self.network.get_course(code) is not None
+
+    def get_course_data(self, code: str) -> Optional[dict]:
+        """
+        Return the course dictionary for the given course code, or None if the course is not in the catalog
+        """
+        if self.snapshot is not None:
+            return self.snapshot.get_course_data(code)
+        return self._indexes.by_code.get(code)
+
+    def get_eligible_courses(self, taken: set[str]) -> list[str]:
+        """
+        Return the codes of every course that has not been taken and whose prerequisites are fulfilled by the given
+        taken courses
+
+        The requirement matrix of the whole catalog is built the first time it is needed.
+        """
+        table = self.network.table
+        taken_ids = (table.get_id(code) for code in taken if code in table)
+        return [table.get_code(course_id) for course_id in self._get_requirement_matrix().eligible_courses(taken_ids)]
+
+    def unlocked_by(self, code: str, taken: set[str]) -> list[str]:
+        """
+        Return the codes of every course that is not eligible with the given taken courses, but becomes eligible once
+        the given course is also taken
+
+        Only the requirements that mention the course are checked (see RequirementMatrix.unlocked_by). The requirement
+        matrix of the whole catalog is built the first time it is needed.
+
+        Preconditions:
+        - code is in the catalog or is named in some course's requirements
+        """
+        table = self.network.table
+        if code not in table:
+            return []
+        taken_mask = ids_to_mask(table.get_id(course) for course in taken if course in table)
+        return [table.get_code(course_id)
+                for course_id in self._get_requirement_matrix().unlocked_by(table.get_id(code), taken_mask)]
+
+    def _get_requirement_matrix(self) -> RequirementMatrix:
+        """
+        Return the requirement matrix of the catalog, building it the first time it is needed
+        """
+        if self._indexes.requirement_matrix is None:
+            self._indexes.requirement_matrix = RequirementMatrix(self.network)
+        return self._indexes.requirement_matrix
+
+    def get_prereq_closure(self) -> PrereqClosure:
+        """
+        Return the prerequisite closure of the catalog, which is built the first time this is called
+        """
+        if self._indexes.prereq_closure is None:
+            self._indexes.prereq_closure = PrereqClosure(self.network)
+        return self._indexes.prereq_closure
+
+    def may_require(self, code: str, prereq_code: str) -> bool:
+        """
+        Return whether the course prereq_code may be needed (directly or not) to take the course code
+
+        prereq_code does not have to be in the catalog (requirements may name courses that are not offered).
+
+        Preconditions:
+        - self.has_course(code)
+        """
+        table = self.network.table
+        ancestors = self.get_prereq_closure().get_ancestors(self.network.get_course(code))
+        return prereq_code in table and ancestors >> table.get_id(prereq_code) & 1 == 1
+
+    def get_prereq_cone(self, code: str) -> set[str]:
+        """
+        Return the codes of every course that may be needed (directly or not) to take the given course
+
+        Preconditions:
+        - self.has_course(code)
+        """
+        table = self.network.table
+        return {table.get_code(course_id)
+                for course_id in iter_ids(self.get_prereq_closure().get_ancestors(self.network.get_course(code)))}
+
+    def get_relevant_taken(self, codes: list[str], taken: set[str]) -> set[str]:
+        """
+        Return the courses in taken that may matter when planning the given courses: the courses themselves and the
+        courses in their prerequisite cones. Planning with only these courses taken gives the same plans.
+
+        If the prerequisite closure has not been built yet, only the cones of the given courses are found (loading only
+        the prereqs planning them would load anyway), instead of building it for the whole catalog.
+
+        Preconditions:
+        - all(self.has_course(code) for code in codes)
+        """
+        if not taken:
+            return set()
+        table = self.network.table
+        courses = [self.network.get_course(code) for code in codes]
+        relevant = 0
+        for course in courses:
+            relevant |= 1 << course.course_id
+        if self._indexes.prereq_closure is not None:
+            for course in courses:
+                relevant |= self._indexes.prereq_closure.get_ancestors(course)
+        else:
+            relevant |= self._find_cone(courses)
+        return {code for code in taken if code in table and relevant >> table.get_id(code) & 1}
+
+    def _find_cone(self, courses: list[DatabaseCourse]) -> int:
+        """
+        Return the bitset of IDs of every course in the prerequisite cones of the given courses, found by following
+        their prereqs
+        """
+        cone = 0
+        stack = list(courses)
+        while stack:
+            new = stack.pop().get_prereq_courses() & ~cone
+            cone |= new
+            stack.extend(course for course in map(self.network.get_course_by_id, iter_ids(new)) if course is not None)
+        return cone
+
+    def is_stale(self) -> bool:
+        """
+        Return whether the file the catalog was loaded from has changed since it was loaded
+
+        The (cheap) modification time is checked first, and the contents are only hashed when it has changed. If only
+        the modification time changed (e.g. the file was touched), the stored time is updated and False is returned.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+
+        if mtime == self.mtime:
+            return False
+
+        with open(self.path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+
+        if content_hash == self.content_hash:
+            self.mtime = mtime
+            return False
+        return True
+
+
+def build_course_network(data: list[dict], combo_limit: Optional[int] = None) -> DatabaseCourseNetwork:
+    """
+    Return a DatabaseCourseNetwork (with no courses taken) containing every course in the given course data
+
+    If combo_limit is given, every course only keeps its combo_limit cheapest (shortest total duration) prereq
+    combinations, which are enumerated lazily so the rest are never built. Courses whose prereqs would have too many
+    combinations to build (see RequirementTree.is_explosive) always only keep their cheapest ones, and are checked
+    with the compact form of their prereqs.
+    """
+    # Add all courses to course network
+    course_network = DatabaseCourseNetwork(set())
+    for i in data:
+        course_network.add_course(i['course code'])
+
+    # Add all course prereqs (they are only parsed when a query first reaches the course)
+    for i in data:
+        course = course_network.get_course(i['course code'])
+        course.add_prereq_loader(functools.partial(_parse_prereqs, course, i['prerequisites'], course_network.table,
+                                                   combo_limit))
+        course.add_evaluator_loader(functools.partial(_compile_prereqs, i['prerequisites'], course_network.table))
+
+    return course_network
+
+
+def _parse_prereqs(course: DatabaseCourse, requirements: str, table: CourseCodeTable,
+                   combo_limit: Optional[int] = None) -> list[int]:
+    """
+    Return every possible combination of courses (as bitsets of course IDs) that fulfills the given course requirement
+    string of the given course
+
+    Only the cheapest combo_limit combinations are returned if combo_limit is given, and only the cheapest
+    COMPACT_COMBO_LIMIT if the requirement is explosive. The course is marked as truncated if any were left out.
+    """
+    tree = course_requirements.parse_course_requirements(requirements)
+    if combo_limit is None:
+        if not tree.is_explosive():
+            return tree.get_possible_true_masks(table)
+        combo_limit = course_requirements.COMPACT_COMBO_LIMIT
+
+    # One more combination than needed is taken to find out whether any were left out
+    combos = tree.get_cheapest_masks(table, functools.partial(get_combo_duration, table), combo_limit + 1)
+    if len(combos) > combo_limit:
+        course.prereqs_truncated = True
+    return combos[:combo_limit]
+
+
+def _cheapest_snapshot_prereqs(course: DatabaseCourse, snapshot: CatalogSnapshot, table: CourseCodeTable,
+                               combo_limit: int) -> list[int]:
+    """
+    Return the combo_limit cheapest prereq combinations of the given course stored in the snapshot, marking the
+    course as truncated if any were left out
+    """
+    combos = snapshot.get_prereq_combos(course.course_id)
+    if len(combos) > combo_limit:
+        course.prereqs_truncated = True
+    return sorted(combos, key=functools.partial(get_combo_duration, table))[:combo_limit]
+
+
+def _compile_prereqs(requirements: str, table: CourseCodeTable) \
+        -> course_requirements.CompiledRequirement | CompactRequirement:
+    """
+    Return an evaluator of the given course requirement string (see RequirementTree.get_evaluator)
+    """
+    return course_requirements.parse_course_requirements(requirements).get_evaluator(table)
+
+
+class _CatalogState:
+    """
+    The process-wide catalog and the thread that watches its data file
+
+    Instance Attributes:
+        - catalog: the process-wide catalog, or None before it is first needed
+        - lock: the lock held while the catalog or the watcher is replaced
+        - watcher: the thread that reloads the catalog when its data file changes, or None if it was never started
+        - stop_watching: the event that stops the watcher once it is set
+    """
+    catalog: Optional[CourseCatalog]
+    lock: threading.Lock
+    watcher: Optional[threading.Thread]
+    stop_watching: threading.Event
+
+    def __init__(self) -> None:
+        self.catalog = None
+        self.lock = threading.Lock()
+        self.watcher = None
+        self.stop_watching = threading.Event()
+
+
+# The state shared by every user of the catalog in the process. It is only ever changed, never replaced
+_STATE = _CatalogState()
+
+
+def get_catalog(path: str = CATALOG_PATH) -> CourseCatalog:
+    """
+    Return the process-wide course catalog, loading it from the given path the first time it is needed
+    """
+    catalog = _STATE.catalog
+    if catalog is not None and catalog.path == path:
+        return catalog
+
+    with _STATE.lock:
+        if _STATE.catalog is None or _STATE.catalog.path != path:
+            _STATE.catalog = CourseCatalog(path)
+        return _STATE.catalog
+
+
+def reload_catalog_if_changed() -> bool:
+    """
+    Rebuild the process-wide catalog (with the options it was loaded with) if its data file has changed, and return
+    whether it was rebuilt
+
+    The old catalog keeps serving requests while the new one is built, and is only replaced once the new one is ready.
+    """
+    catalog = _STATE.catalog
+    if catalog is None or not catalog.is_stale():
+        return False
+
+    new_catalog = catalog.rebuild()
+    with _STATE.lock:
+        if _STATE.catalog is catalog:
+            _STATE.catalog = new_catalog
+    return True
+
+
+def start_catalog_watcher(interval: float = WATCH_INTERVAL) -> threading.Thread:
+    """
+    Start (if it is not already running) a daemon thread that reloads the catalog whenever its data file changes,
+    until stop_catalog_watcher is called
+    """
+    stop = _STATE.stop_watching
+
+    def watch() -> None:
+        """Periodically check the data file for changes"""
+        stopped = stop.wait(interval)
+        while not stopped:
+            try:
+                reload_catalog_if_changed()
+            except (OSError, ValueError):
+                # The file may be half written - keep the current catalog and try again next time
+                pass
+            stopped = stop.wait(interval)
+
+    with _STATE.lock:
+        if _STATE.watcher is None or not _STATE.watcher.is_alive():
+            stop.clear()
+            _STATE.watcher = threading.Thread(target=watch, name='catalog-watcher', daemon=True)
+            _STATE.watcher.start()
+        return _STATE.watcher
+
+
+def stop_catalog_watcher(timeout: Optional[float] = None) -> None:
+    """
+    Stop the thread started by start_catalog_watcher (if it is running), waiting at most timeout seconds for it to
+    finish (forever if timeout is None)
+
+    >>> watcher = start_catalog_watcher(interval=60.0)
+    >>> stop_catalog_watcher(timeout=5.0)
+    >>> watcher.is_alive()
+    False
+    """
+    _STATE.stop_watching.set()
+    with _STATE.lock:
+        watcher = _STATE.watcher
+    if watcher is not None:
+        watcher.join(timeout)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['functools', 'hashlib', 'json', 'os', 'threading', 'course_requirements',
+                          'catalog_snapshot', 'course_codes', 'course_network', 'frontier', 'prereq_closure',
+                          'requirement_bdd'],
+        'allowed-io': ['CourseCatalog.__init__', 'CourseCatalog.is_stale'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,359 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Compiled binary snapshots of the course catalog.
+
+compile_snapshot turns the cleaned course data (a json file) into a compact binary file that holds everything the
+planner needs already parsed: a table of course codes, the duration of every course, and every course's minimal
+prerequisite combinations as arrays of course indices. Courses whose prerequisites have too many combinations to build
+(see RequirementTree.is_explosive) only store their cheapest ones, and are checked with the compact form of their
+prerequisites. The full course details (descriptions, breadth, ...) are kept as
+separate blobs that are only decoded when a course is searched for. load_snapshot memory-maps the file, so loading it
+involves almost no parsing.
+
+Running this file compiles the snapshot for the default catalog path.
+
+Snapshot layout (all counts/offsets are unsigned 32-bit integers in the byte order recorded in the header):
+    - header (see _HEADER)
+    - course codes: n_codes * 8 ascii bytes. The first n_courses codes are the courses in the catalog, the rest are
+      codes that only appear in prerequisites
+    - durations: n_courses bytes, padded to a multiple of 4 bytes
+    - flags: n_courses bytes (see _TRUNCATED), padded to a multiple of 4 bytes
+    - course combo offsets: n_courses + 1 offsets into the combos of each course
+    - combo member offsets: n_combos + 1 offsets into the member array
+    - members: n_members course code indices
+    - detail offsets: n_courses + 1 offsets into the detail blob
+    - details: the json encoding of every course's dictionary, one after the other
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Optional
+
+import functools
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import course_requirements
+from course_codes import CourseCodeTable, ids_to_mask, iter_ids
+from course_network import DatabaseCourse, DatabaseCourseNetwork, get_combo_duration
+from requirement_bdd import CompactRequirement
+
+SNAPSHOT_MAGIC = b'CSNP'
+SNAPSHOT_VERSION = 2
+
+# magic, version, byte order (0 = little, 1 = big), source size, source mtime (ns), source sha256, n_codes, n_courses,
+# n_combos, n_members, details size
+_HEADER = struct.Struct('<4sHHqq32sIIIII')
+_BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+_CODE_LENGTH = 8
+
+# Course flag: only the cheapest prereq combinations of the course are stored
+_TRUNCATED = 1
+
+
+class CatalogSnapshot:
+    """
+    A memory-mapped compiled catalog snapshot
+
+    Instance Attributes:
+        - source_hash: the sha256 hex digest of the json file the snapshot was compiled from
+        - codes: the table of course codes, where the first num_courses codes are the courses in the catalog
+        - num_courses: the number of courses in the catalog
+
+    Representation Invariants:
+    - 0 <= self.num_courses <= len(self.codes)
+    """
+    source_hash: str
+    codes: list[str]
+    num_courses: int
+    _mmap: mmap.mmap
+    _durations: memoryview
+    _flags: memoryview
+    _course_combos: memoryview
+    _combo_members: memoryview
+    _members: memoryview
+    _detail_offsets: memoryview
+    _details_start: int
+    _index: dict[str, int]
+
+    def __init__(self, snapshot: mmap.mmap) -> None:
+        self._mmap = snapshot
+        _, _, _, _, _, source_hash, n_codes, n_courses, n_combos, n_members, _ = _HEADER.unpack_from(snapshot, 0)
+        self.source_hash = source_hash.hex()
+        self.num_courses = n_courses
+
+        view = memoryview(snapshot)
+        pos = _HEADER.size
+
+        code_bytes = bytes(view[pos:pos + n_codes * _CODE_LENGTH]).decode('ascii')
+        self.codes = [code_bytes[i:i + _CODE_LENGTH] for i in range(0, len(code_bytes), _CODE_LENGTH)]
+        self._index = {code: i for i, code in enumerate(self.codes)}
+        pos += n_codes * _CODE_LENGTH
+
+        self._durations = view[pos:pos + n_courses]
+        pos += _padded(n_courses)
+        self._flags = view[pos:pos + n_courses]
+        pos += _padded(n_courses)
+
+        self._course_combos, pos = _u32_section(view, pos, n_courses + 1)
+        self._combo_members, pos = _u32_section(view, pos, n_combos + 1)
+        self._members, pos = _u32_section(view, pos, n_members)
+        self._detail_offsets, pos = _u32_section(view, pos, n_courses + 1)
+        self._details_start = pos
+
+    def get_duration(self, index: int) -> int:
+        """
+        Return the duration (in terms) of the course at the given index
+        """
+        return self._durations[index]
+
+    def get_prereq_combos(self, index: int) -> list[int]:
+        """
+        Return every possible combination of courses that fulfills the prerequisites of the course at the given index,
+        as bitsets of course indices
+        """
+        combos = []
+        for combo in range(self._course_combos[index], self._course_combos[index + 1]):
+            start, end = self._combo_members[combo], self._combo_members[combo + 1]
+            combos.append(ids_to_mask(self._members[start:end]))
+        return combos
+
+    def is_truncated(self, index: int) -> bool:
+        """
+        Return whether only the cheapest prereq combinations of the course at the given index are stored
+        """
+        return bool(self._flags[index] & _TRUNCATED)
+
+    def get_prereq_evaluator(self, index: int, table: CourseCodeTable) \
+            -> course_requirements.CompiledRequirement | CompactRequirement:
+        """
+        Return an evaluator of the prereqs of the course at the given index, over the course IDs in the given table
+
+        Courses with all their prereq combinations stored are checked against them. The prereqs of truncated courses
+        are parsed again from their course data.
+        """
+        if not self.is_truncated(index):
+            return course_requirements.CompiledRequirement.from_combos(self.get_prereq_combos(index))
+        requirements = self.get_course_data(self.codes[index])['prerequisites']
+        return course_requirements.parse_course_requirements(requirements).get_evaluator(table)
+
+    def get_course_data(self, code: str) -> Optional[dict]:
+        """
+        Return the full course dictionary for the given course code, or None if the course is not in the catalog
+        """
+        index = self._index.get(code)
+        if index is None or index >= self.num_courses:
+            return None
+        start = self._details_start + self._detail_offsets[index]
+        end = self._details_start + self._detail_offsets[index + 1]
+        return json.loads(self._mmap[start:end])
+
+    def build_network(self) -> DatabaseCourseNetwork:
+        """
+        Return a DatabaseCourseNetwork (with no courses taken) containing every course in the snapshot
+
+        The snapshot's code table becomes the network's CourseCodeTable, so a course's index in the snapshot is its ID.
+        A course's prereqs are only read from the snapshot when a query first reaches the course.
+        """
+        table = CourseCodeTable(self.codes)
+        network = DatabaseCourseNetwork(set(), table)
+        for index in range(self.num_courses):
+            duration = self._durations[index]
+            course = DatabaseCourse(self.codes[index], duration / 2, duration, index)
+            course.prereqs_truncated = self.is_truncated(index)
+            course.add_prereq_loader(functools.partial(self.get_prereq_combos, index))
+            course.add_evaluator_loader(functools.partial(self.get_prereq_evaluator, index, table))
+            network.courses[index] = course
+        return network
+
+
+def snapshot_path_for(path: str) -> str:
+    """
+    Return the default snapshot path for the given json catalog path
+
+    >>> snapshot_path_for('../data-processing/courses_clean.json')
+    '../data-processing/courses_clean.snapshot'
+    """
+    return os.path.splitext(path)[0] + '.snapshot'
+
+
+def compile_snapshot(json_path: str, snapshot_path: str) -> None:
+    """
+    Compile the cleaned course data in json_path into a binary snapshot stored at snapshot_path
+
+    Like when the json file is loaded directly, the last entry of a course listed more than once is the one used.
+
+    Preconditions:
+    - json_path is a valid path to a cleaned course data json file
+
+    >>> import tempfile
+    >>> from catalog import CourseCatalog
+    >>> data = [{'course code': 'AAA100H1', 'prerequisites': 'BBB100H1'},
+    ...         {'course code': 'CCC100H1', 'prerequisites': 'AAA100H1|EEE100H1'},
+    ...         {'course code': 'AAA100H1', 'prerequisites': 'DDD100H1'}]
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     path = os.path.join(directory, 'courses.json')
+    ...     with open(path, 'w') as f:
+    ...         json.dump(data, f)
+    ...     compile_snapshot(path, snapshot_path_for(path))
+    ...     catalogs = [CourseCatalog(path, use_snapshot=use_snapshot) for use_snapshot in (True, False)]
+    ...     prereqs = [{course.code: sorted(sorted(catalog.network.table.get_mask_codes(combo))
+    ...                                    for combo in course.prerequisites)
+    ...                 for course in catalog.network.courses.values()} for catalog in catalogs]
+    >>> catalogs[0].snapshot is not None and prereqs[0] == prereqs[1]
+    True
+    >>> prereqs[0]['AAA100H1'], prereqs[0]['CCC100H1']
+    ([['DDD100H1']], [['AAA100H1'], ['EEE100H1']])
+    """
+    with open(json_path, 'rb') as f:
+        contents = f.read()
+    stat = os.stat(json_path)
+    # A course's index in the snapshot has to be its index in the code table, so each course is only listed once
+    data = list({course['course code']: course for course in json.loads(contents)}.values())
+
+    # Course codes of the catalog come first so that a course's index is also its position in the per course arrays
+    table = CourseCodeTable(course['course code'] for course in data)
+
+    durations = bytearray()
+    flags = bytearray()
+    course_combos = array('I', [0])
+    combo_members = array('I', [0])
+    members = array('I')
+    detail_offsets = array('I', [0])
+    details = bytearray()
+
+    for course in data:
+        code = course['course code']
+        durations.append(2 if code[-2] == 'Y' else 1)
+
+        tree = course_requirements.parse_course_requirements(course['prerequisites'])
+        if tree.is_explosive():
+            # One more combination than is stored is taken to find out whether any were left out
+            limit = course_requirements.COMPACT_COMBO_LIMIT
+            combos = tree.get_cheapest_masks(table, functools.partial(get_combo_duration, table), limit + 1)
+            flags.append(_TRUNCATED if len(combos) > limit else 0)
+            combos = combos[:limit]
+        else:
+            combos = tree.get_possible_true_masks(table)
+            flags.append(0)
+
+        for combo in course_requirements.minimize_combos(combos):
+            members.extend(iter_ids(combo))
+            combo_members.append(len(members))
+        course_combos.append(len(combo_members) - 1)
+
+        details += json.dumps(course, separators=(',', ':')).encode('utf-8')
+        detail_offsets.append(len(details))
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDER, stat.st_size, stat.st_mtime_ns,
+                          hashlib.sha256(contents).digest(), len(table), len(data), len(combo_members) - 1,
+                          len(members), len(details))
+
+    durations += bytes(_padded(len(durations)) - len(durations))
+    flags += bytes(_padded(len(flags)) - len(flags))
+
+    # Write to a temporary file first, so a reader never maps a half written snapshot
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(''.join(table.codes).encode('ascii'))
+        f.write(durations)
+        f.write(flags)
+        for section in (course_combos, combo_members, members, detail_offsets):
+            section.tofile(f)
+        f.write(details)
+    os.replace(tmp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path: str, json_path: str) -> Optional[CatalogSnapshot]:
+    """
+    Memory-map the snapshot at snapshot_path and return it, or return None if there is no usable snapshot
+
+    A snapshot is unusable if it does not exist, was written by a different version of this module or on a machine
+    with a different byte order, or is stale (the json file it was compiled from has different contents now).
+    """
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(snapshot) < _HEADER.size:
+        snapshot.close()
+        return None
+
+    magic, version, byte_order, source_size, source_mtime, source_hash, *_ = _HEADER.unpack_from(snapshot, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or byte_order != _BYTE_ORDER \
+            or not _is_fresh(json_path, source_size, source_mtime, source_hash):
+        snapshot.close()
+        return None
+
+    return CatalogSnapshot(snapshot)
+
+
+def _is_fresh(json_path: str, source_size: int, source_mtime: int, source_hash: bytes) -> bool:
+    """
+    Return whether the json file at json_path still has the contents a snapshot was compiled from
+
+    The file is only hashed if its size or modification time changed.
+    """
+    try:
+        stat = os.stat(json_path)
+    except OSError:
+        return False
+    if stat.st_size == source_size and stat.st_mtime_ns == source_mtime:
+        return True
+    if stat.st_size != source_size:
+        return False
+    with open(json_path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest() == source_hash
+
+
+def _padded(size: int) -> int:
+    """
+    Return size rounded up to a multiple of 4
+
+    >>> _padded(5)
+    8
+    >>> _padded(8)
+    8
+    """
+    return (size + 3) // 4 * 4
+
+
+def _u32_section(view: memoryview, pos: int, count: int) -> tuple[memoryview, int]:
+    """
+    Return a view of count unsigned 32-bit integers starting at pos, and the position after them
+    """
+    end = pos + 4 * count
+    return view[pos:end].cast('I'), end
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['functools', 'hashlib', 'json', 'mmap', 'os', 'struct', 'sys', 'array', 'course_requirements',
+                          'course_codes', 'course_network', 'requirement_bdd'],
+        'allowed-io': ['compile_snapshot', 'load_snapshot', '_is_fresh'],
+        'max-line-length': 120,
+        'disable': ['too-many-instance-attributes', 'too-many-locals']
+    })
+
+    from catalog import CATALOG_PATH
+    compile_snapshot(CATALOG_PATH, snapshot_path_for(CATALOG_PATH))
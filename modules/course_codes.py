@@ -0,0 +1,187 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Interned course code table. Every course code is given a dense integer ID when the catalog is loaded, so the planner
+can hash, compare and index courses by small integers instead of 8 character strings. Codes are only converted back to
+strings where they are shown to the user.
+
+Sets of courses are stored as bitsets: a Python int whose bit i is set exactly when the course with ID i is in the set.
+Subset tests, unions and equality checks on these masks are then a handful of machine word operations.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Iterable, Iterator, Optional
+
+import threading
+
+
+class CourseCodeTable:
+    """
+    A table that assigns every course code a dense integer ID (0, 1, 2, ... in the order the codes are added)
+
+    Instance Attributes:
+        - codes: the course codes in the table, where codes[i] is the course code with ID i
+
+    Representation Invariants:
+    - all(self._ids[self.codes[i]] == i for i in range(len(self.codes)))
+
+    >>> table = CourseCodeTable(['CSC110Y1', 'CSC111H1'])
+    >>> table.intern('MAT137Y1')
+    2
+    >>> table.intern('CSC111H1')
+    1
+    >>> table.get_code(2)
+    'MAT137Y1'
+    >>> table.get_id('STA130H1') is None
+    True
+    """
+    codes: list[str]
+    _ids: dict[str, int]
+    _lock: threading.Lock
+
+    def __init__(self, codes: Iterable[str] = ()) -> None:
+        self.codes = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        for code in codes:
+            self.intern(code)
+
+    def __len__(self) -> int:
+        """Return the number of course codes in the table"""
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        """Return whether the given course code has an ID"""
+        return code in self._ids
+
+    def intern(self, code: str) -> int:
+        """
+        Return the ID of the given course code, giving it the next free ID if it does not have one yet
+        """
+        course_id = self._ids.get(code)
+        if course_id is not None:
+            return course_id
+
+        # Courses that only appear in prereqs are interned while queries run, possibly from several threads at once
+        with self._lock:
+            course_id = self._ids.get(code)
+            if course_id is None:
+                course_id = len(self.codes)
+                self.codes.append(code)
+                self._ids[code] = course_id
+            return course_id
+
+    def get_id(self, code: str) -> Optional[int]:
+        """
+        Return the ID of the given course code, or None if it does not have one
+        """
+        return self._ids.get(code)
+
+    def get_code(self, course_id: int) -> str:
+        """
+        Return the course code with the given ID
+
+        Preconditions:
+        - 0 <= course_id < len(self)
+        """
+        return self.codes[course_id]
+
+    def intern_all(self, codes: Iterable[str]) -> set[int]:
+        """
+        Return the set of IDs of the given course codes, interning any that do not have an ID yet
+
+        >>> table = CourseCodeTable(['CSC110Y1', 'CSC111H1'])
+        >>> table.intern_all({'CSC111H1', 'MAT137Y1'}) == {1, 2}
+        True
+        """
+        return {self.intern(code) for code in codes}
+
+    def get_codes(self, course_ids: Iterable[int]) -> set[str]:
+        """
+        Return the set of course codes with the given IDs
+
+        >>> CourseCodeTable(['CSC110Y1', 'CSC111H1']).get_codes({1}) == {'CSC111H1'}
+        True
+        """
+        return {self.codes[course_id] for course_id in course_ids}
+
+    def intern_mask(self, codes: Iterable[str]) -> int:
+        """
+        Return the bitset of the given course codes, interning any that do not have an ID yet
+
+        >>> CourseCodeTable(['CSC110Y1', 'CSC111H1']).intern_mask({'CSC111H1', 'MAT137Y1'})
+        6
+        """
+        mask = 0
+        for code in codes:
+            mask |= 1 << self.intern(code)
+        return mask
+
+    def get_known_mask(self, codes: Iterable[str]) -> int:
+        """
+        Return the bitset of the given course codes that already have an ID, leaving out (without interning) the others
+
+        >>> CourseCodeTable(['CSC110Y1', 'CSC111H1']).get_known_mask({'CSC111H1', 'MAT137Y1'})
+        2
+        """
+        mask = 0
+        for code in codes:
+            course_id = self._ids.get(code)
+            if course_id is not None:
+                mask |= 1 << course_id
+        return mask
+
+    def get_mask_codes(self, mask: int) -> set[str]:
+        """
+        Return the set of course codes in the given bitset
+
+        >>> CourseCodeTable(['CSC110Y1', 'CSC111H1']).get_mask_codes(2) == {'CSC111H1'}
+        True
+        """
+        return {self.codes[course_id] for course_id in iter_ids(mask)}
+
+
+def ids_to_mask(course_ids: Iterable[int]) -> int:
+    """
+    Return the bitset of the given course IDs
+
+    >>> ids_to_mask([0, 3])
+    9
+    """
+    mask = 0
+    for course_id in course_ids:
+        mask |= 1 << course_id
+    return mask
+
+
+def iter_ids(mask: int) -> Iterator[int]:
+    """
+    Yield the course IDs in the given bitset, in increasing order
+
+    >>> list(iter_ids(9))
+    [0, 3]
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['threading'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -15,11 +15,15 @@ Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
 """
 
 from __future__ import annotations
-from typing import Optional
+from typing import Callable, Iterable, Optional
 
 import itertools
 from treelib import Tree
 
+from course_codes import CourseCodeTable, iter_ids
+from course_requirements import CompiledRequirement, minimize_combos
+from requirement_bdd import CompactRequirement
+
 
 class DatabaseCourse:
     """
@@ -27,27 +31,100 @@ class DatabaseCourse:
 
     Instance Attriutes:
         - code: course code
+        - course_id: the ID of the course code in the network's CourseCodeTable
         - credit_value: the credit value of the course
         - duration: the duration of the course in terms
-        - prerequisites: the list of all possible course combinations that fulfill the course's prerequisites
+        - prerequisites: the minimal list of course combinations that fulfill the course's prerequisites, as
+          bitsets of course IDs (see minimize_combos)
+        - prereqs_truncated: whether prerequisites only holds the cheapest of the course combinations that fulfill the
+          course's prereqs (e.g. because there are too many to list). is_satisfied still checks the full prereqs.
 
     Representation Invariants:
     - code is a valid course code in the dataset
 
     """
     code: str
+    course_id: int
     credit_value: float
     duration: int
-    prerequisites: list[set[str]]
+    prereqs_truncated: bool
+    _prerequisites: Optional[list[int]]
+    _prereq_loader: Optional[Callable[[], list[int]]]
+    _evaluator: Optional[CompiledRequirement | CompactRequirement]
+    _evaluator_loader: Optional[Callable[[], CompiledRequirement | CompactRequirement]]
 
-    def __init__(self, code: str, credit_value: float, duration: int) -> None:
+    def __init__(self, code: str, credit_value: float, duration: int, course_id: int) -> None:
         self.code = code
+        self.course_id = course_id
         self.credit_value = credit_value
         self.duration = duration
+        self.prereqs_truncated = False
+        self._prerequisites = None
+        self._prereq_loader = None
+        self._evaluator = None
+        self._evaluator_loader = None
+
+    @property
+    def prerequisites(self) -> list[int]:
+        """
+        The minimal list of course combinations (bitsets of course IDs) that fulfill the course's prerequisites
+
+        No combination contains another one, so the planner never expands an option that is strictly worse than
+        another. If the prereqs were added with a loader, they are computed the first time they are needed and then
+        stored, so only the courses a query actually reaches pay for their prereqs.
+        """
+        if self._prerequisites is None:
+            self._prerequisites = minimize_combos(self._prereq_loader()) if self._prereq_loader is not None else [0]
+            self._prereq_loader = None
+        return self._prerequisites
+
+    def add_prereqs(self, prereqs: list[int]) -> None:
+        """Set the courses prereqs (keeping only their minimal combinations)"""
+        self._prerequisites = minimize_combos(prereqs)
+        self._prereq_loader = None
+
+    def add_prereq_loader(self, loader: Callable[[], list[int]]) -> None:
+        """Set a function that computes the courses prereqs the first time they are needed"""
+        self._prerequisites = None
+        self._prereq_loader = loader
+
+    def add_evaluator_loader(self, loader: Callable[[], CompiledRequirement | CompactRequirement]) -> None:
+        """Set a function that compiles the courses prereq evaluator the first time it is needed"""
+        self._evaluator = None
+        self._evaluator_loader = loader
+
+    def is_satisfied(self, taken: int) -> bool:
+        """
+        Return whether the bitset of taken course IDs fulfills the courses prereqs
 
-    def add_prereqs(self, prereqs: list[set[str]]) -> None:
-        """Set the courses prereqs"""
-        self.prerequisites = prereqs
+        The prereqs are compiled into a flat evaluator the first time this is called. If no evaluator loader was set,
+        the evaluator is built from the courses prereq combinations.
+        """
+        return self._get_evaluator().is_satisfied(taken)
+
+    def get_prereq_courses(self) -> int:
+        """
+        Return the bitset of IDs of every course that may be needed to fulfill the courses prereqs: every course in
+        its prereq combinations, and (if they are truncated) every course its full prereqs check
+        """
+        courses = 0
+        for combo in self.prerequisites:
+            courses |= combo
+        if self.prereqs_truncated:
+            courses |= self._get_evaluator().get_courses()
+        return courses
+
+    def _get_evaluator(self) -> CompiledRequirement | CompactRequirement:
+        """
+        Return the evaluator of the courses prereqs, compiling it if it was not yet
+        """
+        if self._evaluator is None:
+            if self._evaluator_loader is not None:
+                self._evaluator = self._evaluator_loader()
+                self._evaluator_loader = None
+            else:
+                self._evaluator = CompiledRequirement.from_combos(self.prerequisites)
+        return self._evaluator
 
 
 class DatabaseCourseNetwork:
@@ -55,19 +132,26 @@ class DatabaseCourseNetwork:
     Graph to represent the database of all courses
 
     Instance Attributes:
-        - courses: a dictionary mapping course codes into DatabaseCourse objects
-        - courses_taken: the set of course that the user has already taken
+        - table: the table of IDs of every course code known to the network
+        - courses: a dictionary mapping course IDs into DatabaseCourse objects
+        - courses_taken: the bitset of IDs of the courses that the user has already taken
+
+    Codes in courses_taken that have no ID in the table yet are left out instead of being interned, so building a
+    network for a user's courses never grows the table shared by every user of the catalog.
 
     Representation Invariants:
     - courses_taken cotains a set of valid course code in the dataset
+    - all(self.courses[i].course_id == i for i in self.courses)
 
     """
-    courses: dict[str, DatabaseCourse]
-    courses_taken: set[str]
+    table: CourseCodeTable
+    courses: dict[int, DatabaseCourse]
+    courses_taken: int
 
-    def __init__(self, courses_taken: set[str]) -> None:
+    def __init__(self, courses_taken: set[str], table: Optional[CourseCodeTable] = None) -> None:
+        self.table = table if table is not None else CourseCodeTable()
         self.courses = {}
-        self.courses_taken = courses_taken
+        self.courses_taken = self.table.get_known_mask(courses_taken)
 
     def add_course(self, code: str) -> DatabaseCourse:
         """
@@ -86,9 +170,9 @@ class DatabaseCourseNetwork:
         else:
             raise ValueError
 
-        new_course = DatabaseCourse(code, credit, duration)
+        new_course = DatabaseCourse(code, credit, duration, self.table.intern(code))
 
-        self.courses[code] = new_course
+        self.courses[new_course.course_id] = new_course
 
         return new_course
 
@@ -98,198 +182,407 @@ class DatabaseCourseNetwork:
 
         If courses doesn't exit, return None
         """
+        course_id = self.table.get_id(code)
+        if course_id is None:
+            return None
+        return self.courses.get(course_id)
+
+    def get_course_by_id(self, course_id: int) -> DatabaseCourse | None:
+        """
+        Get the DatabaseCourse with the given course ID.
 
-        if code in self.courses:
-            return self.courses[code]
-        return None
+        If courses doesn't exit, return None
+        """
+        return self.courses.get(course_id)
 
-    def get_all_prereq_networks(self, start: DatabaseCourse) -> list[PlannerCourseNetwork]:
+    def with_courses_taken(self, courses_taken: set[str]) -> DatabaseCourseNetwork:
+        """
+        Return a network that shares this network's courses but has the given set of courses taken
+
+        The courses are not copied, so a single catalog network can answer queries for many different users.
+        """
+        network = DatabaseCourseNetwork(courses_taken, self.table)
+        network.courses = self.courses
+        return network
+
+    def get_all_prereq_networks(self, start: DatabaseCourse, distinct: bool = True) -> list[PlannerCourseNetwork]:
         """
         Get a list of every possible set of prereqs for the given courses, outputed as a list of PlannerCourseNetworks
 
+        Different prereq combinations can lead to the same network (e.g. when the user already has several of them).
+        If distinct is True, each network is only listed once (see PlannerCourseNetwork.signature).
+
+        A course that is its own (indirect) prereq cannot be taken before itself, so prereq combinations that would
+        need a course to be taken before itself are left out.
+
         Preconditions:
         - start is a valid course in the DatabaseCourseNetwork
         """
+        return self._get_prereq_networks(start, distinct, 0)
+
+    def _get_prereq_networks(self, start: DatabaseCourse, distinct: bool, above: int) -> list[PlannerCourseNetwork]:
+        """
+        Return every possible network for the given course (see get_all_prereq_networks) that takes none of the
+        courses in the given bitset of IDs, the courses the network will be taken before
+        """
         # If the current course has no prerequisites, the only planner network is the one with just the current
         # course
-        if start.prerequisites == [set()]:
+        if start.prerequisites == [0]:
             return [PlannerCourseNetwork(start)]
 
         # Get the list of possible prerequisites
         possible_prereqs = start.prerequisites
 
         networks = []
+        # The first network added with each set of courses, and the signatures of the networks whose courses were taken
+        # by an earlier network. Networks that take different courses are never duplicates, so the (slower) signature
+        # of a network is only found once another network takes the same courses
+        first_by_courses = {}
+        signatures = set()
+
+        def add_network(network: PlannerCourseNetwork) -> None:
+            """Add the given network, unless it is a duplicate and only distinct networks are wanted"""
+            if distinct:
+                first = first_by_courses.setdefault(network.course_ids, network)
+                if first is not network:
+                    signatures.add(first.signature)
+                    if network.signature in signatures:
+                        return
+                    signatures.add(network.signature)
+            networks.append(network)
 
         for req in possible_prereqs:
             # If the user already has the given set of prereqs, one planner network is the one with just the current
             # course
-            if req.issubset(self.courses_taken):
-                networks.append(PlannerCourseNetwork(start))
+            if req & self.courses_taken == req:
+                add_network(PlannerCourseNetwork(start))
+        # Only the cheapest prereq combinations of some courses are listed, so the user may fulfill the prereqs with
+        # another one
+        if start.prereqs_truncated and not networks and start.is_satisfied(self.courses_taken):
+            add_network(PlannerCourseNetwork(start))
         for reqs in possible_prereqs:
-            # Get a list of lists of all possible planner networks for the current prereqs courses
-            current_req_planner_networks = []
-            invalid_course = False
-            for req in reqs:
-                if req in self.courses_taken:
-                    continue
-
-                # If a course in the current set of prereqs is not in the network, that entire set of prereqs is invalid
-                course = self.get_course(req)
-                if course is not None:
-                    # Recursively get every possible planner network for the given course
-                    possible_req_planner_networks = self.get_all_prereq_networks(course)
-                    current_req_planner_networks.append(possible_req_planner_networks)
-                else:
-                    invalid_course = True
-
-            if invalid_course:
+            current_req_planner_networks = self._get_req_networks(start, reqs, distinct, above)
+            if current_req_planner_networks is None:
                 continue
 
-            # Get every possible combo of courses to fufill the current prereq set
-            possible_network_combos = [list(i) for i in itertools.product(*current_req_planner_networks)]
-            for prereq_network_combo in possible_network_combos:
-                if prereq_network_combo != []:
-                    # Get the full network for the current combo of prereqs
-                    merged_network = PlannerCourseNetwork()
-                    merged_network.merge_networks(list(prereq_network_combo), start)
-                    networks.append(merged_network)
+            # Get every possible combo of courses to fufill the current prereq set. Each network refers to the prereq
+            # networks of its combo instead of copying them, so combos share their prereq networks
+            for prereq_network_combo in itertools.product(*current_req_planner_networks):
+                if prereq_network_combo != ():
+                    add_network(PlannerCourseNetwork(start, prereq_network_combo))
 
         # Return all possible prereq networks
         return networks
 
+    def _get_req_networks(self, start: DatabaseCourse, reqs: int, distinct: bool, above: int) \
+            -> Optional[list[list[PlannerCourseNetwork]]]:
+        """
+        Return every possible network of every course in the given bitset of prereq IDs of start that has not been
+        taken, or None if one of them is not in the network or would be taken before itself (so that entire set of
+        prereqs is invalid)
+        """
+        above_prereqs = above | 1 << start.course_id
+        # Get a list of lists of all possible planner networks for the current prereqs courses
+        current_req_planner_networks = []
+        # Only the courses in the current set of prereqs that have not been taken need a network
+        for req in iter_ids(reqs & ~self.courses_taken):
+            course = self.courses.get(req)
+            if course is None or above_prereqs >> req & 1:
+                return None
+            # Recursively get every possible planner network for the given course
+            current_req_planner_networks.append(self._get_prereq_networks(course, distinct, above_prereqs))
+        return current_req_planner_networks
+
 
 class PlannerSlot:
     """
     A slot node object for the PlannerCourseNetwork
 
+    Slots are never changed once they are built, so a slot (and every slot taken before it) can be shared by any
+    number of PlannerCourseNetworks. The length and courses of the plan ending with the slot are stored with it.
+    Slots should be built with build_slot, which keeps one slot per course in a plan.
+
     Instace Attributes:
         - data: the DatabaseCourse that is stored in the slot
-        - next_course: the next course to take according to planner
+        - prereqs: the slots to take before this one, according to planner
+        - length: the duration of the longest sequence of courses ending with this slot, in terms
+        - course_ids: the bitset of IDs of the course in this slot and every course in the slots taken before it
+        - two_term_ids: the bitset of IDs of every two term (Y) course in course_ids
+
+    Representation Invariants:
+    - No two different slots taken before this one (directly or not) store the same course
     """
+    __slots__ = ('data', 'prereqs', 'length', 'course_ids', 'two_term_ids', '_signature')
     data: DatabaseCourse
-    next_course: Optional[PlannerSlot]
+    prereqs: tuple[PlannerSlot, ...]
+    length: int
+    course_ids: int
+    two_term_ids: int
+    _signature: Optional[tuple[int, frozenset[tuple]]]
 
-    def __init__(self, data: DatabaseCourse) -> None:
+    def __init__(self, data: DatabaseCourse, prereqs: tuple[PlannerSlot, ...] = ()) -> None:
         self.data = data
-        self.next_course = None
+        self.prereqs = prereqs
+        self._signature = None
+        self.length = max((prereq.length for prereq in prereqs), default=0)
+        self.course_ids = 0
+        self.two_term_ids = 0
+        for prereq in prereqs:
+            self.course_ids |= prereq.course_ids
+            self.two_term_ids |= prereq.two_term_ids
+
+        for course in data if isinstance(data, set) else (data,):
+            self.course_ids |= 1 << course.course_id
+            if course.duration == 2:
+                self.two_term_ids |= 1 << course.course_id
+        self.length += 1 if isinstance(data, set) else data.duration
+
+    @property
+    def signature(self) -> tuple[int, frozenset[tuple]]:
+        """
+        The canonical signature of the plan ending with this slot: the key of its course and the set of signatures of
+        its prereq slots. Since a plan has one slot per course, two plans have the same signature exactly when they
+        take the same courses in the same order.
+
+        A frozenset remembers its hash, so hashing a signature does not walk the whole plan.
+        """
+        if self._signature is None:
+            self._signature = (_get_slot_key(self), frozenset(prereq.signature for prereq in self.prereqs))
+        return self._signature
 
 
 class PlannerCourseNetwork:
     """
     Tree-like network to represnt the sequence of courses to take
 
+    The network only refers to its last slot, and every slot refers to the slots taken before it, so networks that
+    take the same prereq plans share them instead of copying them.
+
     Instance Attributes:
-        - starts: list of starting slots in the planner
-        - courses: list of all slots in the planner
-        - end: the last course in the planner (root)
-        - length: the duration of the longest sequence of courses in the planner, in terms
+        - end: the last course in the planner (root), or None if the planner is empty
+        - proven_optimal: whether the planner that built the network proved it is the best one (planners that may
+          stop early, like the anytime search in planner, set this to False when they did not)
     """
-    starts: list[PlannerSlot]
-    courses: list[PlannerSlot]
-    end: PlannerSlot
-    length: int
+    end: Optional[PlannerSlot]
+    proven_optimal: bool
 
-    def __init__(self, course: [DatabaseCourse | None] = None) -> None:
-        if course is not None:
-            slot = PlannerSlot(course)
-            self.courses = [slot]
-            self.starts = [slot]
-            self.end = slot
-            if not isinstance(course, set):
-                self.length = course.duration
-            else:
-                self.length = 1
+    def __init__(self, course: [DatabaseCourse | PlannerSlot | None] = None,
+                 prereqs: Iterable[PlannerCourseNetwork] = ()) -> None:
+        """
+        Initialize a network that takes the given prereq networks and then the given course (or that ends with the
+        given slot)
+        """
+        self.proven_optimal = True
+        if course is None or isinstance(course, PlannerSlot):
+            self.end = course
         else:
-            self.starts = []
-            self.courses = []
-            self.length = 0
+            self.end = build_slot(course, (network.end for network in prereqs))
 
-    def merge_networks(self, networks: list[PlannerCourseNetwork], end: DatabaseCourse) -> None:
+    @property
+    def length(self) -> int:
         """
-        Merge a list of PlannerCourseNetworks to all end at a slot containing the given DatabaseCourse
+        The duration of the longest sequence of courses in the planner, in terms
         """
-        for network in networks:
-            for start in network.starts:
-                self.starts.append(start)
-            for course in network.courses:
-                self.courses.append(course)
+        return self.end.length if self.end is not None else 0
 
-        slot = PlannerSlot(end)
-        self.courses.append(slot)
+    @property
+    def course_ids(self) -> int:
+        """
+        The bitset of IDs of every course in the planner
+        """
+        return self.end.course_ids if self.end is not None else 0
 
-        for network in networks:
-            network.end.next_course = slot
+    @property
+    def two_term_ids(self) -> int:
+        """
+        The bitset of IDs of every two term (Y) course in the planner
+        """
+        return self.end.two_term_ids if self.end is not None else 0
 
-        self.end = slot
-        self.length = max([n.length for n in networks]) + end.duration
+    @property
+    def signature(self) -> Optional[tuple[int, frozenset[tuple]]]:
+        """
+        The canonical signature of the planner (see PlannerSlot.signature), or None if the planner is empty
+        """
+        return self.end.signature if self.end is not None else None
+
+    @property
+    def courses(self) -> list[PlannerSlot]:
+        """
+        Every slot in the planner, each slot after the slots taken before it
+        """
+        courses = []
+        seen = set()
+        stack = [(self.end, False)] if self.end is not None else []
+        while stack:
+            slot, expanded = stack.pop()
+            if expanded:
+                courses.append(slot)
+            elif id(slot) not in seen:
+                seen.add(id(slot))
+                stack.append((slot, True))
+                stack.extend((prereq, False) for prereq in reversed(slot.prereqs))
+        return courses
+
+    @property
+    def starts(self) -> list[PlannerSlot]:
+        """
+        The starting slots in the planner
+        """
+        return [slot for slot in self.courses if slot.prereqs == ()]
 
     def __str__(self) -> str:
         """
         Return the string representation of the PlannerCourseNetwork
         """
-
-        helper_dict = []
-        root = ''
-
-        for course in self.courses:
-            if course.next_course is not None:
-                key = course.next_course.data.code
-                val = course.data.code
-                helper_dict.append((key, val))
-            else:
-                root = course.data.code
-
         tree = Tree()
-        tree.create_node(root, root)
-
-        self._str_recur_helper(tree, helper_dict, root)
+        if self.end is not None:
+            root = self.end.data.code
+            tree.create_node(root, root)
+            self._str_recur_helper(tree, self.end, set())
 
         ret = str(tree)
         return ret
 
-    def _str_recur_helper(self, tree: Tree, helper_dict: list, root: str) -> Tree:
+    def _str_recur_helper(self, tree: Tree, slot: PlannerSlot, visited: set[int]) -> Tree:
         """
         recursive helper function for __str__
-        """
 
-        s = [p[1] for p in helper_dict if p[0] == root]
-
-        for prereq in s:
-            if not tree.contains(prereq):
-                tree.create_node(prereq, prereq, parent=root)
+        visited holds the ids of the slots already added with their prereqs, so shared slots are only walked once.
+        """
+        visited.add(id(slot))
+        root = slot.data.code
+        for prereq in slot.prereqs:
+            if not tree.contains(prereq.data.code):
+                tree.create_node(prereq.data.code, prereq.data.code, parent=root)
 
-        for prereq in s:
-            self._str_recur_helper(tree, helper_dict, prereq)
+        for prereq in slot.prereqs:
+            if id(prereq) not in visited:
+                self._str_recur_helper(tree, prereq, visited)
 
         return tree
 
-    def get_number_of_credits(self, visited: set[str]) -> int:
+    def get_number_of_credits(self, visited: int) -> int:
         """
-        Return the number of credits required to complete the given network
+        Return the number of credits required to complete the given network, not counting the courses in the bitset
+        visited
         """
         # Note Y courses are counted as 2 credits and H courses are counted as 1 credit so the credits for a network
-        # can be stored as an int
-        credits_so_far = 0
-
-        for course in self.courses:
-            # If the course prereqs are a set, go through each course in the set
-            if isinstance(course, set):
-                for c in course:
-                    credits_so_far, visited = get_number_of_credits(c.data, visited, credits_so_far)
+        # can be stored as an int. The courses of the network are tracked as it is merged, so this is just a count of
+        # the bits of the courses (and of the Y courses) that were not visited
+        remaining = self.course_ids & ~visited
+        return remaining.bit_count() + (remaining & self.two_term_ids).bit_count()
+
+    def get_number_of_courses(self, visited: int) -> int:
+        """
+        Return the number of courses required to complete the given network, not counting the courses in the bitset
+        visited
+        """
+        return (self.course_ids & ~visited).bit_count()
+
+
+def build_slot(data: DatabaseCourse, prereqs: Iterable[PlannerSlot]) -> PlannerSlot:
+    """
+    Return a slot of the given course that is taken after the given slots, with one slot per course in its plan (see
+    merge_slots)
+    """
+    return PlannerSlot(data, merge_slots(prereqs))
+
+
+def merge_slots(slots: Iterable[PlannerSlot]) -> tuple[PlannerSlot, ...]:
+    """
+    Return the given slots, rebuilt so that there is one slot per course among all of their plans
+
+    When the slots take the same course in different slots (e.g. two prereqs both need MAT137Y1), only the shortest of
+    those slots (the one with the fewest credits, if there is a tie) is kept, and the slots that took the others are
+    rebuilt to take it instead. This never makes a plan longer or take more courses. A kept slot can never end up being
+    taken before itself, since every slot is longer than the kept slots taken before it.
+    """
+    prereqs = tuple(slots)
+
+    # The plan of each slot already has one slot per course, so only the courses taken by more than one of them can
+    # have more than one slot
+    course_ids = 0
+    shared_ids = 0
+    for prereq in prereqs:
+        shared_ids |= course_ids & prereq.course_ids
+        course_ids |= prereq.course_ids
+    if shared_ids == 0:
+        return prereqs
+
+    best, conflict_ids = _find_best_slots(prereqs, shared_ids)
+    if conflict_ids == 0:
+        return prereqs
+
+    merged = {}
+
+    def merge(slot: PlannerSlot) -> PlannerSlot:
+        """Return the slot that replaces the given slot, taking the merged slots of the best slot's prereqs"""
+        if not slot.course_ids & conflict_ids:
+            return slot
+        key = _get_slot_key(slot)
+        if key not in merged:
+            kept = best[key]
+            kept_prereqs = tuple(merge(prereq) for prereq in kept.prereqs)
+            if all(new is old for new, old in zip(kept_prereqs, kept.prereqs)):
+                merged[key] = kept
             else:
-                credits_so_far, visited = get_number_of_credits(course.data, visited, credits_so_far)
-        return credits_so_far
+                merged[key] = PlannerSlot(kept.data, kept_prereqs)
+        return merged[key]
 
+    return tuple(merge(prereq) for prereq in prereqs)
 
-def get_number_of_credits(db_course: DatabaseCourse, visited: set[str], curr_credits: int) -> tuple[int, set[str]]:
+
+def _find_best_slots(prereqs: tuple[PlannerSlot, ...], shared_ids: int) -> tuple[dict[int, PlannerSlot], int]:
+    """
+    Return the best slot (see merge_slots) of every course with a slot in the plans of the given slots whose plan takes
+    a course in the given bitset of shared IDs, keyed by _get_slot_key, and the bitset of IDs of the courses with more
+    than one slot
     """
-    Return the number of credits so far for the current planner network and the set of visited
-    courses after the given course has been checked
+    best = {}
+    conflict_ids = 0
+    seen = set()
+    stack = list(prereqs)
+    while stack:
+        slot = stack.pop()
+        if id(slot) in seen or not slot.course_ids & shared_ids:
+            continue
+        seen.add(id(slot))
+        key = _get_slot_key(slot)
+        if key not in best:
+            best[key] = slot
+        else:
+            conflict_ids |= 1 << key
+            if _get_slot_cost(slot) < _get_slot_cost(best[key]):
+                best[key] = slot
+        stack.extend(slot.prereqs)
+    return best, conflict_ids
+
+
+def _get_slot_key(slot: PlannerSlot) -> int:
+    """
+    Return the key of the course stored in the given slot: its course ID, or a key no other slot has for a slot of a
+    set of courses (which is never merged)
+    """
+    return slot.data.course_id if not isinstance(slot.data, set) else -id(slot) - 1
+
+
+def _get_slot_cost(slot: PlannerSlot) -> tuple[int, int]:
+    """
+    Return the (length, credits) of the plan ending with the given slot
+    """
+    return slot.length, slot.course_ids.bit_count() + slot.two_term_ids.bit_count()
+
+
+def get_combo_duration(table: CourseCodeTable, combo: int) -> int:
+    """
+    Return the total duration (in terms) of the courses in the given bitset of course IDs in table
+
+    >>> get_combo_duration(CourseCodeTable(['CSC110Y1', 'CSC111H1', 'MAT137Y1']), 0b011)
+    3
     """
-    if db_course.code not in visited:
-        return (db_course.duration + curr_credits, visited.union({db_course.code}))
-    else:
-        return (curr_credits, visited)
+    # Like in add_course, the second last character of a course code is H for one term courses and Y for two term ones
+    return sum(2 if table.get_code(course_id)[-2] == 'Y' else 1 for course_id in iter_ids(combo))
 
 
 if __name__ == '__main__':
@@ -297,7 +590,7 @@ if __name__ == '__main__':
     import doctest
     doctest.testmod()
     python_ta.check_all(config={
-        'extra-imports': ['treelib', 'itertools'],
+        'extra-imports': ['treelib', 'itertools', 'course_codes', 'course_requirements', 'requirement_bdd'],
         'allowed-io': [''],
         'max-line-length': 120
     })
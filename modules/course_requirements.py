@@ -14,7 +14,26 @@ Toronto.
 Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
 """
 from __future__ import annotations
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, Iterator, Optional
+
+import heapq
+import itertools
+import threading
+import weakref
+
+from course_codes import CourseCodeTable
+from requirement_bdd import TRUE, BDDLimitError, CompactRequirement, RequirementBDD
+
+# Requirements estimated to have at least this many possible course combinations are kept in their compact (BDD) form
+# instead of being expanded into every combination
+DNF_SIZE_LIMIT = 10000
+
+# The number of cheapest combinations the planner considers for a requirement kept in its compact form
+COMPACT_COMBO_LIMIT = 32
+
+# The most BDD nodes a single requirement may add to the shared store
+BDD_NODE_BUDGET = 50000
 
 
 class RequirementTree:
@@ -26,6 +45,11 @@ class RequirementTree:
     _left: The left requirement tree
     _right: The right requirement tree
 
+    Trees returned by parse_course_requirements are shared between every course with the same requirements (see
+    RequirementCache), so they must not be changed after they are built. For the same reason, the lists returned by
+    get_possible_true_combos and get_possible_true_masks are computed once per node and shared, and must not be
+    mutated.
+
     Representation Invariants:
     - self._left is None == self._right is None
     - self._left is None == self._sep is None and self._right is None == self._sep is None
@@ -34,18 +58,26 @@ class RequirementTree:
     _sep: Optional[str]
     _left: Optional[RequirementTree]
     _right: Optional[RequirementTree]
+    _combos: Optional[list[set[str]]]
+    _masks: Optional[tuple[CourseCodeTable, list[int]]]
+    _compiled: Optional[tuple[CourseCodeTable, CompiledRequirement]]
+    _compact: Optional[tuple[CourseCodeTable, Optional[CompactRequirement]]]
 
     def __init__(self, text: str) -> None:
         self._text = text
         self._right = None
         self._left = None
         self._sep = None
+        self._combos = None
+        self._masks = None
+        self._compiled = None
+        self._compact = None
 
     def get_truth_value(self, user_courses: set[str]) -> bool:
         """
         Return whether or not the given courses fufill the requirements for the given node
         """
-        if is_course_format(self._text) or self._text == '':
+        if self._sep is None:
             # Base case - self._text is just a single courses
             # If the text is empty - There are no specific prereqs
             return self._text in user_courses or self._text == ''
@@ -61,7 +93,7 @@ class RequirementTree:
         """
         Return all leaves linked to the node (Including itself possibly)
         """
-        if self._text == '' or is_course_format(self._text):
+        if self._sep is None:
             return {self._text}
         else:
             leaves_so_far = set()
@@ -77,10 +109,18 @@ class RequirementTree:
         >>> all(course.get_truth_value(i) is True for i in course.get_possible_true_combos())
         True
         """
+        if self._combos is None:
+            self._combos = self._compute_possible_true_combos()
+        return self._combos
+
+    def _compute_possible_true_combos(self) -> list[set[str]]:
+        """
+        Compute the result of get_possible_true_combos (using the stored results of the subtrees)
+        """
         if self._text == '':
             # Base case - No text in tree text, no prerequsities
             return [set()]
-        elif is_course_format(self._text):
+        elif self._sep is None:
             # Second base case, text is just a course
             return [{self._text}]
         else:
@@ -98,17 +138,276 @@ class RequirementTree:
                 # node to have a truth value of true
 
                 combos_so_far = []
+                seen = set()
 
                 for left in left_rec:
                     for right in right_rec:
-                        if left.union(right) not in combos_so_far:
-                            combos_so_far.append(left.union(right))
+                        combo = frozenset(left.union(right))
+                        if combo not in seen:
+                            seen.add(combo)
+                            combos_so_far.append(set(combo))
                 return combos_so_far
             else:
                 # If the separator is or, either the left or right nodes must return true for the
                 # node to have a truth value of true
                 return left_rec + right_rec
 
+    def get_possible_true_masks(self, table: CourseCodeTable) -> list[int]:
+        """
+        Return all possible course combinations that make the given node return a truth value of true, as bitsets of
+        the course IDs in the given table (in the same order as get_possible_true_combos)
+
+        >>> table = CourseCodeTable(['CSC110Y1', 'CSC108H1', 'CSC148H1'])
+        >>> parse_course_requirements('CSC110Y1|(CSC108H1^CSC148H1)').get_possible_true_masks(table)
+        [1, 6]
+        """
+        if self._masks is None or self._masks[0] is not table:
+            self._masks = (table, self._compute_possible_true_masks(table))
+        return self._masks[1]
+
+    def _compute_possible_true_masks(self, table: CourseCodeTable) -> list[int]:
+        """
+        Compute the result of get_possible_true_masks (using the stored results of the subtrees)
+        """
+        if self._text == '':
+            # Base case - No text in tree text, no prerequsities
+            return [0]
+        elif self._sep is None:
+            # Second base case, text is just a course
+            return [1 << table.intern(self._text)]
+        else:
+            left_rec = self._left.get_possible_true_masks(table) if self._left is not None else []
+            right_rec = self._right.get_possible_true_masks(table) if self._right is not None else []
+            if self._sep == '^':
+                # Every union of a left and right combo, with duplicates removed by a hash set (dicts keep the order)
+                return list(dict.fromkeys(left | right for left in left_rec for right in right_rec))
+            else:
+                return left_rec + right_rec
+
+    def iter_possible_true_masks(self, table: CourseCodeTable, cost: Callable[[int], int]) -> Iterator[int]:
+        """
+        Lazily yield the possible course combinations of this node (as bitsets of course IDs in the given table),
+        without duplicates, in nondecreasing order of cost
+
+        cost must be the sum of a nonnegative cost of every course in a combination (e.g. its total credits). Only
+        as many combinations as are consumed are ever built, so taking the first few is cheap even when the full
+        expansion would be huge.
+
+        >>> table = CourseCodeTable(['CSC110Y1', 'CSC108H1', 'CSC148H1', 'MAT137Y1'])
+        >>> tree = parse_course_requirements('(CSC110Y1|(CSC108H1^CSC148H1))^(MAT137Y1|CSC108H1)')
+        >>> combos = list(tree.iter_possible_true_masks(table, int.bit_count))
+        >>> [combo.bit_count() for combo in combos]
+        [2, 2, 2, 3]
+        >>> sorted(combos) == sorted(tree.get_possible_true_masks(table))
+        True
+        """
+        for _, mask in self._iter_costed_masks(table, cost):
+            yield mask
+
+    def _iter_costed_masks(self, table: CourseCodeTable, cost: Callable[[int], int]) -> Iterator[tuple[int, int]]:
+        """
+        Lazily yield (cost, combination) pairs for iter_possible_true_masks, without duplicates, in nondecreasing order
+        of cost
+        """
+        if self._sep is None:
+            mask = 0 if self._text == '' else 1 << table.intern(self._text)
+            yield cost(mask), mask
+            return
+
+        if self._sep == '|':
+            # Merge the (sorted) streams of both sides
+            pairs = heapq.merge(self._left._iter_costed_masks(table, cost), self._right._iter_costed_masks(table, cost))
+        else:
+            shared = self._left._get_leaf_mask(table) & self._right._get_leaf_mask(table)
+            pairs = _iter_costed_unions(_LazyStream(self._left._iter_costed_masks(table, cost)),
+                                        _LazyStream(self._right._iter_costed_masks(table, cost)), cost, cost(shared))
+
+        seen = set()
+        for combo_cost, mask in pairs:
+            if mask not in seen:
+                seen.add(mask)
+                yield combo_cost, mask
+
+    def _get_leaf_mask(self, table: CourseCodeTable) -> int:
+        """
+        Return the bitset of every course (ID in the given table) that appears in this node
+        """
+        if self._sep is None:
+            return 0 if self._text == '' else 1 << table.intern(self._text)
+        return self._left._get_leaf_mask(table) | self._right._get_leaf_mask(table)
+
+    def estimate_combo_count(self) -> int:
+        """
+        Return an upper bound on the number of possible course combinations of this node, without building them
+
+        >>> parse_course_requirements('(CSC110Y1|CSC108H1|CSC148H1)^(MAT137Y1|MAT157Y1)').estimate_combo_count()
+        6
+        """
+        if self._sep is None:
+            return 1
+        if self._sep == '|':
+            return self._left.estimate_combo_count() + self._right.estimate_combo_count()
+        return self._left.estimate_combo_count() * self._right.estimate_combo_count()
+
+    def is_explosive(self) -> bool:
+        """
+        Return whether this node is estimated to have too many possible course combinations to build them all (at
+        least DNF_SIZE_LIMIT)
+
+        >>> def requirement(sizes: list[int]) -> RequirementTree:
+        ...     return parse_course_requirements('^'.join('(' + '|'.join(f'AAA{100 + 10 * group + i}H1' for i in
+        ...                                                            range(size)) + ')'
+        ...                                              for group, size in enumerate(sizes)))
+        >>> requirement([10, 10, 10, 10]).is_explosive()
+        True
+        >>> requirement([10, 10, 10, 9]).is_explosive()
+        False
+        """
+        return self.estimate_combo_count() >= DNF_SIZE_LIMIT
+
+    def to_compact(self, table: CourseCodeTable, bdd: Optional[RequirementBDD] = None) \
+            -> Optional[CompactRequirement]:
+        """
+        Return this requirement as a BDD over the course IDs in the given table, sharing nodes with every other
+        requirement in bdd (by default, the store of the table, see get_table_bdd), or None if it needs more than
+        BDD_NODE_BUDGET new nodes (or family nodes)
+
+        >>> table = CourseCodeTable(['CSC110Y1', 'CSC108H1', 'CSC148H1', 'MAT137Y1'])
+        >>> compact = parse_course_requirements('(CSC110Y1|(CSC108H1^CSC148H1))^MAT137Y1').to_compact(table)
+        >>> compact.is_satisfied(table.intern_mask({'CSC108H1', 'CSC148H1', 'MAT137Y1'}))
+        True
+        """
+        if self._compact is None or self._compact[0] is not table:
+            if bdd is None:
+                bdd = get_table_bdd(table)
+            try:
+                root = self._build_bdd(table, bdd, len(bdd.nodes) + BDD_NODE_BUDGET)
+                compact = CompactRequirement(bdd, root, len(bdd.families) + BDD_NODE_BUDGET)
+            except BDDLimitError:
+                compact = None
+            self._compact = (table, compact)
+        return self._compact[1]
+
+    def _build_bdd(self, table: CourseCodeTable, bdd: RequirementBDD, limit: int) -> int:
+        """
+        Return the BDD node of this node, adding its nodes to bdd
+
+        Raise a BDDLimitError if bdd would hold more than limit nodes.
+        """
+        if self._sep is None:
+            return TRUE if self._text == '' else bdd.var(table.intern(self._text), limit)
+        left = self._left._build_bdd(table, bdd, limit)
+        right = self._right._build_bdd(table, bdd, limit)
+        if self._sep == '|':
+            return bdd.disjoin(left, right, limit)
+        return bdd.conjoin(left, right, limit)
+
+    def get_cheapest_masks(self, table: CourseCodeTable, cost: Callable[[int], int], limit: int) -> list[int]:
+        """
+        Return (at most) the limit cheapest possible course combinations of this node, as bitsets of course IDs in
+        the given table, in nondecreasing order of cost
+
+        Only the returned combinations are built, by walking the compact form of the requirement, or by the lazy
+        enumeration of iter_possible_true_masks if the compact form is too large.
+        """
+        compact = self.to_compact(table)
+        if compact is not None:
+            combos = compact.iter_cheapest_masks(cost)
+        else:
+            combos = self.iter_possible_true_masks(table, cost)
+        return list(itertools.islice(combos, limit))
+
+    def get_evaluator(self, table: CourseCodeTable) -> CompiledRequirement | CompactRequirement:
+        """
+        Return an evaluator of this requirement over the course IDs in the given table: its compact form if it is
+        explosive (see is_explosive) and the compact form is small enough, and its compiled form otherwise
+        """
+        if self.is_explosive():
+            compact = self.to_compact(table)
+            if compact is not None:
+                return compact
+        return self.compile(table)
+
+    def compile(self, table: CourseCodeTable) -> CompiledRequirement:
+        """
+        Return this requirement compiled into a flat evaluator over the course IDs in the given table
+
+        >>> table = CourseCodeTable(['CSC110Y1', 'CSC108H1', 'CSC148H1', 'MAT137Y1'])
+        >>> evaluator = parse_course_requirements('(CSC110Y1|(CSC108H1^CSC148H1))^MAT137Y1').compile(table)
+        >>> evaluator.is_satisfied(table.intern_mask({'CSC108H1', 'CSC148H1', 'MAT137Y1'}))
+        True
+        >>> evaluator.is_satisfied(table.intern_mask({'CSC108H1', 'MAT137Y1'}))
+        False
+        """
+        if self._compiled is None or self._compiled[0] is not table:
+            program = []
+            self._compile_into(table, program)
+            self._compiled = (table, CompiledRequirement(program))
+        return self._compiled[1]
+
+    def _compile_into(self, table: CourseCodeTable, program: list[tuple[int, int]]) -> None:
+        """
+        Append the postfix instructions that evaluate this node to program
+
+        A chain of the same separator is compiled as a single n-ary instruction, and all the single courses in the
+        chain are combined into one bitset test.
+        """
+        if self._sep is None:
+            program.append((ALL_OF, 0 if self._text == '' else 1 << table.intern(self._text)))
+            return
+
+        # Gather the operands of the whole chain of this separator
+        operands = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._sep == self._sep:
+                stack.append(node._right)
+                stack.append(node._left)
+            else:
+                operands.append(node)
+
+        leaves = 0
+        always_true = False
+        subtrees = []
+        for operand in operands:
+            if operand._sep is not None:
+                subtrees.append(operand)
+            elif operand._text == '':
+                # An empty requirement is always met
+                always_true = True
+            else:
+                leaves |= 1 << table.intern(operand._text)
+
+        if self._sep == '|' and always_true:
+            program.append((ALL_OF, 0))
+            return
+
+        count = len(subtrees)
+        if leaves != 0 or count == 0:
+            program.append((ALL_OF if self._sep == '^' else ANY_OF, leaves))
+            count += 1
+        for subtree in subtrees:
+            subtree._compile_into(table, program)
+        if count > 1:
+            program.append((AND if self._sep == '^' else OR, count))
+
+    def is_same_tree(self, other: RequirementTree) -> bool:
+        """
+        Return whether this tree and other have the same shape, with the same text and separator at every node
+
+        >>> tree = parse_course_requirements('(CSC108H1^CSC148H1)|CSC111H1', None)
+        >>> tree.is_same_tree(parse_course_requirements('(CSC108H1^CSC148H1)|CSC111H1', None))
+        True
+        >>> tree.is_same_tree(parse_course_requirements('CSC111H1|(CSC108H1^CSC148H1)', None))
+        False
+        """
+        if self._text != other._text or self._sep != other._sep:
+            return False
+        if self._left is None or other._left is None:
+            return self._left is None and other._left is None
+        return self._left.is_same_tree(other._left) and self._right.is_same_tree(other._right)
+
     def set_node_attributes(self, sep: str, left: RequirementTree, right: RequirementTree) -> None:
         """
         Set the attributes of the given node
@@ -118,10 +417,266 @@ class RequirementTree:
         self._right = right
 
 
-def parse_course_requirements(requirements: str) -> RequirementTree:
+class _LazyStream:
+    """
+    A sequence view of an iterator, that only pulls items from the iterator when they are first indexed
+
+    Instance Attributes:
+        - items: the items pulled from the iterator so far
+    """
+    items: list
+    _iterator: Iterator
+
+    def __init__(self, iterator: Iterator) -> None:
+        self.items = []
+        self._iterator = iterator
+
+    def has(self, index: int) -> bool:
+        """
+        Return whether the iterator has an item at the given index, pulling items up to it if needed
+        """
+        while len(self.items) <= index:
+            item = next(self._iterator, None)
+            if item is None:
+                return False
+            self.items.append(item)
+        return True
+
+
+def _iter_costed_unions(left: _LazyStream, right: _LazyStream, cost: Callable[[int], int],
+                        shared_cost: int) -> Iterator[tuple[int, int]]:
+    """
+    Lazily yield (cost, left | right) for every pair of a left and right combination, in nondecreasing order of cost,
+    where left and right are streams of (cost, combination) pairs in nondecreasing order of cost, and shared_cost is
+    the cost of every course that can appear on both sides
+
+    Pairs (i, j) are explored in order of a lower bound on the cost of their union, which never decreases along i or j.
+    A union is only yielded once no unexplored pair can have a smaller lower bound, so only the pairs near the cheapest
+    unions are ever built. When the two sides share no courses the bound is exact, and every explored pair is yielded
+    as soon as it is built.
+    """
+    def lower_bound(i: int, j: int) -> int:
+        """Return a lower bound on the cost of the union of left combination i and right combination j"""
+        left_cost, right_cost = left.items[i][0], right.items[j][0]
+        return max(left_cost, right_cost, left_cost + right_cost - shared_cost)
+
+    if not left.has(0) or not right.has(0):
+        return
+
+    # Heap of (lower bound, i, j) of the pairs to explore next, and heap of (cost, union) of explored pairs
+    frontier = [(lower_bound(0, 0), 0, 0)]
+    explored = []
+    while frontier:
+        bound, i, j = heapq.heappop(frontier)
+        while explored and explored[0][0] <= bound:
+            yield heapq.heappop(explored)
+
+        union = left.items[i][1] | right.items[j][1]
+        heapq.heappush(explored, (cost(union), union))
+
+        # Every pair is pushed exactly once: (i + 1, j) from (i, j), and (0, j + 1) from (0, j)
+        if left.has(i + 1):
+            heapq.heappush(frontier, (lower_bound(i + 1, j), i + 1, j))
+        if i == 0 and right.has(j + 1):
+            heapq.heappush(frontier, (lower_bound(0, j + 1), 0, j + 1))
+
+    while explored:
+        yield heapq.heappop(explored)
+
+
+# The instructions of a CompiledRequirement
+# (ALL_OF, mask): push whether every course in mask was taken
+# (ANY_OF, mask): push whether any course in mask was taken
+# (AND, n) / (OR, n): pop n values and push whether all / any of them are true
+ALL_OF = 0
+ANY_OF = 1
+AND = 2
+OR = 3
+
+
+class CompiledRequirement:
+    """
+    A course requirement compiled into a flat postfix program over bitsets of course IDs, which is evaluated with a
+    single loop instead of a recursive walk of a RequirementTree
+
+    Instance Attributes:
+        - program: the list of instructions, each an (opcode, argument) pair (see ALL_OF, ANY_OF, AND and OR)
+
+    Representation Invariants:
+    - self.program != []
+
+    >>> CompiledRequirement.from_combos([0b011, 0b100]).is_satisfied(0b110)
+    True
+    >>> CompiledRequirement.from_combos([0b011, 0b100]).is_satisfied(0b010)
+    False
+    """
+    program: list[tuple[int, int]]
+
+    def __init__(self, program: list[tuple[int, int]]) -> None:
+        self.program = program
+
+    @staticmethod
+    def from_combos(combos: list[int]) -> CompiledRequirement:
+        """
+        Return the evaluator for a requirement given as its list of possible course combinations (as bitsets)
+        """
+        if not combos:
+            # No combination of courses fulfills the requirement
+            return CompiledRequirement([(ANY_OF, 0)])
+        program = [(ALL_OF, combo) for combo in combos]
+        if len(combos) > 1:
+            program.append((OR, len(combos)))
+        return CompiledRequirement(program)
+
+    def is_satisfied(self, taken: int) -> bool:
+        """
+        Return whether the bitset of taken courses fulfills the requirement
+        """
+        program = self.program
+        if len(program) == 1:
+            opcode, arg = program[0]
+            return taken & arg == arg if opcode == ALL_OF else taken & arg != 0
+
+        stack = []
+        for opcode, arg in program:
+            if opcode == ALL_OF:
+                stack.append(taken & arg == arg)
+            elif opcode == ANY_OF:
+                stack.append(taken & arg != 0)
+            else:
+                values = stack[-arg:]
+                del stack[-arg:]
+                stack.append(all(values) if opcode == AND else any(values))
+        return stack[0]
+
+    def get_courses(self) -> int:
+        """
+        Return the bitset of IDs of every course the requirement checks
+
+        >>> CompiledRequirement.from_combos([0b011, 0b100]).get_courses()
+        7
+        """
+        courses = 0
+        for opcode, arg in self.program:
+            if opcode in (ALL_OF, ANY_OF):
+                courses |= arg
+        return courses
+
+
+class RequirementCache:
+    """
+    A bounded least recently used cache of parsed course requirements, keyed by requirement text
+
+    Since a node's subtree only depends on its text, the cache is used both for whole requirement strings and for every
+    node built while parsing. Courses with the same requirements, or the same sub-requirements (e.g. the same calculus
+    alternatives), then share one tree, and the combos stored on that tree are only computed once.
+
+    Instance Attributes:
+        - maxsize: the maximum number of trees kept in the cache
+        - hits: the number of lookups that found a tree
+        - misses: the number of lookups that did not find a tree
+
+    Representation Invariants:
+    - len(self._trees) <= self.maxsize
+
+    >>> cache = RequirementCache(maxsize=10)
+    >>> parse_course_requirements('CSC108H1^CSC148H1', cache) is parse_course_requirements('CSC108H1^CSC148H1', cache)
+    True
+    >>> cache.hits
+    1
+    """
+    maxsize: int
+    hits: int
+    misses: int
+    _trees: OrderedDict[str, RequirementTree]
+    _lock: threading.Lock
+
+    def __init__(self, maxsize: int = 100000) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of trees in the cache"""
+        return len(self._trees)
+
+    def get(self, text: str) -> Optional[RequirementTree]:
+        """
+        Return the cached tree for the given requirement text, or None if it is not in the cache
+        """
+        with self._lock:
+            tree = self._trees.get(text)
+            if tree is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._trees.move_to_end(text)
+            return tree
+
+    def add(self, text: str, tree: RequirementTree) -> RequirementTree:
+        """
+        Add the tree for the given requirement text to the cache and return the tree now stored for that text (which is
+        the existing one if another thread added it first)
+        """
+        with self._lock:
+            tree = self._trees.setdefault(text, tree)
+            self._trees.move_to_end(text)
+            if len(self._trees) > self.maxsize:
+                self._trees.popitem(last=False)
+            return tree
+
+    def clear(self) -> None:
+        """
+        Remove every tree from the cache and reset the counters
+        """
+        with self._lock:
+            self._trees.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# The cache shared by every parse in the process
+REQUIREMENT_CACHE = RequirementCache()
+
+# The BDD store of the requirements over the course IDs of every course code table. A store is only kept alive by its
+# table and the requirements built in it, so rebuilding the catalog (which builds a new table) drops the old store
+# instead of adding the new catalog's nodes to it.
+_TABLE_BDDS: weakref.WeakKeyDictionary[CourseCodeTable, RequirementBDD] = weakref.WeakKeyDictionary()
+_TABLE_BDDS_LOCK = threading.Lock()
+
+
+def get_table_bdd(table: CourseCodeTable) -> RequirementBDD:
+    """
+    Return the BDD store shared by every requirement over the course IDs in the given table, creating it on first use
+
+    >>> table = CourseCodeTable(['CSC110Y1'])
+    >>> get_table_bdd(table) is get_table_bdd(table), get_table_bdd(table) is get_table_bdd(CourseCodeTable([]))
+    (True, False)
+    """
+    with _TABLE_BDDS_LOCK:
+        bdd = _TABLE_BDDS.get(table)
+        if bdd is None:
+            bdd = RequirementBDD()
+            _TABLE_BDDS[table] = bdd
+        return bdd
+
+
+def parse_course_requirements(requirements: str, cache: Optional[RequirementCache] = REQUIREMENT_CACHE) \
+        -> RequirementTree:
     """
     Parse a course requirement string into a _Node (_Node will be the root of the tree)
 
+    The string is split into tokens in a single pass, and the tokens are parsed by precedence climbing, so every
+    character is only looked at a constant number of times. ^ binds more loosely than |, and both group to the right,
+    which gives the same trees as splitting the string at its first top level ^ (or | if there is no ^).
+
+    Unbalanced brackets are treated as if the unmatched ) were not there and the missing ) were at the end.
+
+    Nodes are looked up in (and added to) the given cache, so the returned tree may be shared with other calls and must
+    not be changed. Pass None as the cache to always build a new tree.
+
     Preconditions:
     - requirements is a valid course requirements string
 
@@ -130,109 +685,210 @@ def parse_course_requirements(requirements: str) -> RequirementTree:
     True
     >>> x._sep is None
     True
+    >>> x = parse_course_requirements('CSC110Y1|(CSC108H1^CSC148H1)^MAT137Y1')
+    >>> x._sep, x._left._text, x._right._text
+    ('^', 'CSC110Y1|(CSC108H1^CSC148H1)', 'MAT137Y1')
 
     """
-    # Make sure there is not a bracket at start and end of requirements string
-    while is_enclosed_brackets(requirements):
-        requirements = requirements[1:-1]
-
-    if is_course_format(requirements) or requirements == '':
-        # Base case - Requirements is just a single course or is an empty string
-        return RequirementTree(requirements)
-    else:
-        curr_node = RequirementTree(requirements)
-
-        course_groups = group_courses(requirements)
-
-        if '^' in course_groups:
-            # If ^ in grouped list - Search for first ^ in grouped list
-            i = 0
-            first_group = ''
-            sep = '^'
-            while course_groups[i] != '^':
-                first_group += course_groups[i]
-                i += 1
-            second_group = ''.join(course_groups[i + 1:])
+    if cache is not None:
+        tree = cache.get(requirements)
+        if tree is not None:
+            return tree
+        return cache.add(requirements, _RequirementParser(requirements, cache).parse())
+    return _RequirementParser(requirements, None).parse()
+
+
+# The precedence of each separator in a course requirement string (higher binds tighter)
+_PRECEDENCE = {'^': 1, '|': 2}
+
+
+class _RequirementParser:
+    """
+    A single use parser for a course requirement string
+
+    Instance Attributes:
+        - source: the course requirement string
+        - tokens: the tokens of the string, as (kind, start, end) where kind is one of '(', ')', '^', '|', or 'course'
+          for any other run of characters, and source[start:end] is the text of the token
+        - pos: the index of the next token to parse
+        - cache: the cache to share nodes through, or None if nodes are not shared
+    """
+    source: str
+    tokens: list[tuple[str, int, int]]
+    pos: int
+    cache: Optional[RequirementCache]
+
+    def __init__(self, source: str, cache: Optional[RequirementCache]) -> None:
+        self.source = source
+        self.tokens = tokenize_course_requirements(source)
+        self.pos = 0
+        self.cache = cache
+
+    def parse(self) -> RequirementTree:
+        """
+        Return the tree for the whole course requirement string
+        """
+        node, _, _ = self._parse_expression(_PRECEDENCE['^'])
+        if self.pos != len(self.tokens):
+            raise ValueError(f'Invalid course requirements: {self.source!r}')
+        return node
+
+    def _parse_expression(self, min_precedence: int) -> tuple[RequirementTree, int, int]:
+        """
+        Parse the longest expression starting at the current token whose separators all have a precedence of at least
+        min_precedence, and return its tree with the start and end of its text (including any brackets around it)
+        """
+        node, start, end = self._parse_atom()
+        while self.pos < len(self.tokens) and self.tokens[self.pos][0] in _PRECEDENCE \
+                and _PRECEDENCE[self.tokens[self.pos][0]] >= min_precedence:
+            sep = self.tokens[self.pos][0]
+            self.pos += 1
+            # Both separators group to the right, so the right side may contain the same separator again
+            right, _, end = self._parse_expression(_PRECEDENCE[sep])
+
+            node = self._make_node(self.source[start:end], sep, node, right)
+        return node, start, end
+
+    def _make_node(self, text: str, sep: Optional[str] = None, left: Optional[RequirementTree] = None,
+                   right: Optional[RequirementTree] = None) -> RequirementTree:
+        """
+        Return the node for the given text, reusing the cached node for that text if there is one
+        """
+        if self.cache is not None:
+            node = self.cache.get(text)
+            if node is not None:
+                return node
+
+        node = RequirementTree(text)
+        if sep is not None:
+            node.set_node_attributes(sep, left, right)
+
+        if self.cache is not None:
+            return self.cache.add(text, node)
+        return node
+
+    def _parse_atom(self) -> tuple[RequirementTree, int, int]:
+        """
+        Parse a single course, a bracketed expression, or an empty requirement starting at the current token
+        """
+        if self.pos == len(self.tokens):
+            return self._make_node(''), len(self.source), len(self.source)
+
+        kind, start, end = self.tokens[self.pos]
+        if kind == 'course':
+            self.pos += 1
+            text = self.source[start:end]
+            if not is_course_format(text):
+                raise ValueError(f'Invalid course code {text!r} in course requirements: {self.source!r}')
+            return self._make_node(text), start, end
+        elif kind == '(':
+            self.pos += 1
+            node, _, _ = self._parse_expression(_PRECEDENCE['^'])
+            # The tokenizer balances brackets, so unless the string is invalid the next token is the matching )
+            if self.pos == len(self.tokens) or self.tokens[self.pos][0] != ')':
+                raise ValueError(f'Invalid course requirements: {self.source!r}')
+            end = self.tokens[self.pos][2]
+            self.pos += 1
+            return node, start, end
         else:
-            # Otherwise, search for first | in grouped list
-            i = 0
-            first_group = ''
-            sep = '|'
-            while course_groups[i] != '|':
-                first_group += course_groups[i]
-                i += 1
-            second_group = ''.join(course_groups[i + 1:])
-
-        # Store separator + Courses before and after seperator
-        curr_node.set_node_attributes(
-            sep,
-            parse_course_requirements(first_group),
-            parse_course_requirements(second_group)
-        )
-        return curr_node
-
-
-def group_courses(requirements: str) -> list[str]:
+            # A separator or ) with nothing before it - there is no requirement here
+            return self._make_node(''), start, start
+
+
+def tokenize_course_requirements(requirements: str) -> list[tuple[str, int, int]]:
     """
-    Group courses into individual logical units at the top bracket level
+    Split a course requirement string into tokens, as (kind, start, end) where kind is one of '(', ')', '^', '|', or
+    'course' for any other run of characters, and requirements[start:end] is the text of the token
 
-    >>> group_courses('CSC110Y1|(CSC108H1^CSC148H1)')
-    ['CSC110Y1', '|', '(CSC108H1^CSC148H1)']
-    >>> group_courses('PHY132H1|PHY152H1^(MAT135H1^MAT136H1)|MAT137Y1|MAT157Y1')
-    ['PHY132H1', '|', 'PHY152H1', '^', '(MAT135H1^MAT136H1)', '|', 'MAT137Y1', '|', 'MAT157Y1']
+    Unmatched ) are dropped, and missing ) are added (as empty tokens) at the end of the string.
+
+    >>> tokenize_course_requirements('CSC110Y1|(CSC108H1^CSC148H1)')
+    [('course', 0, 8), ('|', 8, 9), ('(', 9, 10), ('course', 10, 18), ('^', 18, 19), ('course', 19, 27), (')', 27, 28)]
+    >>> tokenize_course_requirements('(CSC110Y1))')
+    [('(', 0, 1), ('course', 1, 9), (')', 9, 10)]
     """
-    # Group courses by brackets with separators between brackets included in list
-    bracket_level = 0
-    curr_group = ''
-    groups = []
-    for i in requirements:
-        # Update the current bracket level
-        if i == '(':
-            bracket_level += 1
-        elif i == ')':
-            bracket_level -= 1
-
-        if bracket_level == 0 and i in ('|', '^'):
-            # Only add separators to course_groups list if you are in the top bracket level
-            groups.append(curr_group)
-            curr_group = ''
-            groups.append(i)
-        elif bracket_level > 0 and i in ('|', '^'):
-            # If you are not in the top bracket level, add the separator to the current group
-            curr_group += i
-        elif i not in ('|', '^'):
-            # Always add non-separator characters to current group
-            curr_group += i
-    if curr_group != '':
-        groups.append(curr_group)
-    return groups
-
-
-def is_enclosed_brackets(s: str) -> bool:
+    tokens = []
+    depth = 0
+    course_start = -1
+    for i, char in enumerate(requirements):
+        if char in '()^|':
+            if course_start != -1:
+                tokens.append(('course', course_start, i))
+                course_start = -1
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                if depth == 0:
+                    continue
+                depth -= 1
+            tokens.append((char, i, i + 1))
+        elif course_start == -1:
+            course_start = i
+
+    if course_start != -1:
+        tokens.append(('course', course_start, len(requirements)))
+    tokens.extend([(')', len(requirements), len(requirements))] * depth)
+    return tokens
+
+
+def minimize_combos(combos: list[int]) -> list[int]:
     """
-    Return whether a string is fully enclosed by one pair of brackets
-
-    >>> is_enclosed_brackets('()')
-    True
-    >>> is_enclosed_brackets('(((ABCDE)))')
-    True
-    >>> is_enclosed_brackets('(ABC)^(DEF)')
-    False
-    >>> is_enclosed_brackets('()ABCDE')
-    False
+    Return the minimal form of a list of course combinations (as bitsets): duplicates are removed, every combination
+    that contains another combination is dropped (taking more courses than another option never helps), and the rest
+    are sorted by their number of courses
+
+    Only kept combinations with fewer courses can be contained in a combination, and only those whose lowest course is
+    in it, so kept combinations are grouped by their lowest course and only these groups are checked. Combinations of
+    the same size (e.g. every combination of an AND of ORs) are never compared at all.
+
+    >>> minimize_combos([0b110, 0b010, 0b011, 0b010, 0b101])
+    [2, 5]
+    >>> minimize_combos([0b1, 0])
+    [0]
+    >>> groups = [[1 << (10 * group + i) for i in range(10)] for group in range(4)]
+    >>> combos = [a | b | c | d for a, b, c, d in itertools.product(*groups)]
+    >>> len(minimize_combos(combos))
+    10000
+    >>> minimal = minimize_combos(combos + [1 | 1 << 10])  # contained in the 100 combos with courses 0 and 10
+    >>> len(minimal), minimal[0]
+    (9901, 1025)
     """
-    if s == '' or s[0] != '(':
-        return False
-    else:
-        open_bracket = 1
-        for i in s[1:]:
-            if open_bracket == 0:
-                return False
-            if i == '(':
-                open_bracket += 1
-            elif i == ')':
-                open_bracket -= 1
-        return True
+    unique = set(combos)
+    if 0 in unique:
+        # Nothing is needed, so every other combination contains this one
+        return [0]
+
+    minimal = []
+    # The kept combinations with fewer courses than the current one, by their lowest course ID, and the kept ones with
+    # as many courses
+    smaller = {}
+    same_size = []
+    size = 0
+    for combo in sorted(unique, key=lambda c: (c.bit_count(), c)):
+        if combo.bit_count() != size:
+            for kept in same_size:
+                smaller.setdefault((kept & -kept).bit_length(), []).append(kept)
+            same_size = []
+            size = combo.bit_count()
+        if not _contains_any(combo, smaller):
+            minimal.append(combo)
+            same_size.append(combo)
+    return minimal
+
+
+def _contains_any(combo: int, smaller: dict[int, list[int]]) -> bool:
+    """
+    Return whether the given combination contains one of the combinations in smaller, which are grouped by their
+    lowest course ID (plus one)
+    """
+    rest = combo
+    while rest:
+        lowest = rest & -rest
+        for kept in smaller.get(lowest.bit_length(), ()):
+            if kept & combo == kept:
+                return True
+        rest ^= lowest
+    return False
 
 
 def is_course_format(s: str) -> bool:
@@ -255,7 +911,8 @@ if __name__ == '__main__':
     import doctest
     doctest.testmod()
     python_ta.check_all(config={
-        'extra-imports': [],
+        'extra-imports': ['collections', 'heapq', 'itertools', 'threading', 'weakref', 'course_codes',
+                          'requirement_bdd'],
         'allowed-io': [''],
         'max-line-length': 120,
         'disable': ['too-many-nested-blocks']
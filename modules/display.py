@@ -9,19 +9,26 @@ Copyright and Usage Information
 This file is Copyright (c) 2023 Noah Black, Nikita Goncharov and Adam Pralat.
 """
 import tkinter as tk
-import json
 import doctest
 import python_ta
+from catalog import get_catalog, start_catalog_watcher, stop_catalog_watcher
+from plan_store import PlanLookup, PlanStore, plan_store_path_for
 from runner import get_course_tree
 from helpers import split_string
 
+# The longest time (in seconds) the planner may search for a recommended path before the best one found is shown
+PLAN_DEADLINE = 2.0
+
 
 def run_program() -> None:
     """ Creates a tkinter window which the user can interact with."""
 
-    # load course data
-    with open('../data-processing/courses_clean.json') as file:
-        file_contents = json.load(file)
+    # load course data once (shared with the planner), and reload it in the background if the data file changes
+    get_catalog()
+    start_catalog_watcher()
+    # keep the plans found on disk, so they are shown without planning again after a restart
+    plan_store = PlanStore(plan_store_path_for(get_catalog().path))
+    plans = PlanLookup(store=plan_store)
 
     # create the tkinter window
     root = tk.Tk()
@@ -101,7 +108,7 @@ def run_program() -> None:
         for key in completed_entries:
             course = completed_entries[key].get().upper()
             if course != '':  # ignore empty course boxes
-                if course in (course_dict["course code"] for course_dict in file_contents):
+                if get_catalog().has_course(course):
                     completed_courses.add(course)
                 else:  # if the course is not a valid course, exit and let the user know
                     course_error.config(text="'" + course + "' is not a valid course.")
@@ -113,7 +120,7 @@ def run_program() -> None:
         if desired_course == '':  # user must enter a desired course
             course_error.config(text="You must input a desired course.")
             course_error.grid(row=2, column=0, sticky='W')
-        elif desired_course in (courses["course code"] for courses in file_contents):
+        elif get_catalog().has_course(desired_course):
             display_results(desired_course, completed_courses)
         else:  # if the course is not a valid course, exit and let the user know
             course_error.config(text="'" + desired_course + "' is not a valid course.")
@@ -134,8 +141,18 @@ def run_program() -> None:
         """ Generates and draws the recommended path."""
         course_error.grid_remove()
         starting_label.destroy()
-        network = get_course_tree(desired, completed)
-        tree_drawing.config(text=str(network), justify="left")
+        try:
+            network = get_course_tree(desired, completed, 'search', PLAN_DEADLINE, plans=plans)
+        except ValueError as error:  # the prereqs of the course cannot be fulfilled, so there is no path to draw
+            tree_drawing.config(text="")
+            course_error.config(text=str(error) + ".")
+            course_error.grid(row=2, column=0, sticky='W')
+            return
+        text = str(network)
+        if not network.proven_optimal:
+            # the search ran out of time, so a shorter or cheaper path may exist
+            text += "\nThe search was stopped early: this is the best path found in " + str(PLAN_DEADLINE) + " seconds."
+        tree_drawing.config(text=text, justify="left")
 
     tree_drawing = tk.Label(frame3)
     tree_drawing.pack()
@@ -158,38 +175,36 @@ def run_program() -> None:
             course_error.config(text="You must input a course code to search.")
             course_error.grid(row=2, column=0, sticky='W')
         else:
-            for course_dict in file_contents:
-                if search_course == course_dict["course code"]:
-                    course_details = course_dict
-                    course_error.grid_remove()
-
-                    # create a new window
-                    new_window = tk.Toplevel(root)
-                    new_window.title("Course Search: " + search_course)
-
-                    # display the course overview
-                    descriptions = {header: tk.Label(new_window) for header in keys}
-                    for key in keys:
-                        if len(course_details[key]) == 0:
-                            value = 'none'
-                        elif isinstance(course_details[key], list):
-                            value = course_details[key][0]
-                        else:
-                            value = course_details[key]
-                        value = split_string(value)
-                        heading = key.replace(" text", 's')
-                        descriptions[key].config(text=heading.title() + ': ' + value, justify="left")
-                        descriptions[key].pack(anchor="w")
-
-                    exit_window = tk.Button(new_window, text="Exit Course Search", command=new_window.destroy)
-                    exit_window.pack()
-
-                    new_window.mainloop()
-
-                    return
+            course_details = get_catalog().get_course_data(search_course)
+            if course_details is None:
                 # if the course is not a valid course, let the user know
                 course_error.config(text="'" + search_course + "' is not a valid course.")
                 course_error.grid(row=2, column=0, sticky='W')
+                return
+            course_error.grid_remove()
+
+            # create a new window
+            new_window = tk.Toplevel(root)
+            new_window.title("Course Search: " + search_course)
+
+            # display the course overview
+            descriptions = {header: tk.Label(new_window) for header in keys}
+            for key in keys:
+                if len(course_details[key]) == 0:
+                    value = 'none'
+                elif isinstance(course_details[key], list):
+                    value = course_details[key][0]
+                else:
+                    value = course_details[key]
+                value = split_string(value)
+                heading = key.replace(" text", 's')
+                descriptions[key].config(text=heading.title() + ': ' + value, justify="left")
+                descriptions[key].pack(anchor="w")
+
+            exit_window = tk.Button(new_window, text="Exit Course Search", command=new_window.destroy)
+            exit_window.pack()
+
+            new_window.mainloop()
 
     search_button = tk.Button(frame4, text="Search", command=search)
     search_button.grid(column=0, row=1)
@@ -201,11 +216,15 @@ def run_program() -> None:
     # run the tkinter window
     root.mainloop()
 
+    # the window was closed, so stop watching the data file
+    stop_catalog_watcher()
+    plan_store.close()
+
 
 if __name__ == '__main__':
     doctest.testmod()
     python_ta.check_all(config={
-        'extra-imports': ['tkinter', 'json', 'runner', 'helpers'],  # the names (strs) of imported modules
+        'extra-imports': ['tkinter', 'catalog', 'plan_store', 'runner', 'helpers'],  # the names of imported modules
         'allowed-io': ['run_program'],     # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
         'disable': ['R0914', 'R1702', 'R0915']
@@ -0,0 +1,231 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Vectorized "eligible right now" queries. Every course's minimal prerequisite combinations (its DNF clauses) are stored
+once as sparse rows over course IDs, so the set of courses a student can take next, given the courses they have taken,
+is found with a few NumPy array operations over the whole catalog instead of one requirement check per course. The
+few courses that only list their cheapest prerequisite combinations are checked one by one instead. The matrix is also
+indexed by column, so the courses a single course unlocks are found by only checking the clauses that mention it.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Iterable
+
+import numpy as np
+
+from course_codes import ids_to_mask, iter_ids
+from course_network import DatabaseCourse, DatabaseCourseNetwork
+
+
+class ClauseRows:
+    """
+    The rows of a RequirementMatrix in compressed sparse row format
+
+    Row i of the matrix is the i-th clause: one minimal combination of courses that fulfills the prerequisites of one
+    course. The course IDs in row i are cols[ptr[i]:ptr[i + 1]].
+
+    Instance Attributes:
+        - ptr: the start of every row in cols, followed by len(cols)
+        - cols: the course IDs in every row, one row after another
+        - sizes: the number of courses in every row
+        - course: the index (into RequirementMatrix.course_ids) of the course every row belongs to
+        - masks: the bitset of the course IDs in every row
+
+    Representation Invariants:
+    - len(self.ptr) == len(self.sizes) + 1 == len(self.course) + 1 == len(self.masks) + 1
+    """
+    ptr: np.ndarray
+    cols: np.ndarray
+    sizes: np.ndarray
+    course: np.ndarray
+    masks: list[int]
+
+    def __init__(self, cols: list[int], sizes: list[int], course: list[int], masks: list[int]) -> None:
+        self.cols = np.array(cols, dtype=np.int64)
+        self.sizes = np.array(sizes, dtype=np.int64)
+        self.ptr = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.ptr[1:])
+        self.course = np.array(course, dtype=np.int64)
+        self.masks = masks
+
+
+class ClauseColumns:
+    """
+    The columns of a RequirementMatrix in compressed sparse column format: the rows that mention course ID j are
+    clauses[ptr[j]:ptr[j + 1]]
+
+    Instance Attributes:
+        - ptr: the start of the rows that mention every course ID in clauses, followed by len(clauses)
+        - clauses: the rows that mention every course ID, one course ID after another
+    """
+    ptr: np.ndarray
+    clauses: np.ndarray
+
+    def __init__(self, rows: ClauseRows, num_ids: int) -> None:
+        # Transpose the matrix: sort the entries by course ID, keeping the row of every entry
+        entry_clauses = np.repeat(np.arange(len(rows.sizes), dtype=np.int64), rows.sizes)
+        self.clauses = entry_clauses[np.argsort(rows.cols, kind='stable')]
+        self.ptr = np.zeros(num_ids + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows.cols, minlength=num_ids), out=self.ptr[1:])
+
+
+class RequirementMatrix:
+    """
+    A sparse clause-by-course matrix of the prerequisites of every course in a DatabaseCourseNetwork
+
+    Row i of the matrix is the i-th clause: one minimal combination of courses that fulfills the prerequisites of the
+    course course_ids[rows.course[i]]. A course is eligible once every course in one of its clauses has been taken.
+    The matrix is stored both by row (rows) and by column (columns).
+
+    Instance Attributes:
+        - course_ids: the IDs of every course in the network
+        - rows: the rows of the matrix
+        - columns: the columns of the matrix
+        - course_clause_ptr: the first row of every course (the rows of course_ids[i] are course_clause_ptr[i] up to
+          course_clause_ptr[i + 1]), followed by the number of rows
+        - num_ids: the number of course IDs in the network's table when the matrix was built
+        - truncated_courses: the courses that only list their cheapest prereq combinations, which have no rows and are
+          checked with DatabaseCourse.is_satisfied instead
+
+    Representation Invariants:
+    - len(self.columns.ptr) == self.num_ids + 1 and len(self.columns.clauses) == len(self.rows.cols)
+    - all(0 <= i < self.num_ids for i in self.rows.cols)
+    >>> from catalog import build_course_network
+    >>> network = build_course_network([{'course code': 'CSC110Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'MAT137Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'CSC111H1', 'prerequisites': 'CSC110Y1'},
+    ...                                 {'course code': 'CSC236H1', 'prerequisites': 'CSC111H1^MAT137Y1'}])
+    >>> matrix = RequirementMatrix(network)
+    >>> sorted(network.table.get_codes(matrix.eligible_courses([]).tolist()))
+    ['CSC110Y1', 'MAT137Y1']
+    >>> taken = [network.get_course(code).course_id for code in ('CSC110Y1', 'MAT137Y1')]
+    >>> sorted(network.table.get_codes(matrix.eligible_courses(taken).tolist()))
+    ['CSC111H1']
+    """
+    course_ids: np.ndarray
+    rows: ClauseRows
+    columns: ClauseColumns
+    course_clause_ptr: np.ndarray
+    num_ids: int
+    truncated_courses: list[DatabaseCourse]
+    _truncated_mentions: dict[int, list[DatabaseCourse]]
+
+    def __init__(self, network: DatabaseCourseNetwork) -> None:
+        courses = list(network.courses.values())
+        cols = []
+        sizes = []
+        clause_course = []
+        clause_masks = []
+        self.truncated_courses = []
+        self._truncated_mentions = {}
+        for index, course in enumerate(courses):
+            prerequisites = course.prerequisites
+            # Whether the prereqs are truncated is only known once they are loaded
+            if course.prereqs_truncated:
+                self.truncated_courses.append(course)
+                for course_id in iter_ids(course.get_prereq_courses()):
+                    self._truncated_mentions.setdefault(course_id, []).append(course)
+                continue
+            for clause in prerequisites:
+                ids = list(iter_ids(clause))
+                cols.extend(ids)
+                sizes.append(len(ids))
+                clause_course.append(index)
+                clause_masks.append(clause)
+
+        # Computing the prereqs may have interned new course IDs, so the table size is read afterwards
+        self.num_ids = len(network.table)
+        self.course_ids = np.array([course.course_id for course in courses], dtype=np.int64)
+        self.rows = ClauseRows(cols, sizes, clause_course, clause_masks)
+        self.course_clause_ptr = np.zeros(len(courses) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.rows.course, minlength=len(courses)), out=self.course_clause_ptr[1:])
+        self.columns = ClauseColumns(self.rows, self.num_ids)
+
+    def eligible_courses(self, taken: Iterable[int]) -> np.ndarray:
+        """
+        Return the IDs of every course that has not been taken and whose prerequisites are fulfilled by the given
+        taken course IDs
+        """
+        taken_vector = np.zeros(self.num_ids, dtype=bool)
+        taken_ids = np.fromiter(taken, dtype=np.int64)
+        taken_mask = ids_to_mask(taken_ids.tolist())
+        # Courses interned after the matrix was built do not appear in any clause
+        taken_vector[taken_ids[taken_ids < self.num_ids]] = True
+
+        # Count the taken courses in every clause (prefix sums, so that empty clauses count 0)
+        hits = np.zeros(len(self.rows.cols) + 1, dtype=np.int64)
+        np.cumsum(taken_vector[self.rows.cols], out=hits[1:])
+        satisfied = hits[self.rows.ptr[1:]] - hits[self.rows.ptr[:-1]] == self.rows.sizes
+
+        eligible = np.zeros(len(self.course_ids), dtype=bool)
+        eligible[self.rows.course[satisfied]] = True
+        eligible &= ~taken_vector[self.course_ids]
+
+        extra = [course.course_id for course in self.truncated_courses
+                 if not taken_mask >> course.course_id & 1 and course.is_satisfied(taken_mask)]
+        return np.concatenate((self.course_ids[eligible], np.array(extra, dtype=np.int64)))
+
+    def unlocked_by(self, course_id: int, taken: int) -> list[int]:
+        """
+        Return the IDs of every course that is not eligible with the given bitset of taken course IDs, but becomes
+        eligible once the course with the given ID is also taken (not counting that course itself)
+
+        Only the rows that mention the course, and the other rows of the courses they belong to, are checked.
+
+        >>> from catalog import build_course_network
+        >>> network = build_course_network([{'course code': 'CSC110Y1', 'prerequisites': ''},
+        ...                                 {'course code': 'MAT137Y1', 'prerequisites': ''},
+        ...                                 {'course code': 'CSC111H1', 'prerequisites': 'CSC110Y1'},
+        ...                                 {'course code': 'CSC236H1', 'prerequisites': 'CSC111H1^MAT137Y1'}])
+        >>> matrix = RequirementMatrix(network)
+        >>> csc110, mat137, csc111 = (network.get_course(code) for code in ('CSC110Y1', 'MAT137Y1', 'CSC111H1'))
+        >>> matrix.unlocked_by(mat137.course_id, 1 << csc110.course_id)
+        []
+        >>> unlocked = matrix.unlocked_by(mat137.course_id, 1 << csc110.course_id | 1 << csc111.course_id)
+        >>> network.table.get_codes(unlocked)
+        {'CSC236H1'}
+        """
+        if taken >> course_id & 1:
+            return []
+        with_course = taken | 1 << course_id
+
+        unlocked = []
+        candidates = set()
+        if course_id < self.num_ids:
+            for clause in self.columns.clauses[self.columns.ptr[course_id]:self.columns.ptr[course_id + 1]].tolist():
+                if self.rows.masks[clause] & ~with_course == 0:
+                    candidates.add(int(self.rows.course[clause]))
+        for index in candidates:
+            candidate_id = int(self.course_ids[index])
+            if candidate_id == course_id or taken >> candidate_id & 1:
+                continue
+            clauses = range(self.course_clause_ptr[index], self.course_clause_ptr[index + 1])
+            # The course may already be eligible through another of its rows
+            if all(self.rows.masks[clause] & ~taken != 0 for clause in clauses):
+                unlocked.append(candidate_id)
+
+        for course in self._truncated_mentions.get(course_id, []):
+            if course.course_id != course_id and not taken >> course.course_id & 1 \
+                    and course.is_satisfied(with_course) and not course.is_satisfied(taken):
+                unlocked.append(course.course_id)
+        return sorted(unlocked)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'course_codes', 'course_network'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,191 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+A cache of the plans found by runner.get_course_tree. Most of a user's courses taken cannot matter for any one course,
+so plans are keyed by the course and only the courses taken in its prerequisite cone (see
+CourseCatalog.get_relevant_taken). Users with different transcripts asking for the same course then share one plan.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Optional
+
+import threading
+
+from course_network import PlannerCourseNetwork
+
+# A key of a plan: the course planned for, the planner used and the relevant courses taken
+PlanKey = tuple[str, str, frozenset[str]]
+
+
+class CacheStats:
+    """
+    The counters of a PlanCache
+
+    Instance Attributes:
+        - stats: the counters of the cache since it was created or last cleared
+    """
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_hit_rate(self) -> float:
+        """
+        Return the fraction of lookups that found a plan (0.0 if there were none)
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+
+class PlanCache:
+    """
+    A bounded least recently used cache of plans, keyed by PlanKey
+
+    Plans are only valid for the catalog they were found with, so every lookup gives the version of the catalog (its
+    content hash), and the cache is emptied when the version changes. None is cached for courses whose prereqs cannot
+    be fulfilled.
+
+    The cache is bounded both by its number of plans and by the total number of courses in them, which is what the
+    memory used by the plans grows with.
+
+    Instance Attributes:
+        - maxsize: the maximum number of plans kept in the cache
+        - max_courses: the maximum total number of courses in the plans kept in the cache
+        - version: the version of the catalog the cached plans were found with, or None before the first lookup
+        - stats: the counters of the cache since it was created or last cleared
+
+    Representation Invariants:
+    - len(self._plans) <= self.maxsize
+    - self._courses == sum(courses for _, courses in self._plans.values())
+
+    >>> cache = PlanCache(maxsize=2)
+    >>> cache.add('v1', ('CSC111H1', 'search', frozenset()), None)
+    >>> cache.get('v1', ('CSC111H1', 'search', frozenset()))
+    (True, None)
+    >>> cache.get('v2', ('CSC111H1', 'search', frozenset()))
+    (False, None)
+    >>> cache.stats.hits, cache.stats.misses
+    (1, 1)
+    """
+    maxsize: int
+    max_courses: int
+    version: Optional[str]
+    stats: CacheStats
+    _plans: OrderedDict[PlanKey, tuple[Optional[PlannerCourseNetwork], int]]
+    _courses: int
+    _lock: threading.Lock
+
+    def __init__(self, maxsize: int = 10000, max_courses: int = 500000) -> None:
+        self.maxsize = maxsize
+        self.max_courses = max_courses
+        self.version = None
+        self.stats = CacheStats()
+        self._plans = OrderedDict()
+        self._courses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of plans in the cache"""
+        return len(self._plans)
+
+    def get(self, version: str, key: PlanKey) -> tuple[bool, Optional[PlannerCourseNetwork]]:
+        """
+        Return whether a plan for the given key was found with the given catalog version, and the plan (None if it was
+        not found, or if the prereqs of the course cannot be fulfilled)
+
+        The plan returned is a new network sharing the cached plan's slots, so the caller may change its attributes.
+        """
+        with self._lock:
+            self._set_version(version)
+            if key not in self._plans:
+                self.stats.misses += 1
+                return False, None
+            self.stats.hits += 1
+            self._plans.move_to_end(key)
+            network = self._plans[key][0]
+
+        if network is None:
+            return True, None
+        copy = PlannerCourseNetwork(network.end)
+        copy.proven_optimal = network.proven_optimal
+        return True, copy
+
+    def add(self, version: str, key: PlanKey, network: Optional[PlannerCourseNetwork]) -> None:
+        """
+        Add the plan for the given key, found with the given catalog version, to the cache (None if the prereqs of the
+        course cannot be fulfilled)
+
+        Plans too large to ever fit in the cache are not added.
+        """
+        courses = network.course_ids.bit_count() if network is not None else 0
+        if courses > self.max_courses:
+            return
+        with self._lock:
+            self._set_version(version)
+            if key in self._plans:
+                self._courses -= self._plans[key][1]
+            self._plans[key] = (network, courses)
+            self._plans.move_to_end(key)
+            self._courses += courses
+            while len(self._plans) > self.maxsize or self._courses > self.max_courses:
+                self._courses -= self._plans.popitem(last=False)[1][1]
+                self.stats.evictions += 1
+
+    def get_stats(self) -> dict[str, float]:
+        """
+        Return the counters of the cache, its hit rate, and its number of plans and of courses in them
+        """
+        with self._lock:
+            stats = self.stats
+            return {'hits': stats.hits, 'misses': stats.misses, 'evictions': stats.evictions,
+                    'hit_rate': stats.get_hit_rate(), 'plans': len(self._plans), 'courses': self._courses}
+
+    def clear(self) -> None:
+        """
+        Remove every plan from the cache and reset the counters
+        """
+        with self._lock:
+            self._plans.clear()
+            self._courses = 0
+            self.stats = CacheStats()
+
+    def _set_version(self, version: str) -> None:
+        """
+        Empty the cache if its plans were found with another catalog version than the given one
+
+        Preconditions:
+        - self._lock is held by the caller
+        """
+        if version != self.version:
+            self._plans.clear()
+            self._courses = 0
+            self.version = version
+
+
+# The cache shared by every call of runner.get_course_tree in the process
+PLAN_CACHE = PlanCache()
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['collections', 'threading', 'course_network'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
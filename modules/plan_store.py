@@ -0,0 +1,314 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+A cache of the plans found by runner.get_course_tree that is stored on disk (in an SQLite database), so the plans
+survive restarts of the program. It is meant to sit behind the in-memory plan_cache.PlanCache: a warm restart serves
+the plans asked for before without planning them again.
+
+Plans are stored in a compact binary form: every slot of the plan, each after the slots taken before it, as its course
+code followed by the indices of the slots taken before it (see _SLOT).
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Optional
+
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+from course_network import DatabaseCourseNetwork, PlannerCourseNetwork, PlannerSlot
+from plan_cache import PLAN_CACHE, PlanCache, PlanKey
+
+# The version of the stored plan format. Stores written in another format are emptied when they are opened
+PLAN_FORMAT_VERSION = 2
+
+_CODE_LENGTH = 8
+# course code, number of slots taken before the slot. It is followed by the (unsigned 16-bit) indices of these slots
+_SLOT = struct.Struct(f'<{_CODE_LENGTH}sH')
+_INDEX = struct.Struct('<H')
+_MAX_INDEX = (1 << 16) - 1
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS plans (
+    catalog_hash TEXT NOT NULL,
+    course TEXT NOT NULL,
+    planner TEXT NOT NULL,
+    taken TEXT NOT NULL,
+    plan BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (catalog_hash, course, planner, taken)
+)
+'''
+
+
+class PlanStore:
+    """
+    A cache of plans stored in an SQLite database, keyed by the content hash of the catalog they were found with and
+    a PlanKey
+
+    Once the plans take more than max_bytes bytes, the least recently used ones are removed. Plans found with an older
+    catalog are never used again, so they are eventually removed the same way. The store is only a cache: if the
+    database cannot be read or written (e.g. another process holds a lock on it), lookups miss and plans are not added.
+
+    Instance Attributes:
+        - path: the path of the database file
+        - max_bytes: the maximum total size of the stored plans, in bytes
+        - hits: the number of lookups that found a plan
+        - misses: the number of lookups that did not find a plan
+
+    >>> store = PlanStore(':memory:')
+    >>> store.add('v1', ('CSC111H1', 'search', frozenset({'CSC110Y1'})), None)
+    >>> store.get('v1', ('CSC111H1', 'search', frozenset({'CSC110Y1'})), DatabaseCourseNetwork(set()))
+    (True, None)
+    >>> store.get('v2', ('CSC111H1', 'search', frozenset({'CSC110Y1'})), DatabaseCourseNetwork(set()))
+    (False, None)
+    """
+    path: str
+    max_bytes: int
+    hits: int
+    misses: int
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] != PLAN_FORMAT_VERSION:
+            self._connection.execute('DROP TABLE IF EXISTS plans')
+            self._connection.execute(f'PRAGMA user_version = {PLAN_FORMAT_VERSION}')
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    def get(self, version: str, key: PlanKey, network: DatabaseCourseNetwork) \
+            -> tuple[bool, Optional[PlannerCourseNetwork]]:
+        """
+        Return whether a plan for the given key was found with the given catalog version, and the plan, built from the
+        courses of the given network (None if it was not found, or if the prereqs of the course cannot be fulfilled)
+
+        Preconditions:
+        - network is the network of the catalog with the given version
+        """
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT rowid, plan FROM plans WHERE catalog_hash = ? AND course = ? AND planner = ? AND taken = ?',
+                    (version,) + _encode_key(key)).fetchone()
+                if row is not None:
+                    self._connection.execute('UPDATE plans SET last_used = ? WHERE rowid = ?', (time.time(), row[0]))
+                    self._connection.commit()
+        except sqlite3.Error:
+            row = None
+
+        plan = decode_plan(row[1], network) if row is not None and row[1] != b'' else None
+        if row is None or (row[1] != b'' and plan is None):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, plan
+
+    def add(self, version: str, key: PlanKey, network: Optional[PlannerCourseNetwork]) -> None:
+        """
+        Store the plan for the given key, found with the given catalog version (None if the prereqs of the course cannot
+        be fulfilled), removing the least recently used plans if the store gets too large
+
+        Preconditions:
+        - network is None or network.proven_optimal
+        """
+        plan = encode_plan(network) if network is not None else b''
+        if plan is None or len(plan) > self.max_bytes:
+            return
+        try:
+            with self._lock:
+                self._connection.execute('INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?)',
+                                         (version,) + _encode_key(key) + (plan, time.time()))
+                self._evict()
+                self._connection.commit()
+        except sqlite3.Error:
+            return
+
+    def get_size(self) -> int:
+        """
+        Return the total size of the stored plans, in bytes
+        """
+        with self._lock:
+            return self._connection.execute('SELECT COALESCE(SUM(LENGTH(plan)), 0) FROM plans').fetchone()[0]
+
+    def __len__(self) -> int:
+        """Return the number of stored plans"""
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM plans').fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Close the database
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used plans until the stored plans take at most max_bytes bytes
+
+        Preconditions:
+        - self._lock is held by the caller
+        """
+        size = self._connection.execute('SELECT COALESCE(SUM(LENGTH(plan)), 0) FROM plans').fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        removed = []
+        for rowid, plan_size in self._connection.execute('SELECT rowid, LENGTH(plan) FROM plans ORDER BY last_used'):
+            if size <= self.max_bytes:
+                break
+            removed.append((rowid,))
+            size -= plan_size
+        self._connection.executemany('DELETE FROM plans WHERE rowid = ?', removed)
+
+
+class PlanLookup:
+    """
+    Where runner.get_course_tree looks up and keeps plans: an in-memory PlanCache, backed by a PlanStore
+
+    Plans missing from the cache are looked up in the store, and plans found there are added to the cache. Either one
+    may be None, to not use it.
+
+    Instance Attributes:
+        - cache: the in-memory cache, or None
+        - store: the store on disk, or None
+
+    >>> lookup = PlanLookup(PlanCache(), PlanStore(':memory:'))
+    >>> lookup.store.add('v1', ('CSC111H1', 'search', frozenset()), None)
+    >>> lookup.get('v1', ('CSC111H1', 'search', frozenset()), DatabaseCourseNetwork(set()))
+    (True, None)
+    >>> len(lookup.cache)
+    1
+    """
+    cache: Optional[PlanCache]
+    store: Optional[PlanStore]
+
+    def __init__(self, cache: Optional[PlanCache] = PLAN_CACHE, store: Optional[PlanStore] = None) -> None:
+        self.cache = cache
+        self.store = store
+
+    def get(self, version: str, key: PlanKey, network: DatabaseCourseNetwork) \
+            -> tuple[bool, Optional[PlannerCourseNetwork]]:
+        """
+        Return whether a plan for the given key was found with the given catalog version, first in the cache and then
+        in the store, and the plan (see PlanStore.get)
+
+        Preconditions:
+        - network is the network of the catalog with the given version
+        """
+        found, plan = self.cache.get(version, key) if self.cache is not None else (False, None)
+        if not found and self.store is not None:
+            found, plan = self.store.get(version, key, network)
+            if found and self.cache is not None:
+                self.cache.add(version, key, plan)
+        return found, plan
+
+    def add(self, version: str, key: PlanKey, network: Optional[PlannerCourseNetwork]) -> None:
+        """
+        Add the plan for the given key, found with the given catalog version, to the cache and the store (None if the
+        prereqs of the course cannot be fulfilled)
+
+        Preconditions:
+        - network is None or network.proven_optimal
+        """
+        if self.cache is not None:
+            self.cache.add(version, key, network)
+        if self.store is not None:
+            self.store.add(version, key, network)
+
+
+# The plans runner.get_course_tree uses by default: only the process-wide PLAN_CACHE
+DEFAULT_PLAN_LOOKUP = PlanLookup()
+
+
+def plan_store_path_for(path: str) -> str:
+    """
+    Return the default plan store path for the given json catalog path
+
+    >>> plan_store_path_for('../data-processing/courses_clean.json')
+    '../data-processing/courses_clean.plans'
+    """
+    return os.path.splitext(path)[0] + '.plans'
+
+
+def encode_plan(network: PlannerCourseNetwork) -> Optional[bytes]:
+    """
+    Return the compact binary form of the given plan, or None if it cannot be encoded (its course codes are not 8
+    characters long, or it has too many slots)
+
+    Preconditions:
+    - network.end is not None
+
+    >>> network = DatabaseCourseNetwork(set())
+    >>> prereqs = [PlannerSlot(network.add_course(f'AAA{i:03}H1')) for i in range(300)]
+    >>> plan = PlannerCourseNetwork(PlannerSlot(network.add_course('BBB100H1'), tuple(prereqs)))
+    >>> decode_plan(encode_plan(plan), network).course_ids == plan.course_ids
+    True
+    """
+    slots = network.courses
+    if len(slots) > _MAX_INDEX + 1:
+        return None
+    indices = {id(slot): i for i, slot in enumerate(slots)}
+    parts = []
+    for slot in slots:
+        code = slot.data.code.encode('ascii')
+        if len(code) != _CODE_LENGTH:
+            return None
+        parts.append(_SLOT.pack(code, len(slot.prereqs)))
+        parts.extend(_INDEX.pack(indices[id(prereq)]) for prereq in slot.prereqs)
+    return b''.join(parts)
+
+
+def decode_plan(plan: bytes, network: DatabaseCourseNetwork) -> Optional[PlannerCourseNetwork]:
+    """
+    Return the plan with the given compact binary form (see encode_plan), using the courses of the given network, or
+    None if one of its courses is not in the network
+    """
+    slots = []
+    pos = 0
+    while pos < len(plan):
+        code, count = _SLOT.unpack_from(plan, pos)
+        pos += _SLOT.size
+        prereqs = tuple(slots[_INDEX.unpack_from(plan, pos + i * _INDEX.size)[0]] for i in range(count))
+        pos += count * _INDEX.size
+        course = network.get_course(code.decode('ascii'))
+        if course is None:
+            return None
+        slots.append(PlannerSlot(course, prereqs))
+    return PlannerCourseNetwork(slots[-1])
+
+
+def _encode_key(key: PlanKey) -> tuple[str, str, str]:
+    """
+    Return the columns of the given key: the course, the planner and the sorted codes of the courses taken
+    """
+    course, planner, taken = key
+    return course, planner, ','.join(sorted(taken))
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'sqlite3', 'struct', 'threading', 'time', 'course_network', 'plan_cache'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,1000 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Planners that find the best PlannerCourseNetwork for a course without building every possible network first (like
+DatabaseCourseNetwork.get_all_prereq_networks does).
+
+The best network is the one with the shortest length (in terms), and among those the one with the fewest credits, the
+same choice runner.get_course_tree makes from every possible network.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Iterator, Optional
+
+import heapq
+import itertools
+import time
+
+from course_network import DatabaseCourse, DatabaseCourseNetwork, PlannerCourseNetwork, PlannerSlot, build_slot, \
+    get_combo_duration, merge_slots
+from course_codes import iter_ids
+from prereq_closure import PrereqClosure
+
+
+def get_prereq_options(network: DatabaseCourseNetwork, course: DatabaseCourse) -> list[list[DatabaseCourse]]:
+    """
+    Return the ways to fulfill the prereqs of the given course, as lists of the courses that still have to be taken
+    for each of the course's prereq combinations (an empty list if the combination is already fulfilled)
+
+    Like in get_all_prereq_networks, combinations containing a course that is not in the network are left out.
+    """
+    if course.prerequisites == [0]:
+        return [[]]
+
+    options = []
+    for req in course.prerequisites:
+        missing = req & ~network.courses_taken
+        courses = [network.courses.get(course_id) for course_id in iter_ids(missing)]
+        if None not in courses:
+            options.append(courses)
+
+    # Only the cheapest prereq combinations of some courses are listed, so the user may fulfill the prereqs with
+    # another one
+    if course.prereqs_truncated and [] not in options and course.is_satisfied(network.courses_taken):
+        options.append([])
+    return options
+
+
+class _InProgress:
+    """
+    The courses whose plans a planner is finding. The plans of a course's prereqs are found while it is in progress, so
+    each course in progress is a prereq of the one before it.
+
+    Instance Attributes:
+        - depths: the position (depth) of every course in progress, by its ID, starting from 0
+        - ids: the bitset of IDs of every course in progress
+    """
+    depths: dict[int, int]
+    ids: int
+
+    def __init__(self) -> None:
+        self.depths = {}
+        self.ids = 0
+
+    def push(self, course_id: int) -> None:
+        """
+        Add the course with the given ID after the courses in progress
+        """
+        self.depths[course_id] = len(self.depths)
+        self.ids |= 1 << course_id
+
+    def pop(self, course_id: int) -> None:
+        """
+        Remove the course with the given ID, the last course in progress
+        """
+        del self.depths[course_id]
+        self.ids &= ~(1 << course_id)
+
+    def get_low(self, courses: int) -> int:
+        """
+        Return the lowest depth of a course in progress in the given bitset of IDs, or the number of courses in
+        progress if there is none
+        """
+        return min((self.depths[course_id] for course_id in iter_ids(courses & self.ids)), default=len(self.depths))
+
+
+class _MemoPlan:
+    """
+    The best plan found for a course by a DynamicPlanner
+
+    Instance Attributes:
+        - course: the course the plan ends with
+        - length: the length (in terms) of the plan
+        - courses: the bitset of IDs of every course in the plan
+        - credits: the credits of every course in the plan that was not already taken
+        - prereqs: the best plans of the prereqs the plan takes first
+    """
+    course: DatabaseCourse
+    length: int
+    courses: int
+    credits: int
+    prereqs: list[_MemoPlan]
+    _slot: Optional[PlannerSlot]
+
+    def __init__(self, course: DatabaseCourse, prereqs: list[_MemoPlan], network: DatabaseCourseNetwork) -> None:
+        self.course = course
+        self.prereqs = prereqs
+        self._slot = None
+        self.length = max((plan.length for plan in prereqs), default=0) + course.duration
+        self.courses = 1 << course.course_id
+        for plan in prereqs:
+            self.courses |= plan.courses
+        self.credits = get_combo_duration(network.table, self.courses & ~network.courses_taken)
+
+    def to_network(self) -> PlannerCourseNetwork:
+        """
+        Return a new PlannerCourseNetwork of this plan
+        """
+        return PlannerCourseNetwork(self.get_slot())
+
+    def get_slot(self) -> PlannerSlot:
+        """
+        Return the last PlannerSlot of this plan, which is only built once and shared by every plan that takes it
+        """
+        if self._slot is None:
+            self._slot = build_slot(self.course, (plan.get_slot() for plan in self.prereqs))
+        return self._slot
+
+
+class DynamicPlanner:
+    """
+    A planner that finds the best plan of every course once, by combining the best plans of its prereqs
+
+    A course's plan only depends on the plans of its prereqs, so the best plan of each course is computed bottom-up
+    (prereqs before the courses that need them) and remembered, and no other plan is ever built. The length of the
+    best plan is always the shortest possible. Its credits are the fewest possible unless two prereqs of a course share
+    prereqs of their own, since every prereq's plan is chosen without knowing what the other prereqs will take.
+
+    A course that is its own (indirect) prereq cannot be taken before itself, so while the plan of a course is being
+    found, the plans of its prereqs may not take it. Plans found under such a restriction are not remembered.
+
+    Instance Attributes:
+        - network: the network (and its courses taken) the planner plans for
+
+    >>> from catalog import build_course_network
+    >>> network = build_course_network([{'course code': 'CSC108H1', 'prerequisites': ''},
+    ...                                 {'course code': 'CSC110Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'CSC148H1', 'prerequisites': 'CSC108H1|CSC110Y1'}])
+    >>> planner = DynamicPlanner(network)
+    >>> planner.get_best_length(network.get_course('CSC148H1'))
+    2
+    >>> sorted(network.table.get_mask_codes(planner.get_best_plan(network.get_course('CSC148H1')).course_ids))
+    ['CSC108H1', 'CSC148H1']
+    """
+    network: DatabaseCourseNetwork
+    _plans: dict[int, Optional[_MemoPlan]]
+    _in_progress: _InProgress
+
+    def __init__(self, network: DatabaseCourseNetwork) -> None:
+        self.network = network
+        self._plans = {}
+        self._in_progress = _InProgress()
+
+    def get_best_plan(self, course: DatabaseCourse) -> Optional[PlannerCourseNetwork]:
+        """
+        Return the best PlannerCourseNetwork that ends with the given course, or None if its prereqs cannot be
+        fulfilled
+        """
+        plan = self._get_plan(course)
+        return plan.to_network() if plan is not None else None
+
+    def get_best_plans(self, courses: list[DatabaseCourse]) -> Optional[list[PlannerCourseNetwork]]:
+        """
+        Return a PlannerCourseNetwork for each of the given courses (in the same order), which share their common
+        prereqs, or None if the prereqs of one of them cannot be fulfilled
+
+        The plan of each course is its best plan, so the networks are as short as possible, and the best plans of
+        prereqs shared by the courses are only found once.
+        """
+        plans = [self._get_plan(course) for course in courses]
+        if None in plans:
+            return None
+        return [PlannerCourseNetwork(slot) for slot in merge_slots(plan.get_slot() for plan in plans)]
+
+    def get_best_length(self, course: DatabaseCourse) -> Optional[int]:
+        """
+        Return the length (in terms) of the shortest plan that ends with the given course, or None if its prereqs
+        cannot be fulfilled
+        """
+        plan = self._get_plan(course)
+        return plan.length if plan is not None else None
+
+    def set_courses_taken(self, courses_taken: int, closure: PrereqClosure) -> int:
+        """
+        Plan for the given bitset of IDs of courses taken from now on, and return the number of best plans forgotten
+
+        A course's best plan only depends on which courses in its prerequisite cone (and the course itself) are taken,
+        so only the plans of the courses whose cones contain a course that was added or removed are forgotten. The
+        others are kept and reused. The planner's network is replaced (not changed), so other users of it are not
+        affected.
+
+        Preconditions:
+        - closure.network.courses is self.network.courses
+        """
+        changed = courses_taken ^ self.network.courses_taken
+        network = DatabaseCourseNetwork(set(), self.network.table)
+        network.courses = self.network.courses
+        network.courses_taken = courses_taken
+        self.network = network
+        if changed == 0:
+            return 0
+
+        stale = [course_id for course_id in self._plans
+                 if (closure.get_ancestors(self.network.courses[course_id]) | 1 << course_id) & changed]
+        for course_id in stale:
+            del self._plans[course_id]
+        return len(stale)
+
+    def _get_plan(self, course: DatabaseCourse) -> Optional[_MemoPlan]:
+        """
+        Return the best plan that ends with the given course (computing it if it was not yet), or None if there is none
+        """
+        return self._find_plan(course)[0]
+
+    def _find_plan(self, course: DatabaseCourse) -> tuple[Optional[_MemoPlan], int]:
+        """
+        Return the best plan that ends with the given course and takes none of the courses whose plans are being found,
+        or None if there is none, and the lowest depth (position in the courses being found) of a course being found
+        that the plan depends on, or the depth of the course itself if it depends on none
+
+        A plan that depends on a course being found before the given one was only found for the courses being found
+        now, so it is not remembered. Only plans that depend on no such course are the same however they are reached.
+        """
+        depth = len(self._in_progress.depths)
+        if course.course_id in self._in_progress.depths:
+            return None, self._in_progress.depths[course.course_id]
+
+        low = depth
+        if course.course_id in self._plans:
+            plan = self._plans[course.course_id]
+            if plan is None or plan.courses & self._in_progress.ids == 0:
+                return plan, depth
+            # The remembered plan takes a course being found, so another plan is needed here
+            low = self._in_progress.get_low(plan.courses)
+
+        self._in_progress.push(course.course_id)
+        best = None
+        for option in get_prereq_options(self.network, course):
+            prereqs = []
+            for prereq in option:
+                plan, prereq_low = self._find_plan(prereq)
+                low = min(low, prereq_low)
+                if plan is None:
+                    break
+                prereqs.append(plan)
+            else:
+                plan = _MemoPlan(course, prereqs, self.network)
+                if best is None or (plan.length, plan.credits) < (best.length, best.credits):
+                    best = plan
+        self._in_progress.pop(course.course_id)
+
+        if low >= depth:
+            self._plans[course.course_id] = best
+        return best, low
+
+
+class PlanningSession:
+    """
+    A planning session for one course, for trying out what happens when courses are added to or removed from the
+    courses taken (e.g. "what if I had taken MAT137Y1?")
+
+    The session keeps the best plans its DynamicPlanner found for the course and its prereqs. When the courses taken
+    change, only the plans of the courses whose prerequisite cones contain a changed course are found again (see
+    DynamicPlanner.set_courses_taken), so trying a change costs much less than planning from scratch, even for a
+    course with many prereqs.
+
+    Instance Attributes:
+        - course: the course the session plans for
+        - closure: the prerequisite closure of the session's network
+        - last_replanned: the number of best plans the last change of the courses taken made the session find again
+
+    Representation Invariants:
+    - self.closure.network.courses is self._planner.network.courses
+
+    >>> from catalog import build_course_network
+    >>> network = build_course_network([{'course code': 'CSC110Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'MAT137Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'CSC111H1', 'prerequisites': 'CSC110Y1'},
+    ...                                 {'course code': 'CSC236H1', 'prerequisites': 'CSC111H1^MAT137Y1'}])
+    >>> session = PlanningSession(network, network.get_course('CSC236H1'), PrereqClosure(network))
+    >>> session.get_best_plan().length
+    4
+    >>> session.add_taken('CSC111H1')
+    >>> session.get_best_plan().length, session.last_replanned
+    (3, 2)
+    >>> session.add_taken('XYZ999H1')  # not in the catalog, so it is ignored
+    >>> session.get_courses_taken(), 'XYZ999H1' in network.table
+    ({'CSC111H1'}, False)
+    """
+    course: DatabaseCourse
+    closure: PrereqClosure
+    last_replanned: int
+    _planner: DynamicPlanner
+
+    def __init__(self, network: DatabaseCourseNetwork, course: DatabaseCourse, closure: PrereqClosure) -> None:
+        self.course = course
+        self.closure = closure
+        self.last_replanned = 0
+        self._planner = DynamicPlanner(network)
+
+    def get_courses_taken(self) -> set[str]:
+        """
+        Return the codes of the courses currently taken in the session
+        """
+        return self._planner.network.table.get_mask_codes(self._planner.network.courses_taken)
+
+    def get_best_plan(self) -> Optional[PlannerCourseNetwork]:
+        """
+        Return the best PlannerCourseNetwork that ends with the session's course given the courses currently taken, or
+        None if its prereqs cannot be fulfilled
+
+        Only the plans forgotten since the last call are found again.
+        """
+        return self._planner.get_best_plan(self.course)
+
+    def add_taken(self, code: str) -> None:
+        """
+        Add the course with the given code to the courses taken
+        """
+        self._set_courses_taken(self._planner.network.courses_taken | self._get_mask({code}))
+
+    def remove_taken(self, code: str) -> None:
+        """
+        Remove the course with the given code from the courses taken
+        """
+        self._set_courses_taken(self._planner.network.courses_taken & ~self._get_mask({code}))
+
+    def set_taken(self, codes: set[str]) -> None:
+        """
+        Replace the courses taken with the courses with the given codes
+        """
+        self._set_courses_taken(self._get_mask(codes))
+
+    def _get_mask(self, codes: set[str]) -> int:
+        """
+        Return the bitset of IDs of the courses with the given codes, ignoring codes the network's table does not know
+        (which cannot matter for any plan)
+
+        The table is shared by everything planning with the catalog, so unknown codes (e.g. typos) are not added to it.
+        """
+        table = self._planner.network.table
+        mask = 0
+        for code in codes:
+            if code in table:
+                mask |= 1 << table.get_id(code)
+        return mask
+
+    def _set_courses_taken(self, courses_taken: int) -> None:
+        """
+        Replace the courses taken with the given bitset of IDs, forgetting the plans that depend on the change
+        """
+        self.last_replanned = self._planner.set_courses_taken(courses_taken, self.closure)
+
+
+class _ParetoPlan:
+    """
+    A plan in the frontier of a ParetoPlanner
+
+    Instance Attributes:
+        - course: the course the plan ends with, or None for a partial plan of the prereqs of an option
+        - length: the length (in terms) of the plan
+        - courses: the bitset of IDs of every course in the plan that was not already taken
+        - prereqs: the plans of the prereqs the plan takes first
+    """
+    course: Optional[DatabaseCourse]
+    length: int
+    courses: int
+    prereqs: list[_ParetoPlan]
+    _slot: Optional[PlannerSlot]
+
+    def __init__(self, course: Optional[DatabaseCourse], length: int, courses: int, prereqs: list[_ParetoPlan]) -> None:
+        self.course = course
+        self.length = length
+        self.courses = courses
+        self.prereqs = prereqs
+        self._slot = None
+
+    def dominates(self, other: _ParetoPlan) -> bool:
+        """
+        Return whether this plan is at least as good as other in every way, no matter what other courses are planned
+        with it: it is no longer, and every course it takes is also taken by other
+        """
+        return self.length <= other.length and self.courses & other.courses == self.courses
+
+    def to_network(self) -> PlannerCourseNetwork:
+        """
+        Return a new PlannerCourseNetwork of this plan
+
+        Preconditions:
+        - self.course is not None
+        """
+        return PlannerCourseNetwork(self.get_slot())
+
+    def get_slot(self) -> PlannerSlot:
+        """
+        Return the last PlannerSlot of this plan, which is only built once and shared by every plan that takes it
+
+        Preconditions:
+        - self.course is not None
+        """
+        if self._slot is None:
+            self._slot = build_slot(self.course, (plan.get_slot() for plan in self.prereqs))
+        return self._slot
+
+
+class ParetoPlanner:
+    """
+    A planner that finds every Pareto-optimal plan of a course: every plan for which no other plan is at least as good
+    in length (terms), credits and number of courses, and better in at least one of them
+
+    Like the DynamicPlanner, the plans of each course are found once, from the plans of its prereqs, and remembered.
+    Instead of only the best plan, each course keeps every plan that is not dominated by another one. A plan is only
+    dominated if another plan is no longer and takes a subset of its courses, since prereqs of different courses can
+    be shared. Dominated plans are dropped as soon as they are built, after each prereq is added to a partial plan.
+    Only the frontier of the planned course itself is compared on credits and number of courses alone. Like in the
+    DynamicPlanner, the plans of a course's prereqs may not take the course itself, and plans found under that
+    restriction are not remembered.
+
+    To keep planning fast, at most max_plans plans are kept for a single course (the shortest, cheapest ones). When
+    plans had to be dropped for that reason, the frontier returned may be missing some Pareto-optimal plans, which
+    get_frontier reports in truncated.
+
+    Instance Attributes:
+        - network: the network (and its courses taken) the planner plans for
+        - max_plans: the largest number of plans kept for a single course, or None to keep every one
+        - truncated: whether plans were dropped to keep at most max_plans plans while finding the last frontier
+          returned by get_frontier, so that it may not contain every Pareto-optimal plan
+
+    >>> from catalog import build_course_network
+    >>> network = build_course_network([{'course code': 'CSC108H1', 'prerequisites': ''},
+    ...                                 {'course code': 'CSC165H1', 'prerequisites': ''},
+    ...                                 {'course code': 'MAT135H1', 'prerequisites': ''},
+    ...                                 {'course code': 'STA130H1', 'prerequisites': ''},
+    ...                                 {'course code': 'CSC148H1', 'prerequisites': 'CSC165H1'},
+    ...                                 {'course code': 'CSC263H1',
+    ...                                  'prerequisites': 'CSC148H1|(CSC108H1^MAT135H1^STA130H1)'}])
+    >>> planner = ParetoPlanner(network)
+    >>> [(plan.length, plan.get_number_of_credits(0)) for plan in planner.get_frontier(network.get_course('CSC263H1'))]
+    [(2, 4), (3, 3)]
+    >>> planner.truncated
+    False
+    """
+    network: DatabaseCourseNetwork
+    max_plans: Optional[int]
+    truncated: bool
+    _frontiers: dict[int, list[_ParetoPlan]]
+    _truncated_ids: int
+    _in_progress: _InProgress
+    _two_term_courses: int
+
+    def __init__(self, network: DatabaseCourseNetwork, max_plans: Optional[int] = 64) -> None:
+        self.network = network
+        self.max_plans = max_plans
+        self.truncated = False
+        self._frontiers = {}
+        self._truncated_ids = 0
+        self._in_progress = _InProgress()
+        self._two_term_courses = 0
+        for course in network.courses.values():
+            if course.duration == 2:
+                self._two_term_courses |= 1 << course.course_id
+
+    def get_frontier(self, course: DatabaseCourse) -> list[PlannerCourseNetwork]:
+        """
+        Return the Pareto-optimal PlannerCourseNetworks that end with the given course, ordered by length, then credits,
+        then number of courses (so the first one is the network get_course_tree picks)
+
+        self.truncated is set to whether some of them may be missing because of max_plans. The networks'
+        proven_optimal attributes are then False, since a missing plan may dominate them.
+        """
+        plans, _, self.truncated = self._find_frontier(course)
+        frontier = []
+        for plan in sorted(plans, key=self._get_key):
+            plan_credits, count = self._get_key(plan)[1:]
+            # plans are ordered by length, so only the credits and number of courses of shorter plans matter
+            if all(plan_credits < kept_credits or count < kept_count for _, kept_credits, kept_count in
+                   (self._get_key(kept) for kept in frontier)):
+                frontier.append(plan)
+        networks = [plan.to_network() for plan in frontier]
+        for network in networks:
+            network.proven_optimal = not self.truncated
+        return networks
+
+    def _get_key(self, plan: _ParetoPlan) -> tuple[int, int, int]:
+        """
+        Return the (length, credits, number of courses) of the given plan
+        """
+        return (plan.length, plan.courses.bit_count() + (plan.courses & self._two_term_courses).bit_count(),
+                plan.courses.bit_count())
+
+    def _find_frontier(self, course: DatabaseCourse) -> tuple[list[_ParetoPlan], int, bool]:
+        """
+        Return the plans that end with the given course that are not dominated and take none of the courses whose
+        plans are being found, the lowest depth of a course being found that they depend on (like in
+        DynamicPlanner._find_plan), and whether plans were dropped because of max_plans
+        """
+        depth = len(self._in_progress.depths)
+        if course.course_id in self._in_progress.depths:
+            return [], self._in_progress.depths[course.course_id], False
+
+        low = depth
+        if course.course_id in self._frontiers:
+            frontier = self._frontiers[course.course_id]
+            taken_in_progress = 0
+            for plan in frontier:
+                taken_in_progress |= plan.courses & self._in_progress.ids
+            if taken_in_progress == 0:
+                return frontier, depth, self._truncated_ids >> course.course_id & 1 == 1
+            # Some remembered plans take a course being found, so the frontier has to be found again here
+            low = self._in_progress.get_low(taken_in_progress)
+
+        self._in_progress.push(course.course_id)
+        truncated = False
+        plans = []
+        for option in get_prereq_options(self.network, course):
+            partial, option_low, option_truncated = self._combine_prereq_frontiers(course, option)
+            low = min(low, option_low)
+            truncated = truncated or option_truncated
+            plans.extend(_ParetoPlan(course, plan.length + course.duration, plan.courses, plan.prereqs)
+                         for plan in partial)
+        self._in_progress.pop(course.course_id)
+
+        frontier, pruned_truncated = self._prune(plans)
+        truncated = truncated or pruned_truncated
+        if low >= depth:
+            self._frontiers[course.course_id] = frontier
+            if truncated:
+                self._truncated_ids |= 1 << course.course_id
+        return frontier, low, truncated
+
+    def _combine_prereq_frontiers(self, course: DatabaseCourse, option: list[DatabaseCourse]) \
+            -> tuple[list[_ParetoPlan], int, bool]:
+        """
+        Return the partial plans of the given prereq option of the given course (in progress) that take a plan of every
+        prereq in it and are not dominated, the lowest depth of a course being found that they depend on (like in
+        _find_frontier), and whether plans were dropped because of max_plans
+
+        The prereqs are added to the partial plans one at a time, dropping dominated partial plans after each one.
+        """
+        partial = [_ParetoPlan(None, 0, 1 << course.course_id & ~self.network.courses_taken, [])]
+        low = len(self._in_progress.depths)
+        truncated = False
+        for prereq in option:
+            prereq_plans, prereq_low, prereq_truncated = self._find_frontier(prereq)
+            low = min(low, prereq_low)
+            partial, pruned_truncated = self._prune([
+                _ParetoPlan(None, max(plan.length, prereq_plan.length), plan.courses | prereq_plan.courses,
+                            plan.prereqs + [prereq_plan])
+                for plan in partial for prereq_plan in prereq_plans])
+            truncated = truncated or prereq_truncated or pruned_truncated
+        return partial, low, truncated
+
+    def _prune(self, plans: list[_ParetoPlan]) -> tuple[list[_ParetoPlan], bool]:
+        """
+        Return the plans that are not dominated by another one (keeping one of any equal plans), at most max_plans of
+        them, and whether plans that are not dominated were dropped to keep at most max_plans
+        """
+        kept = []
+        # A plan can only be dominated by plans that are no longer and have no more credits, which come before it
+        for plan in sorted(plans, key=self._get_key):
+            if not any(other.dominates(plan) for other in kept):
+                if len(kept) == self.max_plans:
+                    return kept, True
+                kept.append(plan)
+        return kept, False
+
+
+class _SearchState:
+    """
+    A partial plan in the search of a BranchAndBoundPlanner
+
+    The plan is a tree of occurrences of courses (a course can occur more than once, like in the networks of
+    get_all_prereq_networks), or a forest of them when planning for several courses, whose roots are the occurrences
+    0, 1, 2, ... Open occurrences still have to have one of their prereq options chosen.
+
+    Instance Attributes:
+        - courses: the bitset of IDs of every course in the plan so far
+        - credits: the credits of every course in the plan so far that was not already taken
+        - length: the length (in terms) of the longest finished chain of the plan
+        - open: the (lower bound on the length of its longest chain, course ID, length of the chain above it, bitset of
+          IDs of the courses above it, occurrence ID) of every open occurrence
+        - choices: the (occurrence ID, course, occurrence IDs of its prereqs, previous choices) linked list of every
+          choice made so far
+    """
+    courses: int
+    credits: int
+    length: int
+    open: tuple[tuple[int, int, int, int, int], ...]
+    choices: Optional[tuple]
+
+    def __init__(self, courses: int, plan_credits: int, length: int, open_occurrences: tuple,
+                 choices: Optional[tuple]) -> None:
+        self.courses = courses
+        self.credits = plan_credits
+        self.length = length
+        self.open = open_occurrences
+        self.choices = choices
+
+    def to_networks(self, roots: int) -> list[PlannerCourseNetwork]:
+        """
+        Return a new PlannerCourseNetwork of each of the roots of this (finished) plan, sharing their common prereqs
+
+        Preconditions:
+        - self.open == ()
+        - roots is the number of roots of the plan
+        """
+        occurrences = {}
+        choices = self.choices
+        while choices is not None:
+            occurrence, course, prereqs, choices = choices
+            occurrences[occurrence] = (course, prereqs)
+
+        def build(occurrence: int) -> PlannerSlot:
+            """Build the slot of the given occurrence"""
+            course, prereqs = occurrences[occurrence]
+            return build_slot(course, (build(prereq) for prereq in prereqs))
+
+        return [PlannerCourseNetwork(slot) for slot in merge_slots(build(root) for root in range(roots))]
+
+
+class SearchStats:
+    """
+    The counters of the last search of a BranchAndBoundPlanner
+
+    Instance Attributes:
+        - expanded: the number of partial plans expanded by the search
+        - pruned: the number of partial plans discarded by the search because they could not beat the best plan
+        - proven_optimal: whether the search proved its plan optimal (it ran out of partial plans)
+    """
+    expanded: int
+    pruned: int
+    proven_optimal: bool
+
+    def __init__(self) -> None:
+        self.expanded = 0
+        self.pruned = 0
+        self.proven_optimal = False
+
+
+class _SearchRun:
+    """
+    The deadline and best plan so far of a search of a BranchAndBoundPlanner
+
+    Instance Attributes:
+        - end_time: the time (of time.monotonic) the search stops at, or None if it has no deadline
+        - best: the best combined plan found so far, or None before the first one is found
+        - incumbent: the (length, credits) of the best plan found so far
+    """
+    end_time: Optional[float]
+    best: Optional[list[PlannerCourseNetwork]]
+    incumbent: tuple[int, int]
+
+    def __init__(self, deadline: Optional[float]) -> None:
+        self.end_time = time.monotonic() + deadline if deadline is not None else None
+        self.best = None
+        self.incumbent = (0, 0)
+
+    def get_time_left(self) -> Optional[float]:
+        """
+        Return the number of seconds left until the deadline, or None if the search has no deadline
+        """
+        return self.end_time - time.monotonic() if self.end_time is not None else None
+
+    def is_out_of_time(self) -> bool:
+        """
+        Return whether the deadline has passed
+        """
+        return self.end_time is not None and time.monotonic() > self.end_time
+
+    def improve(self, networks: list[PlannerCourseNetwork], cost: tuple[int, int]) -> list[PlannerCourseNetwork]:
+        """
+        Make the given combined plan, with the given (length, credits), the best one found so far, and return it
+
+        The networks are not proven optimal until the search finishes.
+        """
+        for network in networks:
+            network.proven_optimal = False
+        self.best = networks
+        self.incumbent = cost
+        return networks
+
+
+class BranchAndBoundPlanner:
+    """
+    An exact planner that searches partial plans best-first by (length, credits) and prunes every partial plan that
+    cannot beat the best plan found so far
+
+    The lower bound on the length of a partial plan is the length of its longest chain if every open occurrence used
+    its shortest possible chain (the minimum chain depth of the course, found by a DynamicPlanner). The lower bound on
+    its credits are the credits of its courses, plus the credits of the cheapest new prereqs of its open occurrences
+    (only added up over courses whose options share no courses, since the others may share them). The search starts
+    with the DynamicPlanner's plan as the best plan, so it only has to prove that plan optimal or find a plan with fewer
+    credits.
+
+    The plan found is as good as the best of the networks returned by get_all_prereq_networks (the one
+    runner.get_course_tree picks). The planner can also plan for several courses at once, sharing their common prereqs
+    (see search_combined).
+
+    Instance Attributes:
+        - network: the network (and its courses taken) the planner plans for
+        - stats: the counters of the last search
+
+    The DynamicPlanner plans STA237H1 and STA238H1 on their own below, so it takes MAT135H1 for STA237H1 even though
+    STA238H1 already needs MAT136H1:
+
+    >>> from catalog import build_course_network
+    >>> network = build_course_network([{'course code': 'MAT135H1', 'prerequisites': ''},
+    ...                                 {'course code': 'MAT136H1', 'prerequisites': ''},
+    ...                                 {'course code': 'STA237H1', 'prerequisites': 'MAT135H1|MAT136H1'},
+    ...                                 {'course code': 'STA238H1', 'prerequisites': 'MAT136H1'},
+    ...                                 {'course code': 'STA302H1', 'prerequisites': 'STA237H1^STA238H1'}])
+    >>> target = network.get_course('STA302H1')
+    >>> DynamicPlanner(network).get_best_plan(target).get_number_of_credits(0)
+    5
+    >>> planner = BranchAndBoundPlanner(network)
+    >>> plan = planner.search(target)
+    >>> plan.length, plan.get_number_of_credits(0), planner.stats.proven_optimal
+    (3, 4, True)
+    """
+    network: DatabaseCourseNetwork
+    stats: SearchStats
+    _depths: DynamicPlanner
+    _options: dict[int, list[tuple[list[DatabaseCourse], int]]]
+    _option_courses: dict[int, int]
+    _two_term_courses: int
+
+    def __init__(self, network: DatabaseCourseNetwork) -> None:
+        self.network = network
+        self.stats = SearchStats()
+        self._depths = DynamicPlanner(network)
+        self._options = {}
+        self._option_courses = {}
+        self._two_term_courses = 0
+        for course in network.courses.values():
+            if course.duration == 2:
+                self._two_term_courses |= 1 << course.course_id
+
+    def search(self, course: DatabaseCourse, deadline: Optional[float] = None) -> Optional[PlannerCourseNetwork]:
+        """
+        Return the best PlannerCourseNetwork that ends with the given course, or None if its prereqs cannot be
+        fulfilled
+
+        If deadline is given, the search stops after deadline seconds and returns the best network found so far.
+        self.stats.proven_optimal (and the returned network's proven_optimal) tells whether it is the best one.
+        """
+        networks = list(self.iter_improving_plans(course, deadline))
+        return networks[-1] if networks else None
+
+    def iter_improving_plans(self, course: DatabaseCourse, deadline: Optional[float] = None) \
+            -> Iterator[PlannerCourseNetwork]:
+        """
+        Yield better and better PlannerCourseNetworks that end with the given course, ending with the best one (or the
+        best one found in deadline seconds, if deadline is given)
+
+        The first network is the DynamicPlanner's, which always has the shortest length, so a network is yielded right
+        away. Nothing is yielded if the course's prereqs cannot be fulfilled. Once the search finishes without running
+        out of time, self.stats.proven_optimal and the proven_optimal of the last yielded network are set to True.
+        """
+        for networks in self.iter_improving_combined_plans([course], deadline):
+            yield networks[0]
+
+    def search_combined(self, courses: list[DatabaseCourse], deadline: Optional[float] = None) \
+            -> Optional[list[PlannerCourseNetwork]]:
+        """
+        Return the best combined plan for all the given courses: a PlannerCourseNetwork for each of them (in the same
+        order), sharing their common prereqs, with the shortest total length and then the fewest total credits. Return
+        None if the prereqs of one of them cannot be fulfilled.
+
+        deadline is used like in search.
+
+        >>> from catalog import build_course_network
+        >>> network = build_course_network([{'course code': 'CSC110Y1', 'prerequisites': ''},
+        ...                                 {'course code': 'MAT137Y1', 'prerequisites': ''},
+        ...                                 {'course code': 'CSC111H1', 'prerequisites': 'CSC110Y1'},
+        ...                                 {'course code': 'CSC207H1', 'prerequisites': 'CSC111H1'},
+        ...                                 {'course code': 'CSC236H1', 'prerequisites': 'CSC111H1^MAT137Y1'}])
+        >>> plans = BranchAndBoundPlanner(network).search_combined([network.get_course('CSC207H1'),
+        ...                                                         network.get_course('CSC236H1')])
+        >>> [plan.length for plan in plans]
+        [4, 4]
+        >>> plans[0].end.prereqs[0] in plans[1].end.prereqs  # both plans take the same CSC111H1 slot
+        True
+        """
+        plans = list(self.iter_improving_combined_plans(courses, deadline))
+        return plans[-1] if plans else None
+
+    def iter_improving_combined_plans(self, courses: list[DatabaseCourse], deadline: Optional[float] = None) \
+            -> Iterator[list[PlannerCourseNetwork]]:
+        """
+        Yield better and better combined plans for all the given courses (see search_combined), ending with the best
+        one (or the best one found in deadline seconds, if deadline is given)
+
+        The length of a combined plan is the length of its longest network, and its credits are the credits of every
+        course in any of its networks. Like in iter_improving_plans, the DynamicPlanner's plan is yielded first, and
+        self.stats.proven_optimal and the proven_optimal of the last yielded networks are set once the search
+        finishes.
+        """
+        self.stats = SearchStats()
+        run = _SearchRun(deadline)
+
+        first = self._depths.get_best_plans(courses)
+        if first is None:
+            self.stats.proven_optimal = True
+            return
+        yield run.improve(first, self._get_combined_cost(first))
+
+        if len(courses) > 1:
+            # The best plan of each course on its own is much faster to find, and the plans sharing their common
+            # prereqs are often (close to) the best combined plan, which prunes much more of the search
+            combined = self._find_separate_plans(courses, run)
+            if self._get_combined_cost(combined) < run.incumbent:
+                yield run.improve(combined, self._get_combined_cost(combined))
+
+        yield from self._iter_best_first(courses, run)
+
+    def _find_separate_plans(self, courses: list[DatabaseCourse], run: _SearchRun) -> list[PlannerCourseNetwork]:
+        """
+        Return the combined plan made of the best plan of each of the given courses on its own (found before the
+        deadline of run), sharing their common prereqs, adding the partial plans searched to self.stats
+
+        Preconditions:
+        - all(self._depths.get_best_length(course) is not None for course in courses)
+        """
+        stats = self.stats
+        separate = []
+        for course in courses:
+            separate.append(self.search(course, run.get_time_left()))
+            stats.expanded += self.stats.expanded
+            stats.pruned += self.stats.pruned
+        self.stats = stats
+        return [PlannerCourseNetwork(slot) for slot in merge_slots(network.end for network in separate)]
+
+    def _iter_best_first(self, courses: list[DatabaseCourse], run: _SearchRun) -> Iterator[list[PlannerCourseNetwork]]:
+        """
+        Search the partial plans for the given courses best-first, yielding every combined plan better than the best
+        one of run, until the deadline of run
+
+        If the search finishes in time, self.stats.proven_optimal and the proven_optimal of the best networks of run are
+        set to True.
+
+        Preconditions:
+        - run.best is not None
+        """
+        counter = itertools.count()
+        occurrences = itertools.count(len(courses))
+        start = self._get_start_state(courses)
+        frontier = [(self._get_bounds(start), next(counter), start)]
+        while frontier:
+            if run.is_out_of_time():
+                # Out of time - the best plan so far may not be the best one
+                return
+            bounds, _, state = heapq.heappop(frontier)
+            if bounds >= run.incumbent:
+                # Every other partial plan is at least as bad
+                self.stats.pruned += len(frontier) + 1
+                break
+            if state.open == ():
+                yield run.improve(state.to_networks(len(courses)), bounds)
+                continue
+
+            self.stats.expanded += 1
+            for child in self._expand(state, occurrences):
+                child_bounds = self._get_bounds(child)
+                if child_bounds >= run.incumbent:
+                    self.stats.pruned += 1
+                else:
+                    heapq.heappush(frontier, (child_bounds, next(counter), child))
+
+        self.stats.proven_optimal = True
+        for network in run.best:
+            network.proven_optimal = True
+
+    def _get_start_state(self, courses: list[DatabaseCourse]) -> _SearchState:
+        """
+        Return the partial plan the search for the given courses starts from, where every course is an open root
+        """
+        roots = 0
+        for course in courses:
+            roots |= 1 << course.course_id
+        return _SearchState(roots, self._get_credits(roots), 0,
+                            tuple((self._depths.get_best_length(course), course.course_id, 0, 0, root)
+                                  for root, course in enumerate(courses)), None)
+
+    def _expand(self, state: _SearchState, occurrences: Iterator[int]) -> list[_SearchState]:
+        """
+        Return the partial plans made by choosing every prereq option of the last open occurrence of state
+        """
+        course_id, above, ancestors, occurrence = state.open[-1][1:]
+        course = self.network.courses[course_id]
+        ancestors |= 1 << course_id
+        chain = above + course.duration
+
+        children = []
+        for prereqs, prereq_mask in self._get_options(course):
+            # A course cannot be its own (indirect) prereq
+            if prereq_mask & ancestors:
+                continue
+            depths = [self._depths.get_best_length(prereq) for prereq in prereqs]
+            if None in depths:
+                # One of the prereqs can never be taken
+                continue
+            new_courses = prereq_mask & ~state.courses
+            prereq_occurrences = [next(occurrences) for _ in prereqs]
+            children.append(_SearchState(
+                state.courses | new_courses, state.credits + self._get_credits(new_courses),
+                max(state.length, chain) if prereqs == [] else state.length,
+                state.open[:-1] + tuple(
+                    (chain + depth, prereq.course_id, chain, ancestors, prereq_occurrence)
+                    for prereq, depth, prereq_occurrence in zip(prereqs, depths, prereq_occurrences)),
+                (occurrence, course, prereq_occurrences, state.choices)))
+        return children
+
+    def _get_bounds(self, state: _SearchState) -> tuple[int, int]:
+        """
+        Return lower bounds on the (length, credits) of every finished plan that can be made from state
+        """
+        length = max(state.length, max((entry[0] for entry in state.open), default=0))
+
+        # Every open course adds at least the credits of its cheapest option's courses that are not in the plan yet.
+        # Options of different courses may share courses, so these credits can only be added up for courses none of
+        # whose options share a course (the others only count through the largest of them)
+        cheapest_credits = []
+        available = ~(state.courses | self.network.courses_taken)
+        two_term_courses = self._two_term_courses
+        for course_id in {entry[1] for entry in state.open}:
+            options = self._get_options(self.network.courses[course_id])
+            cheapest = min(((mask & available).bit_count() + (mask & available & two_term_courses).bit_count()
+                            for _, mask in options), default=0)
+            cheapest_credits.append((cheapest, self._option_courses[course_id]))
+
+        extra_credits = 0
+        counted = 0
+        for cheapest, option_courses in sorted(cheapest_credits, key=lambda entry: entry[0], reverse=True):
+            if option_courses & counted == 0:
+                extra_credits += cheapest
+                counted |= option_courses
+        return (length, state.credits + extra_credits)
+
+    def _get_options(self, course: DatabaseCourse) -> list[tuple[list[DatabaseCourse], int]]:
+        """
+        Return the prereq options of the given course (see get_prereq_options), each with the bitset of its courses
+        """
+        options = self._options.get(course.course_id)
+        if options is None:
+            options = []
+            option_courses = 0
+            for prereqs in get_prereq_options(self.network, course):
+                mask = 0
+                for prereq in prereqs:
+                    mask |= 1 << prereq.course_id
+                options.append((prereqs, mask))
+                option_courses |= mask
+            self._options[course.course_id] = options
+            self._option_courses[course.course_id] = option_courses
+        return options
+
+    def _get_combined_cost(self, networks: list[PlannerCourseNetwork]) -> tuple[int, int]:
+        """
+        Return the (length, credits) of the combined plan of the given networks
+        """
+        courses = 0
+        for network in networks:
+            courses |= network.course_ids
+        return (max(network.length for network in networks), self._get_credits(courses))
+
+    def _get_credits(self, courses: int) -> int:
+        """
+        Return the credits of the courses in the given bitset of IDs that were not already taken
+        """
+        courses &= ~self.network.courses_taken
+        return courses.bit_count() + (courses & self._two_term_courses).bit_count()
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['heapq', 'itertools', 'time', 'course_network', 'course_codes', 'prereq_closure'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -0,0 +1,157 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Transitive prerequisite closure of the catalog. The set of every course that may be needed, directly or not, to take
+each course (its prerequisite cone) is stored as a bitset over course IDs, so questions like "is MAT137Y1 ever needed
+for CSC373H1?" are answered with a single bit test instead of building any networks. The closure is updated in place
+when the prerequisites of a single course change.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Iterable
+
+from course_codes import iter_ids
+from course_network import DatabaseCourse, DatabaseCourseNetwork
+
+
+class PrereqClosure:
+    """
+    The prerequisite cone of every course in a DatabaseCourseNetwork
+
+    The cone of a course is every course that may be needed to take it: its direct prereqs (see
+    DatabaseCourse.get_prereq_courses), their direct prereqs, and so on. A course is in its own cone exactly when it is
+    its own (indirect) prereq.
+
+    Instance Attributes:
+        - network: the network the closure is of
+
+    Representation Invariants:
+    - all(self._direct[c] & ~self._ancestors[c] == 0 for c in self._direct)
+    - all(self._ancestors[p] & ~self._ancestors[c] == 0 for c in self._direct for p in iter_ids(self._direct[c])
+          if p in self._ancestors)
+
+    >>> from catalog import build_course_network
+    >>> network = build_course_network([{'course code': 'CSC110Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'MAT137Y1', 'prerequisites': ''},
+    ...                                 {'course code': 'MAT237Y1', 'prerequisites': 'MAT137Y1'},
+    ...                                 {'course code': 'MAT337H1', 'prerequisites': 'MAT237Y1'}])
+    >>> csc110, mat137, mat237, mat337 = (network.get_course(code)
+    ...                                   for code in ('CSC110Y1', 'MAT137Y1', 'MAT237Y1', 'MAT337H1'))
+    >>> closure = PrereqClosure(network)
+    >>> closure.get_cone_size(mat337), closure.may_require(mat337, mat137), closure.may_require(mat137, mat337)
+    (2, True, False)
+    >>> mat237.add_prereqs([1 << csc110.course_id])
+    >>> closure.update_course(mat237)
+    >>> sorted(network.table.get_mask_codes(closure.get_ancestors(mat337)))
+    ['CSC110Y1', 'MAT237Y1']
+    """
+    network: DatabaseCourseNetwork
+    _direct: dict[int, int]
+    _ancestors: dict[int, int]
+    _dependents: dict[int, int]
+
+    def __init__(self, network: DatabaseCourseNetwork) -> None:
+        self.network = network
+        self._direct = {}
+        self._ancestors = {}
+        self._dependents = {}
+        for course in network.courses.values():
+            self._set_direct(course.course_id, course.get_prereq_courses())
+        self._propagate(self._direct)
+
+    def get_ancestors(self, course: DatabaseCourse) -> int:
+        """
+        Return the bitset of IDs of every course in the prerequisite cone of the given course
+        """
+        return self._ancestors.get(course.course_id, 0)
+
+    def may_require(self, course: DatabaseCourse, prereq: DatabaseCourse) -> bool:
+        """
+        Return whether prereq may be needed (directly or not) to take the given course
+        """
+        return self._ancestors.get(course.course_id, 0) >> prereq.course_id & 1 == 1
+
+    def get_cone_size(self, course: DatabaseCourse) -> int:
+        """
+        Return the number of courses in the prerequisite cone of the given course
+        """
+        return self._ancestors.get(course.course_id, 0).bit_count()
+
+    def get_relevant_courses(self, course: DatabaseCourse, courses: int) -> int:
+        """
+        Return the courses in the given bitset of IDs that may matter when planning the given course: the ones in its
+        prerequisite cone
+        """
+        return courses & self._ancestors.get(course.course_id, 0)
+
+    def update_course(self, course: DatabaseCourse) -> None:
+        """
+        Update the closure after the prerequisites of the given course changed (e.g. with DatabaseCourse.add_prereqs)
+
+        Only the course and the courses whose cones contain it are recomputed.
+        """
+        course_id = course.course_id
+        affected = [course_id] + [other for other, ancestors in self._ancestors.items()
+                                  if ancestors >> course_id & 1 and other != course_id]
+        self._set_direct(course_id, course.get_prereq_courses())
+        for other in affected:
+            self._ancestors[other] = self._direct[other]
+        self._propagate(affected)
+
+    def _set_direct(self, course_id: int, direct: int) -> None:
+        """
+        Set the direct prereqs of the course with the given ID, updating the reverse edges
+        """
+        old = self._direct.get(course_id, 0)
+        for prereq in iter_ids(old & ~direct):
+            self._dependents[prereq] &= ~(1 << course_id)
+        for prereq in iter_ids(direct & ~old):
+            self._dependents[prereq] = self._dependents.get(prereq, 0) | 1 << course_id
+        self._direct[course_id] = direct
+        self._ancestors.setdefault(course_id, direct)
+
+    def _propagate(self, course_ids: Iterable[int]) -> None:
+        """
+        Grow the cones of the courses with the given IDs (and of every course that depends on them) until every cone
+        contains the cones of its direct prereqs
+        """
+        pending = list(course_ids)
+        queued = set(pending)
+        while pending:
+            course_id = pending.pop()
+            queued.discard(course_id)
+            ancestors = self._ancestors[course_id]
+            for prereq in iter_ids(self._direct[course_id]):
+                ancestors |= self._ancestors.get(prereq, 0)
+            if ancestors != self._ancestors[course_id]:
+                self._ancestors[course_id] = ancestors
+                self._queue_dependents(course_id, pending, queued)
+
+    def _queue_dependents(self, course_id: int, pending: list[int], queued: set[int]) -> None:
+        """
+        Add every course that directly depends on the course with the given ID to pending, unless it is already queued
+        """
+        for dependent in iter_ids(self._dependents.get(course_id, 0)):
+            if dependent not in queued:
+                queued.add(dependent)
+                pending.append(dependent)
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['course_codes', 'course_network'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
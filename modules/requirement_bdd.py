@@ -0,0 +1,425 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Reduced ordered binary decision diagrams (BDDs) over course IDs, used as the compact form of course requirements whose
+list of possible course combinations would be too large to build.
+
+A BDD node tests whether one course was taken and continues to its high child if it was, and to its low child if it
+was not, until it reaches TRUE or FALSE. Courses are tested in increasing order of ID, and every node is stored once in
+a unique table shared by every requirement in the catalog, so equal sub-requirements of different courses are the same
+node. Checking a requirement is a single walk from its root.
+
+The minimal course combinations of a requirement are stored in the same way, as a family node: a node that splits a
+family of course combinations into the ones without its course (low child) and the ones with it (high child), down to
+EMPTY (no combinations) or BASE (only the empty combination). Every path from a family node to BASE is one of its
+combinations, so the cheapest combinations are found with a best-first search over the paths.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from __future__ import annotations
+from typing import Callable, Iterator, Optional
+
+import heapq
+import itertools
+import threading
+
+# The IDs of the two terminal nodes
+FALSE = 0
+TRUE = 1
+
+# The IDs of the two terminal family nodes
+EMPTY = 0
+BASE = 1
+
+# The variable of the terminal nodes, which is tested after every course
+_TERMINAL_VAR = float('inf')
+
+# The number of operation results kept before the operation caches are cleared
+_CACHE_SIZE = 1 << 18
+
+
+class BDDLimitError(Exception):
+    """Raised when building a BDD would need more nodes than it is allowed"""
+
+
+class _OperationCaches:
+    """
+    The results of the recursive operations of a RequirementBDD
+
+    Instance Attributes:
+        - conjoined: the node of the conjunction of every pair of nodes (smaller ID first)
+        - disjoined: the node of the disjunction of every pair of nodes (smaller ID first)
+        - minimal: the family node of the minimal combinations of every node
+        - without: the family node of the combinations in a family node that do not fulfill a node, for every pair
+    """
+    conjoined: dict[tuple[int, int], int]
+    disjoined: dict[tuple[int, int], int]
+    minimal: dict[int, int]
+    without: dict[tuple[int, int], int]
+
+    def __init__(self) -> None:
+        self.conjoined = {}
+        self.disjoined = {}
+        self.minimal = {}
+        self.without = {}
+
+
+class RequirementBDD:
+    """
+    A store of BDD nodes over course IDs, shared by every requirement built in it
+
+    Instance Attributes:
+        - nodes: the (course ID, low child, high child) of every node, where nodes[i] is the node with ID i
+        - families: the (course ID, low child, high child) of every family node, where families[i] is the family node
+          with ID i
+        - max_nodes: the largest number of nodes (and of family nodes) the store may hold
+
+    Representation Invariants:
+    - self.nodes[FALSE] and self.nodes[TRUE] are the terminal nodes
+    - all(low != high for _, low, high in self.nodes[2:])
+    - all(self.nodes[i][0] < self.nodes[self.nodes[i][1]][0] for i in range(2, len(self.nodes)))
+    - all(self.nodes[i][0] < self.nodes[self.nodes[i][2]][0] for i in range(2, len(self.nodes)))
+    - all(high != EMPTY for _, _, high in self.families[2:])
+
+    >>> bdd = RequirementBDD()
+    >>> either = bdd.disjoin(bdd.var(0), bdd.var(1))
+    >>> both = bdd.conjoin(either, bdd.var(2))
+    >>> bdd.conjoin(bdd.var(2), bdd.disjoin(bdd.var(1), bdd.var(0))) == both
+    True
+    >>> bdd.is_satisfied(both, 0b101), bdd.is_satisfied(both, 0b011)
+    (True, False)
+    """
+    nodes: list[tuple[float, int, int]]
+    families: list[tuple[float, int, int]]
+    max_nodes: int
+    _unique: dict[tuple[float, int, int], int]
+    _family_unique: dict[tuple[float, int, int], int]
+    _caches: _OperationCaches
+    _lock: threading.RLock
+
+    def __init__(self, max_nodes: int = 1 << 21) -> None:
+        self.nodes = [(_TERMINAL_VAR, FALSE, FALSE), (_TERMINAL_VAR, TRUE, TRUE)]
+        self.families = [(_TERMINAL_VAR, EMPTY, EMPTY), (_TERMINAL_VAR, BASE, BASE)]
+        self.max_nodes = max_nodes
+        self._unique = {}
+        self._family_unique = {}
+        self._caches = _OperationCaches()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Return the number of nodes in the store"""
+        return len(self.nodes)
+
+    def var(self, course_id: int, limit: Optional[int] = None) -> int:
+        """
+        Return the node of the requirement that the course with the given ID is taken
+
+        Raise a BDDLimitError if the store already holds limit (or max_nodes) nodes and the node is new.
+        """
+        with self._lock:
+            return self._make_node(course_id, FALSE, TRUE, self._node_limit(limit))
+
+    def conjoin(self, a: int, b: int, limit: Optional[int] = None) -> int:
+        """
+        Return the node of the requirement that both the requirements at nodes a and b are fulfilled
+
+        Raise a BDDLimitError if the result would make the store hold more than limit (or max_nodes) nodes.
+        """
+        with self._lock:
+            return self._apply(a, b, True, self._node_limit(limit))
+
+    def disjoin(self, a: int, b: int, limit: Optional[int] = None) -> int:
+        """
+        Return the node of the requirement that either of the requirements at nodes a and b is fulfilled
+
+        Raise a BDDLimitError if the result would make the store hold more than limit (or max_nodes) nodes.
+        """
+        with self._lock:
+            return self._apply(a, b, False, self._node_limit(limit))
+
+    def is_satisfied(self, node: int, taken: int) -> bool:
+        """
+        Return whether the bitset of taken course IDs fulfills the requirement at the given node
+        """
+        nodes = self.nodes
+        while node > TRUE:
+            course_id, low, high = nodes[node]
+            node = high if taken >> course_id & 1 else low
+        return node == TRUE
+
+    def get_minimal_family(self, node: int, limit: Optional[int] = None) -> int:
+        """
+        Return the family node of the minimal course combinations that fulfill the requirement at the given node
+
+        Raise a BDDLimitError if the result would make the store hold more than limit (or max_nodes) family nodes.
+
+        >>> bdd = RequirementBDD()
+        >>> either = bdd.disjoin(bdd.var(0), bdd.conjoin(bdd.var(0), bdd.var(1)))
+        >>> bdd.families[bdd.get_minimal_family(either)]
+        (0, 0, 1)
+        """
+        with self._lock:
+            return self._minimal(node, self._node_limit(limit))
+
+    def get_min_costs(self, family: int, cost: Callable[[int], int]) -> dict[int, float]:
+        """
+        Return the cost of the cheapest combination in every family node reachable from the given family node, where
+        a course costs cost(1 << course ID)
+        """
+        nodes = self.families
+        min_costs = {EMPTY: float('inf'), BASE: 0}
+        stack = [family]
+        while stack:
+            node = stack[-1]
+            if node in min_costs:
+                stack.pop()
+                continue
+            course_id, low, high = nodes[node]
+            if low in min_costs and high in min_costs:
+                stack.pop()
+                min_costs[node] = min(min_costs[low], cost(1 << course_id) + min_costs[high])
+            else:
+                stack.extend(child for child in (low, high) if child not in min_costs)
+        return min_costs
+
+    def get_family_courses(self, family: int) -> int:
+        """
+        Return the bitset of IDs of every course in any combination of the given family node
+
+        >>> bdd = RequirementBDD()
+        >>> bdd.get_family_courses(bdd.get_minimal_family(bdd.conjoin(bdd.disjoin(bdd.var(0), bdd.var(1)), bdd.var(3))))
+        11
+        """
+        nodes = self.families
+        courses = 0
+        visited = {EMPTY, BASE}
+        stack = [family]
+        while stack:
+            node = stack.pop()
+            if node not in visited:
+                visited.add(node)
+                course_id, low, high = nodes[node]
+                courses |= 1 << course_id
+                stack.extend((low, high))
+        return courses
+
+    def _node_limit(self, limit: Optional[int]) -> int:
+        """Return the node limit of an operation, which is never above max_nodes"""
+        return self.max_nodes if limit is None else min(limit, self.max_nodes)
+
+    def _make_node(self, course_id: float, low: int, high: int, limit: int) -> int:
+        """
+        Return the node testing the given course with the given children, adding it to the store if it is new
+        """
+        if low == high:
+            return low
+        key = (course_id, low, high)
+        node = self._unique.get(key)
+        if node is None:
+            if len(self.nodes) >= limit:
+                raise BDDLimitError
+            node = len(self.nodes)
+            self.nodes.append(key)
+            self._unique[key] = node
+        return node
+
+    def _make_family(self, course_id: float, low: int, high: int, limit: int) -> int:
+        """
+        Return the family node with the given course and children, adding it to the store if it is new
+        """
+        if high == EMPTY:
+            return low
+        key = (course_id, low, high)
+        family = self._family_unique.get(key)
+        if family is None:
+            if len(self.families) >= limit:
+                raise BDDLimitError
+            family = len(self.families)
+            self.families.append(key)
+            self._family_unique[key] = family
+        return family
+
+    def _minimal(self, node: int, limit: int) -> int:
+        """
+        Return the family node of the minimal combinations of the requirement at the given node
+
+        A minimal combination either does not contain the course of the node, and is a minimal combination of the low
+        child, or it contains the course, and the rest of it is a minimal combination of the high child that does not
+        fulfill the low child (otherwise the course would not be needed).
+        """
+        if node <= TRUE:
+            # FALSE has no combinations (EMPTY) and TRUE only has the empty one (BASE)
+            return node
+        family = self._caches.minimal.get(node)
+        if family is None:
+            course_id, low, high = self.nodes[node]
+            family = self._make_family(course_id, self._minimal(low, limit),
+                                       self._without(self._minimal(high, limit), low, limit), limit)
+            self._caches.minimal[node] = family
+        return family
+
+    def _without(self, family: int, node: int, limit: int) -> int:
+        """
+        Return the family node of the combinations in the given family that do not fulfill the requirement at node
+        """
+        if node == TRUE or family == EMPTY:
+            return EMPTY
+        if node == FALSE:
+            return family
+        if family == BASE:
+            # Requirements only ever ask for courses to be taken, so the empty combination only fulfills TRUE
+            return BASE
+
+        key = (family, node)
+        result = self._caches.without.get(key)
+        if result is not None:
+            return result
+
+        family_var, family_low, family_high = self.families[family]
+        node_var, node_low, node_high = self.nodes[node]
+        course_id = min(family_var, node_var)
+        if family_var != course_id:
+            family_low, family_high = family, EMPTY
+        if node_var != course_id:
+            node_low = node_high = node
+
+        result = self._make_family(course_id, self._without(family_low, node_low, limit),
+                                   self._without(family_high, node_high, limit), limit)
+        if len(self._caches.without) >= _CACHE_SIZE:
+            self._caches.without.clear()
+        self._caches.without[key] = result
+        return result
+
+    def _apply(self, a: int, b: int, conjoin: bool, limit: int) -> int:
+        """
+        Return the node of the conjunction (or disjunction) of the requirements at nodes a and b
+        """
+        # Terminal cases
+        if conjoin:
+            if FALSE in (a, b):
+                return FALSE
+            if a in (TRUE, b):
+                return b
+            if b == TRUE:
+                return a
+        else:
+            if TRUE in (a, b):
+                return TRUE
+            if a in (FALSE, b):
+                return b
+            if b == FALSE:
+                return a
+
+        cache = self._caches.conjoined if conjoin else self._caches.disjoined
+        key = (a, b) if a < b else (b, a)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        a_var, a_low, a_high = self.nodes[a]
+        b_var, b_low, b_high = self.nodes[b]
+        course_id = min(a_var, b_var)
+        if a_var != course_id:
+            a_low = a_high = a
+        if b_var != course_id:
+            b_low = b_high = b
+
+        result = self._make_node(course_id, self._apply(a_low, b_low, conjoin, limit),
+                                 self._apply(a_high, b_high, conjoin, limit), limit)
+        if len(cache) >= _CACHE_SIZE:
+            cache.clear()
+        cache[key] = result
+        return result
+
+
+class CompactRequirement:
+    """
+    A course requirement stored as a node in a RequirementBDD
+
+    Instance Attributes:
+        - bdd: the store the requirement's nodes are in
+        - root: the node of the requirement
+        - family: the family node of the requirement's minimal course combinations
+
+    >>> bdd = RequirementBDD()
+    >>> requirement = CompactRequirement(bdd, bdd.conjoin(bdd.disjoin(bdd.var(0), bdd.var(1)), bdd.var(2)))
+    >>> requirement.is_satisfied(0b110)
+    True
+    >>> list(requirement.iter_cheapest_masks(int.bit_count))
+    [5, 6]
+    """
+    bdd: RequirementBDD
+    root: int
+    family: int
+
+    def __init__(self, bdd: RequirementBDD, root: int, limit: Optional[int] = None) -> None:
+        """
+        Raise a BDDLimitError if the minimal combinations would make bdd hold more than limit (or max_nodes) family
+        nodes
+        """
+        self.bdd = bdd
+        self.root = root
+        self.family = bdd.get_minimal_family(root, limit)
+
+    def is_satisfied(self, taken: int) -> bool:
+        """
+        Return whether the bitset of taken course IDs fulfills the requirement
+        """
+        return self.bdd.is_satisfied(self.root, taken)
+
+    def get_courses(self) -> int:
+        """
+        Return the bitset of IDs of every course in any minimal combination that fulfills the requirement
+        """
+        return self.bdd.get_family_courses(self.family)
+
+    def iter_cheapest_masks(self, cost: Callable[[int], int]) -> Iterator[int]:
+        """
+        Lazily yield the minimal course combinations (as bitsets of course IDs) that fulfill the requirement, in
+        nondecreasing order of cost
+
+        cost must be the sum of a nonnegative cost of every course in a combination (e.g. its total credits). Paths of
+        the minimal combination family are searched best-first, guided by the exact cost of the cheapest combination
+        of every family node, so every yielded combination only takes work proportional to the number of courses in
+        the catalog.
+        """
+        nodes = self.bdd.families
+        min_costs = self.bdd.get_min_costs(self.family, cost)
+        if min_costs[self.family] == float('inf'):
+            return
+
+        # Heap of (cost of the cheapest completion, tie breaker, node, cost so far, courses taken so far) of paths
+        counter = itertools.count()
+        paths = [(min_costs[self.family], next(counter), self.family, 0, 0)]
+        while paths:
+            _, _, node, path_cost, mask = heapq.heappop(paths)
+            if node == BASE:
+                yield mask
+                continue
+
+            course_id, low, high = nodes[node]
+            if min_costs[low] != float('inf'):
+                heapq.heappush(paths, (path_cost + min_costs[low], next(counter), low, path_cost, mask))
+            if min_costs[high] != float('inf'):
+                high_cost = path_cost + cost(1 << course_id)
+                heapq.heappush(paths, (high_cost + min_costs[high], next(counter), high, high_cost,
+                                       mask | 1 << course_id))
+
+
+if __name__ == '__main__':
+    import python_ta
+    import doctest
+
+    doctest.testmod()
+    python_ta.check_all(config={
+        'extra-imports': ['heapq', 'itertools', 'threading'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
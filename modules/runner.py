@@ -15,56 +15,182 @@ Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
 
 
 from __future__ import annotations
+from typing import Iterator, Optional
 
-import json
-
-import course_requirements
+from catalog import get_catalog
 from course_network import DatabaseCourseNetwork, PlannerCourseNetwork
+from plan_store import DEFAULT_PLAN_LOOKUP, PlanLookup
+from planner import BranchAndBoundPlanner, DynamicPlanner, ParetoPlanner, PlanningSession
+
+# The planners get_course_tree can use
+PLANNERS = ('exhaustive', 'dynamic', 'search')
 
 
-def get_course_tree(c: str, taken: set[str]) -> PlannerCourseNetwork:
+def get_course_tree(c: str, taken: set[str], planner: str = 'exhaustive', deadline: Optional[float] = None,
+                    plans: Optional[PlanLookup] = DEFAULT_PLAN_LOOKUP) -> PlannerCourseNetwork:
     """
     Get the course
 
+    The course network is taken from the process-wide catalog, so the course data is only loaded and parsed once.
+
+    planner chooses how the network is found:
+        - 'exhaustive': build every possible network and pick the best one
+        - 'dynamic': combine the best network of every prereq (see planner.DynamicPlanner). Much faster, but may pick
+          a network with more credits when prereqs share prereqs of their own.
+        - 'search': search for the best network with branch and bound (see planner.BranchAndBoundPlanner). Picks a
+          network as good as the exhaustive planner's, without building every possible network.
+    Raise a ValueError if the dynamic or search planner finds that the course's prereqs cannot be fulfilled.
+
+    If deadline is given, the search planner is used and gives up after deadline seconds, returning the best network
+    found by then. The network's proven_optimal attribute tells whether the search finished.
+
+    Networks are looked up in and added to plans (unless it is None), keyed by the course, the planner and the courses
+    in taken that may matter for the course, so users with different transcripts share networks. Networks the search
+    gave up on are not added. By default, only the process-wide plan_cache.PLAN_CACHE is used; a PlanLookup with a
+    PlanStore also keeps the networks across restarts.
+
+    Preconditions:
+    - c is a valid course code in the dataset
+    - Every string in taken is a valid course code in the dataset
+    - planner in PLANNERS
+    """
+    catalog = get_catalog()
+    relevant_taken = catalog.get_relevant_taken([c], taken)
+    if deadline is not None:
+        planner = 'search'
+    key = (c, planner, frozenset(relevant_taken))
+
+    found, network = plans.get(catalog.content_hash, key, catalog.network) if plans is not None else (False, None)
+    if not found:
+        network = _plan_course_tree(catalog.network.with_courses_taken(relevant_taken), c, planner, deadline)
+        if plans is not None and (network is None or network.proven_optimal):
+            plans.add(catalog.content_hash, key, network)
+
+    if network is None:
+        raise ValueError(f'The prerequisites of {c} cannot be fulfilled')
+    return network
+
+
+def get_course_trees(codes: set[str], taken: set[str], planner: str = 'search',
+                     deadline: Optional[float] = None) -> dict[str, PlannerCourseNetwork]:
+    """
+    Get one combined plan for all the given courses: a network for each course, where prereqs needed by more than one
+    of them are shared (taken once)
+
+    planner chooses how the plan is found:
+        - 'dynamic': combine the best network of every course (see planner.DynamicPlanner.get_best_plans). The plan is
+          as short as possible, but may take more credits than needed.
+        - 'search': search for the combined plan with the shortest length (the length of its longest network) and then
+          the fewest total credits (see planner.BranchAndBoundPlanner.search_combined)
+    The per-course results of the planners are reused for every course, so planning for many courses at once costs
+    much less than planning for each of them. deadline is used like in get_course_tree. Proving the combined plan
+    optimal can take long for many courses, so a deadline is recommended.
+    Raise a ValueError if the prereqs of one of the courses cannot be fulfilled.
+
+    Preconditions:
+    - Every string in codes is a valid course code in the dataset
+    - Every string in taken is a valid course code in the dataset
+    - planner in ('dynamic', 'search')
+    """
+    course_network = _get_planning_network(sorted(codes), taken)
+
+    courses = [course_network.get_course(code) for code in sorted(codes)]
+
+    if planner == 'dynamic' and deadline is None:
+        networks = DynamicPlanner(course_network).get_best_plans(courses)
+    else:
+        networks = BranchAndBoundPlanner(course_network).search_combined(courses, deadline)
+    if networks is None:
+        raise ValueError(f'The prerequisites of {", ".join(sorted(codes))} cannot all be fulfilled')
+    return {course.code: network for course, network in zip(courses, networks)}
+
+
+def iter_course_trees(c: str, taken: set[str], deadline: Optional[float] = None) -> Iterator[PlannerCourseNetwork]:
+    """
+    Yield progressively better networks for the course, as the search planner finds them (see
+    BranchAndBoundPlanner.iter_improving_plans)
+
+    The first network is yielded almost immediately, so a caller can show it while the search goes on. The search
+    stops after deadline seconds if deadline is given. Nothing is yielded if the course's prereqs cannot be fulfilled.
+
+    Preconditions:
+    - c is a valid course code in the dataset
+    - Every string in taken is a valid course code in the dataset
+    """
+    course_network = _get_planning_network([c], taken)
+    yield from BranchAndBoundPlanner(course_network).iter_improving_plans(course_network.get_course(c), deadline)
+
+
+def get_course_tree_frontier(c: str, taken: set[str]) -> list[PlannerCourseNetwork]:
+    """
+    Get every Pareto-optimal network for the course: every network for which no other network is at least as short,
+    has at most as many credits and at most as many courses, and is better in one of them (see planner.ParetoPlanner)
+
+    The networks are ordered by length, then credits, then number of courses, so the caller can pick a tradeoff. The
+    list is empty if the course's prereqs cannot be fulfilled. To keep planning fast, the planner keeps a bounded
+    number of plans per course, so for courses with very many tradeoffs some may be missing. The networks'
+    proven_optimal attributes are False when that happened.
+
     Preconditions:
     - c is a valid course code in the dataset
     - Every string in taken is a valid course code in the dataset
     """
-    # Path to the JSON file
-    json_file = "../data-processing/courses_clean.json"
+    course_network = _get_planning_network([c], taken)
+    return ParetoPlanner(course_network).get_frontier(course_network.get_course(c))
+
+
+def start_planning_session(c: str, taken: set[str]) -> PlanningSession:
+    """
+    Start a PlanningSession for the course with the given courses taken, for trying out changes to the courses taken
+
+    The session uses the dynamic planner (see get_course_tree), and only finds again the plans of the prereqs a
+    change affects. Codes in taken that the catalog does not know are ignored.
+
+    Preconditions:
+    - c is a valid course code in the dataset
+    """
+    catalog = get_catalog()
+    course_network = catalog.network.with_courses_taken({code for code in taken if code in catalog.network.table})
+    return PlanningSession(course_network, course_network.get_course(c), catalog.get_prereq_closure())
+
 
-    with open(json_file) as f:
-        data = json.load(f)
+def _plan_course_tree(course_network: DatabaseCourseNetwork, c: str, planner: str,
+                      deadline: Optional[float]) -> Optional[PlannerCourseNetwork]:
+    """
+    Return the network get_course_tree picks for the course in the given network with the given planner, or None if
+    the course's prereqs cannot be fulfilled
+    """
+    course = course_network.get_course(c)
 
-        # Add all courses to course network
-        course_network = DatabaseCourseNetwork(taken)
-        for i in data:
-            code = i['course code']
-            course_network.add_course(code)
+    if planner in ('dynamic', 'search'):
+        if planner == 'dynamic':
+            return DynamicPlanner(course_network).get_best_plan(course)
+        return BranchAndBoundPlanner(course_network).search(course, deadline)
 
-        # Add all course prereqs
-        for i in data:
-            reqs = course_requirements.parse_course_requirements(i['prerequisites']).get_possible_true_combos()
-            course = course_network.get_course(i['course code'])
-            course.add_prereqs(reqs)
+    # Get all possible prereq networks
+    out = course_network.get_all_prereq_networks(course)
 
-        course = course_network.get_course(c)
+    # Get all prereq networks at the min length (Min duration to take all prereqs in network)
+    min_lengths = [out[0]]
+    min_length = out[0].length
+    for i in out:
+        if i.length == min_length:
+            min_lengths.append(i)
+        elif i.length < min_length:
+            min_lengths = [i]
+            min_length = i.length
 
-        # Get all possible prereq networks
-        out = course_network.get_all_prereq_networks(course)
+    # Select the network of the networks at the min length to be the one with the fewest number of credits
+    return min(min_lengths, key=lambda x: x.get_number_of_credits(course_network.courses_taken))
 
-        # Get all prereq networks at the min length (Min duration to take all prereqs in network)
-        min_lengths = [out[0]]
-        min_length = out[0].length
-        for i in out:
-            if i.length == min_length:
-                min_lengths.append(i)
-            elif i.length < min_length:
-                min_lengths = [i]
-                min_length = i.length
 
-        # Select the network of the networks at the min length to be the one with the fewest number of credits
-        return min(min_lengths, key=lambda x: x.get_number_of_credits(taken))
+def _get_planning_network(codes: list[str], taken: set[str]) -> DatabaseCourseNetwork:
+    """
+    Return the catalog's course network with the given courses taken, leaving out the taken courses that cannot matter
+    when planning the given courses (see CourseCatalog.get_relevant_taken)
+    """
+    catalog = get_catalog()
+    return catalog.network.with_courses_taken(catalog.get_relevant_taken(codes, taken))
 
 
 if __name__ == '__main__':
@@ -73,7 +199,7 @@ if __name__ == '__main__':
 
     doctest.testmod()
     python_ta.check_all(config={
-        'extra-imports': ['json', 'course_network', 'requirements'],
-        'allowed-io': ['get_course_tree'],
+        'extra-imports': ['catalog', 'course_network', 'plan_store', 'planner'],
+        'allowed-io': [],
         'max-line-length': 120
     })
@@ -0,0 +1,94 @@
+"""CSC111 Final Project: Simplifying the UofT Course Selection Process
+
+Description
+===============================
+Regression tests for planning courses on a prerequisite cycle. In the catalog used here, AAA100H1 requires BBB100H1 or
+DDD100H1 and BBB100H1 requires AAA100H1, so AAA100H1 can only be taken after DDD100H1 and BBB100H1 only after
+AAA100H1. Every planner must find the same best plan for them as DatabaseCourseNetwork.get_all_prereq_networks, which
+enumerates every plan.
+
+Copyright and Usage Information
+===============================
+
+This file is part of a Course Project for CSC111H1 of the University of
+Toronto.
+
+Copyright (c) 2023 Nikita Goncharov, Noah Black, Adam Pralat
+"""
+from catalog import build_course_network
+from course_network import DatabaseCourseNetwork, PlannerCourseNetwork
+from planner import BranchAndBoundPlanner, DynamicPlanner, ParetoPlanner
+
+
+def build_cyclic_network() -> DatabaseCourseNetwork:
+    """
+    Return the network of the catalog described at the top of this module, where TTT100H1 requires both courses on
+    the cycle
+    """
+    return build_course_network([{'course code': 'DDD100H1', 'prerequisites': ''},
+                                 {'course code': 'AAA100H1', 'prerequisites': 'BBB100H1|DDD100H1'},
+                                 {'course code': 'BBB100H1', 'prerequisites': 'AAA100H1'},
+                                 {'course code': 'TTT100H1', 'prerequisites': 'AAA100H1^BBB100H1'}])
+
+
+def get_exhaustive_plan(network: DatabaseCourseNetwork, code: str) -> PlannerCourseNetwork:
+    """
+    Return the best plan for the course with the given code out of every plan get_all_prereq_networks finds
+    """
+    return min(network.get_all_prereq_networks(network.get_course(code)),
+               key=lambda plan: (plan.length, plan.get_number_of_credits(0)))
+
+
+def test_dynamic_matches_exhaustive() -> None:
+    """Test that the DynamicPlanner's best plans of the courses on and after the cycle are the exhaustive ones"""
+    network = build_cyclic_network()
+    planner = DynamicPlanner(network)
+    for code in ('AAA100H1', 'BBB100H1', 'TTT100H1'):
+        plan = planner.get_best_plan(network.get_course(code))
+        exhaustive = get_exhaustive_plan(network, code)
+        assert (plan.length, plan.course_ids) == (exhaustive.length, exhaustive.course_ids)
+
+
+def test_dynamic_lengths_after_other_course() -> None:
+    """Test that planning a course on the cycle first does not change the lengths of the plans found afterwards"""
+    network = build_cyclic_network()
+    planner = DynamicPlanner(network)
+    assert planner.get_best_length(network.get_course('BBB100H1')) == 3
+    assert planner.get_best_length(network.get_course('TTT100H1')) == 4
+
+
+def test_search_matches_exhaustive() -> None:
+    """Test that the BranchAndBoundPlanner's plans of the courses on and after the cycle are the best ones"""
+    network = build_cyclic_network()
+    planner = BranchAndBoundPlanner(network)
+    for code in ('AAA100H1', 'BBB100H1', 'TTT100H1'):
+        plan = planner.search(network.get_course(code))
+        exhaustive = get_exhaustive_plan(network, code)
+        assert (plan.length, plan.get_number_of_credits(0)) == (exhaustive.length, exhaustive.get_number_of_credits(0))
+        assert planner.stats.proven_optimal
+
+
+def test_pareto_matches_exhaustive() -> None:
+    """Test that the ParetoPlanner's frontier of the course after the cycle is just the best exhaustive plan"""
+    network = build_cyclic_network()
+    planner = ParetoPlanner(network)
+    frontier = planner.get_frontier(network.get_course('TTT100H1'))
+    exhaustive = get_exhaustive_plan(network, 'TTT100H1')
+    assert [(plan.length, plan.course_ids) for plan in frontier] == [(exhaustive.length, exhaustive.course_ids)]
+    assert not planner.truncated
+
+
+def test_combined_plans_share_cycle() -> None:
+    """Test that the combined plans of the courses on the cycle share the courses that break it"""
+    network = build_cyclic_network()
+    courses = [network.get_course('AAA100H1'), network.get_course('BBB100H1')]
+    plans = BranchAndBoundPlanner(network).search_combined(courses)
+    assert network.table.get_mask_codes(plans[0].course_ids) == {'AAA100H1', 'DDD100H1'}
+    assert plans[1].length == 3 and plans[1].end.prereqs[0] is plans[0].end
+    dynamic_plans = DynamicPlanner(network).get_best_plans(courses)
+    assert [plan.course_ids for plan in dynamic_plans] == [plan.course_ids for plan in plans]
+
+
+if __name__ == '__main__':
+    import pytest
+    pytest.main(['test_prereq_cycles.py'])